@@ -0,0 +1,32 @@
+"""
+Authentication classes for clients that cannot send an Authorization header.
+"""
+
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+
+TOKEN_QUERY_PARAM = "token"
+
+
+class QueryParamJWTAuthentication(JWTAuthentication):
+    """JWT authentication from a ``?token=`` query parameter, for EventSource and WebSocket clients."""
+
+    def authenticate(self, request):
+        raw_token = request.query_params.get(TOKEN_QUERY_PARAM)
+        if not raw_token:
+            return None
+
+        validated_token = self.get_validated_token(raw_token)
+        return self.get_user(validated_token), validated_token
+
+
+def user_for_token(raw_token):
+    """Get the user an access token belongs to, or None if the token is missing or invalid."""
+    if not raw_token:
+        return None
+
+    authentication = JWTAuthentication()
+    try:
+        return authentication.get_user(authentication.get_validated_token(raw_token))
+    except (InvalidToken, AuthenticationFailed):
+        return None
@@ -0,0 +1,21 @@
+"""
+Channels middleware authenticating WebSocket connections with a JWT access token.
+"""
+
+from urllib.parse import parse_qs
+
+from channels.db import database_sync_to_async
+from channels.middleware import BaseMiddleware
+from django.contrib.auth.models import AnonymousUser
+
+from .authentication import TOKEN_QUERY_PARAM, user_for_token
+
+
+class JWTAuthMiddleware(BaseMiddleware):
+    """Sets ``scope["user"]`` from a ``?token=`` query parameter; browsers cannot send headers with a WebSocket."""
+
+    async def __call__(self, scope, receive, send):
+        query = parse_qs(scope.get("query_string", b"").decode())
+        raw_token = query.get(TOKEN_QUERY_PARAM, [None])[0]
+        scope["user"] = await database_sync_to_async(user_for_token)(raw_token) or AnonymousUser()
+        return await super().__call__(scope, receive, send)
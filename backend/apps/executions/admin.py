@@ -5,7 +5,19 @@ Django admin configuration for execution models.
 from django.contrib import admin
 from django.utils.translation import gettext_lazy as _
 
-from .models import ExecutionMetrics, NodeExecution, WorkflowExecution
+from .models import (
+    ArchivedExecution,
+    ExecutionArchive,
+    ExecutionLog,
+    ExecutionMetrics,
+    ExecutionProfile,
+    ExecutionRollup,
+    ExecutionTrace,
+    NodeExecution,
+    NodeExecutionRollup,
+    OutboundEmail,
+    WorkflowExecution,
+)
 
 
 class NodeExecutionInline(admin.TabularInline):
@@ -18,6 +30,19 @@ class NodeExecutionInline(admin.TabularInline):
     show_change_link = True
 
 
+class ExecutionLogInline(admin.TabularInline):
+    """Inline admin for the ExecutionLog entries of a node execution."""
+
+    model = ExecutionLog
+    extra = 0
+    fields = ["timestamp", "level", "message", "data"]
+    readonly_fields = ["timestamp", "level", "message", "data"]
+    can_delete = False
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+
 @admin.register(WorkflowExecution)
 class WorkflowExecutionAdmin(admin.ModelAdmin):
     """Admin configuration for WorkflowExecution model."""
@@ -39,6 +64,9 @@ class WorkflowExecutionAdmin(admin.ModelAdmin):
         "is_running_display",
         "is_completed_display",
         "success_rate_display",
+        "total_nodes",
+        "finished_nodes",
+        "failed_nodes",
         "started_at",
         "completed_at",
     ]
@@ -84,6 +112,9 @@ class WorkflowExecutionAdmin(admin.ModelAdmin):
                     "is_running_display",
                     "is_completed_display",
                     "success_rate_display",
+                    "total_nodes",
+                    "finished_nodes",
+                    "failed_nodes",
                 ),
                 "classes": ("collapse",),
             },
@@ -191,13 +222,6 @@ class NodeExecutionAdmin(admin.ModelAdmin):
                 "classes": ("collapse",),
             },
         ),
-        (
-            _("Logs"),
-            {
-                "fields": ("execution_logs",),
-                "classes": ("collapse",),
-            },
-        ),
         (
             _("Statistics"),
             {
@@ -216,6 +240,7 @@ class NodeExecutionAdmin(admin.ModelAdmin):
             },
         ),
     )
+    inlines = [ExecutionLogInline]
     ordering = ["-started_at"]
     date_hierarchy = "started_at"
 
@@ -356,3 +381,112 @@ class ExecutionMetricsAdmin(admin.ModelAdmin):
         return _("N/A")
 
     avg_duration_display.short_description = _("Avg Duration")
+
+
+@admin.register(OutboundEmail)
+class OutboundEmailAdmin(admin.ModelAdmin):
+    """Admin configuration for OutboundEmail model."""
+
+    list_display = ["recipient", "subject", "status", "attempts", "next_attempt_at", "sent_at"]
+    list_filter = ["status", "recipient_domain", "created_at"]
+    search_fields = ["recipient", "subject"]
+    readonly_fields = ["id", "created_at", "sent_at"]
+    ordering = ["-created_at"]
+    date_hierarchy = "created_at"
+
+
+@admin.register(ExecutionLog)
+class ExecutionLogAdmin(admin.ModelAdmin):
+    """Admin configuration for ExecutionLog model."""
+
+    list_display = ["timestamp", "level", "message", "workflow_execution", "node_execution"]
+    list_filter = ["level", "timestamp"]
+    search_fields = ["message"]
+    raw_id_fields = ["workflow_execution", "node_execution"]
+    ordering = ["-id"]
+
+
+@admin.register(ExecutionTrace)
+class ExecutionTraceAdmin(admin.ModelAdmin):
+    """Admin configuration for ExecutionTrace model."""
+
+    list_display = ["workflow_execution", "trace_id", "started_at", "duration_ms", "span_count"]
+    list_filter = ["started_at"]
+    search_fields = ["trace_id"]
+    raw_id_fields = ["workflow_execution"]
+    readonly_fields = ["trace_id", "started_at", "duration_ms", "span_count", "spans"]
+    ordering = ["-started_at"]
+
+
+@admin.register(ExecutionProfile)
+class ExecutionProfileAdmin(admin.ModelAdmin):
+    """Admin configuration for ExecutionProfile model."""
+
+    list_display = ["workflow_execution", "mode", "duration_ms", "sample_count", "task_count", "created_at"]
+    list_filter = ["mode", "created_at"]
+    raw_id_fields = ["workflow_execution"]
+    readonly_fields = ["mode", "duration_ms", "sample_count", "sample_interval_ms", "task_count", "functions"]
+    ordering = ["-created_at"]
+
+
+@admin.register(ExecutionArchive)
+class ExecutionArchiveAdmin(admin.ModelAdmin):
+    """Admin configuration for ExecutionArchive model."""
+
+    list_display = ["path", "partition_date", "execution_count", "size_bytes", "created_at"]
+    list_filter = ["partition_date"]
+    search_fields = ["path"]
+    readonly_fields = ["path", "partition_date", "execution_count", "size_bytes", "created_at"]
+    ordering = ["-partition_date"]
+    date_hierarchy = "partition_date"
+
+
+@admin.register(ArchivedExecution)
+class ArchivedExecutionAdmin(admin.ModelAdmin):
+    """Admin configuration for ArchivedExecution model."""
+
+    list_display = ["execution_id", "workflow_name", "status", "started_at", "archive"]
+    list_filter = ["status", "started_at"]
+    search_fields = ["execution_id", "workflow_name"]
+    raw_id_fields = ["archive", "user"]
+    ordering = ["-started_at"]
+
+
+@admin.register(ExecutionRollup)
+class ExecutionRollupAdmin(admin.ModelAdmin):
+    """Admin configuration for ExecutionRollup model."""
+
+    list_display = [
+        "workflow",
+        "granularity",
+        "period_start",
+        "total_executions",
+        "successful_executions",
+        "failed_executions",
+        "max_duration",
+    ]
+    list_filter = ["granularity", "period_start"]
+    search_fields = ["workflow__name", "user__email"]
+    raw_id_fields = ["workflow", "user"]
+    readonly_fields = ["updated_at"]
+    ordering = ["-period_start"]
+
+
+@admin.register(NodeExecutionRollup)
+class NodeExecutionRollupAdmin(admin.ModelAdmin):
+    """Admin configuration for NodeExecutionRollup model."""
+
+    list_display = [
+        "node",
+        "workflow",
+        "granularity",
+        "period_start",
+        "total_executions",
+        "failed_executions",
+        "max_duration",
+    ]
+    list_filter = ["granularity", "period_start"]
+    search_fields = ["node__name", "workflow__name"]
+    raw_id_fields = ["node", "workflow"]
+    readonly_fields = ["updated_at"]
+    ordering = ["-period_start"]
@@ -0,0 +1,104 @@
+"""
+Versioned cache of per-user aggregate responses, with single-flight recompute and stale-while-revalidate.
+"""
+
+import time
+from functools import partial
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+
+def _version_key(user_id):
+    return f"exec_agg_version:{user_id}"
+
+
+def _entry_key(user_id, name, params):
+    query = "&".join(f"{key}={params[key]}" for key in sorted(params))
+    return f"exec_agg:{user_id}:{name}:{query}"
+
+
+def _initial_version(user_id):
+    # Seeded from the clock rather than 0, so a version key that was evicted never
+    # restarts at a number an old entry still carries
+    cache.add(_version_key(user_id), time.time_ns(), timeout=None)
+    return cache.get(_version_key(user_id))
+
+
+def _bump(user_id):
+    try:
+        cache.incr(_version_key(user_id))
+    except ValueError:
+        _initial_version(user_id)
+
+
+def bump_version(user_id):
+    """Invalidate a user's cached aggregates once the current transaction commits.
+
+    Deferring to commit keeps a concurrent poll from caching pre-commit data
+    under the new version.
+    """
+    transaction.on_commit(partial(_bump, user_id))
+
+
+def bump_versions(user_ids):
+    """Invalidate the cached aggregates of several users once the current transaction commits."""
+    for user_id in set(user_ids):
+        bump_version(user_id)
+
+
+def get_or_compute(user_id, name, params, compute):
+    """Get a cached aggregate response, recomputing it with ``compute`` when it is outdated.
+
+    The version and the entry are read in a single round trip. An entry is
+    fresh while it carries the user's current version and is younger than
+    AGGREGATE_CACHE_TTL. Only one caller recomputes an outdated entry; while it
+    does, other callers get the outdated entry if it is less than
+    AGGREGATE_CACHE_STALE_WINDOW seconds past its TTL, and otherwise wait
+    briefly for the recompute.
+    """
+    ttl = settings.AGGREGATE_CACHE_TTL
+    if not ttl:
+        return compute()
+
+    version_key = _version_key(user_id)
+    entry_key = _entry_key(user_id, name, params)
+    values = cache.get_many([version_key, entry_key])
+    version = values.get(version_key)
+    entry = values.get(entry_key)
+    if version is None:
+        version = _initial_version(user_id)
+
+    now = time.time()
+    if entry is not None and entry["version"] == version and now < entry["computed_at"] + ttl:
+        return entry["data"]
+
+    lock_key = f"{entry_key}:lock"
+    if cache.add(lock_key, 1, timeout=settings.AGGREGATE_CACHE_LOCK_TIMEOUT):
+        try:
+            data = compute()
+            # Stored under the version read before computing, so a bump during the compute still invalidates it
+            cache.set(
+                entry_key,
+                {"version": version, "computed_at": time.time(), "data": data},
+                timeout=ttl + settings.AGGREGATE_CACHE_STALE_WINDOW,
+            )
+        finally:
+            cache.delete(lock_key)
+        return data
+
+    if entry is not None and now < entry["computed_at"] + ttl + settings.AGGREGATE_CACHE_STALE_WINDOW:
+        return entry["data"]
+
+    # Nothing usable yet: wait for the recompute, unless its caller gave up without storing a result
+    deadline = now + settings.AGGREGATE_CACHE_LOCK_TIMEOUT
+    while time.time() < deadline:
+        time.sleep(0.05)
+        values = cache.get_many([entry_key, lock_key])
+        entry = values.get(entry_key)
+        if entry is not None and entry["version"] == version:
+            return entry["data"]
+        if lock_key not in values:
+            break
+    return compute()
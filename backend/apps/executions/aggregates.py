@@ -0,0 +1,99 @@
+"""
+Single-query aggregations behind the execution stats, workflow metrics and metrics summary endpoints.
+"""
+
+from django.db.models import Avg, Count, DurationField, ExpressionWrapper, F, Q, Sum
+
+EXECUTION_DURATION = ExpressionWrapper(F("completed_at") - F("started_at"), output_field=DurationField())
+
+
+def _status_count(*statuses):
+    return Count("id", filter=Q(status__in=statuses))
+
+
+# Aggregates over a WorkflowExecution queryset, by response key
+EXECUTION_AGGREGATES = {
+    "total_executions": Count("id"),
+    "successful_executions": _status_count("completed"),
+    "failed_executions": _status_count("failed"),
+    "running_executions": _status_count("running"),
+    "cancelled_executions": _status_count("cancelled"),
+    # Average run time of completed executions
+    "average_duration": Avg(EXECUTION_DURATION, filter=Q(status="completed", completed_at__isnull=False)),
+    "workflows_executed": Count("workflow", distinct=True),
+}
+
+# Aggregates over an ExecutionMetrics queryset, by response key
+METRICS_AGGREGATES = {
+    "total_days": Count("id"),
+    "total_executions": Sum("total_executions"),
+    "total_successful": Sum("successful_executions"),
+    "total_failed": Sum("failed_executions"),
+    "average_duration": Avg("avg_duration"),
+}
+
+
+# Aggregates over an ExecutionRollup queryset, by response key
+ROLLUP_AGGREGATES = {
+    "finished_executions": Sum("total_executions"),
+    "successful_executions": Sum("successful_executions"),
+    "failed_executions": Sum("failed_executions"),
+    "total_duration": Sum("total_duration"),
+}
+
+
+def _seconds(duration):
+    return duration.total_seconds() if duration is not None else None
+
+
+def aggregate_executions(executions, *keys):
+    """Compute the given EXECUTION_AGGREGATES (all by default) over executions in one query.
+
+    ``average_duration`` is returned in seconds, or None when nothing completed.
+    """
+    keys = keys or tuple(EXECUTION_AGGREGATES)
+    result = executions.order_by().aggregate(**{key: EXECUTION_AGGREGATES[key] for key in keys})
+    if "average_duration" in result:
+        result["average_duration"] = _seconds(result["average_duration"])
+    return result
+
+
+def aggregate_workflow_metrics(rollups, executions):
+    """Compute a workflow's execution metrics from its daily rollups and its open executions, in two queries.
+
+    Finished executions are counted from the rollups; only pending and running
+    executions, which the rollups do not hold yet, are counted from ``executions``.
+    ``average_duration`` covers all finished executions, in seconds.
+    """
+    totals = {key: value or 0 for key, value in rollups.order_by().aggregate(**ROLLUP_AGGREGATES).items()}
+    open_executions = aggregate_executions(
+        executions.filter(status__in=["pending", "running"]), "total_executions", "running_executions"
+    )
+    finished = totals["finished_executions"]
+    return {
+        "total_executions": finished + open_executions["total_executions"],
+        "successful_executions": totals["successful_executions"],
+        "failed_executions": totals["failed_executions"],
+        "running_executions": open_executions["running_executions"],
+        "average_duration": _seconds(totals["total_duration"]) / finished if finished else None,
+    }
+
+
+def summarize_metrics(metrics):
+    """Compute the metrics summary of an ExecutionMetrics queryset in one query.
+
+    Empty sums and averages are reported as 0 and the average duration in
+    seconds; the daily average and ``success_rate`` are derived from the totals.
+    """
+    result = {key: value or 0 for key, value in metrics.order_by().aggregate(**METRICS_AGGREGATES).items()}
+    total_days = result["total_days"]
+    total_executions = result["total_executions"]
+    return {
+        "total_days": total_days,
+        "total_executions": total_executions,
+        "total_successful": result["total_successful"],
+        "total_failed": result["total_failed"],
+        "average_daily_executions": total_executions / total_days if total_days else 0,
+        "average_duration": _seconds(result["average_duration"]) if result["average_duration"] else 0,
+        "success_rate": (result["total_successful"] / total_executions) * 100 if total_executions else 0,
+    }
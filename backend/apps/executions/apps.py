@@ -5,3 +5,6 @@ class ExecutionsConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "apps.executions"
     verbose_name = "Executions"
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,216 @@
+"""
+Cold archive of expired executions as compressed, date-partitioned NDJSON files.
+"""
+
+import gzip
+import json
+import logging
+import os
+import uuid
+from collections import defaultdict
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import Exists, F, OuterRef
+from django.utils import timezone
+
+from .cleanup import expired_executions
+from .models import ArchivedExecution, ExecutionArchive, ExecutionLog, NodeExecution
+
+logger = logging.getLogger(__name__)
+
+
+class ArchiveError(Exception):
+    """Raised when an archived execution cannot be read back."""
+
+
+def archive_root():
+    """Get the directory holding archive files."""
+    return Path(settings.EXECUTION_ARCHIVE_ROOT)
+
+
+class _ArchiveWriter:
+    """Writes one archive file as a series of gzip members, one per chunk of executions.
+
+    Concatenated gzip members are still a valid gzip file, so the whole file can
+    be read with standard tools, while the manifest records where each member
+    starts so a single execution can be read back on its own.
+    """
+
+    def __init__(self, day):
+        self.day = day
+        self.relative_path = f"{day:%Y/%m/%d}/executions-{day:%Y%m%d}-{uuid.uuid4().hex[:12]}.ndjson.gz"
+        self.path = archive_root() / self.relative_path
+        self.partial_path = self.path.with_name(self.path.name + ".partial")
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.file = open(self.partial_path, "wb")
+        self.entries = []
+
+    def write_chunk(self, executions):
+        """Compress a chunk of executions, with their node executions and logs, into one gzip member."""
+        ids = [execution["id"] for execution in executions]
+        node_executions = defaultdict(list)
+        for node_execution in (
+            NodeExecution.objects.filter(workflow_execution_id__in=ids).order_by("started_at").values()
+        ):
+            node_executions[node_execution["workflow_execution_id"]].append(node_execution)
+        logs = defaultdict(list)
+        for log in ExecutionLog.objects.filter(workflow_execution_id__in=ids).order_by("id").values():
+            logs[log["workflow_execution_id"]].append(log)
+
+        lines = [
+            json.dumps(
+                {
+                    "execution": execution,
+                    "node_executions": node_executions[execution["id"]],
+                    "logs": logs[execution["id"]],
+                },
+                cls=DjangoJSONEncoder,
+            )
+            for execution in executions
+        ]
+        member = gzip.compress("\n".join(lines).encode() + b"\n")
+
+        offset = self.file.tell()
+        self.file.write(member)
+        self.entries.extend(
+            ArchivedExecution(
+                execution_id=execution["id"],
+                user_id=execution["user_id"],
+                workflow_id=execution["workflow_id"],
+                workflow_name=execution["workflow_name"],
+                status=execution["status"],
+                started_at=execution["started_at"],
+                completed_at=execution["completed_at"],
+                offset=offset,
+                length=len(member),
+            )
+            for execution in executions
+        )
+
+    def close(self):
+        """Move the finished file into place, then record it and its executions in the manifest."""
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        size = self.file.tell()
+        self.file.close()
+
+        if not self.entries:
+            self.partial_path.unlink()
+            return None
+
+        # Rows are only counted as archived once their file is complete and durable
+        os.replace(self.partial_path, self.path)
+        with transaction.atomic():
+            archive = ExecutionArchive.objects.create(
+                path=self.relative_path,
+                partition_date=self.day,
+                execution_count=len(self.entries),
+                size_bytes=size,
+            )
+            for entry in self.entries:
+                entry.archive = archive
+            ArchivedExecution.objects.bulk_create(self.entries, batch_size=1000)
+        return archive
+
+
+def archive_expired_executions(successful_cutoff=None, failed_cutoff=None):
+    """Stream expired executions that are not archived yet into archive files, one file per day.
+
+    Executions are read with a server-side cursor in start order and written in
+    chunks of EXECUTION_ARCHIVE_CHUNK_SIZE; a file is closed when the day changes
+    or it reaches EXECUTION_ARCHIVE_FILE_MAX_EXECUTIONS. Returns archive statistics.
+    """
+    now = timezone.now()
+    if successful_cutoff is None:
+        successful_cutoff = now - timedelta(days=settings.EXECUTION_RETENTION_DAYS)
+    if failed_cutoff is None:
+        failed_cutoff = now - timedelta(days=settings.EXECUTION_FAILED_RETENTION_DAYS)
+
+    pending = (
+        expired_executions(successful_cutoff, failed_cutoff)
+        .filter(~Exists(ArchivedExecution.objects.filter(execution_id=OuterRef("pk"))))
+        .annotate(workflow_name=F("workflow__name"))
+        .order_by("started_at", "id")
+        .values(
+            "id",
+            "workflow_id",
+            "workflow_name",
+            "user_id",
+            "status",
+            "input_data",
+            "output_data",
+            "started_at",
+            "completed_at",
+            "error_message",
+            "trigger_source",
+            "execution_context",
+        )
+    )
+
+    chunk_size = settings.EXECUTION_ARCHIVE_CHUNK_SIZE
+    writer = None
+    chunk = []
+    archives = []
+    written = 0
+
+    def close_writer():
+        if chunk:
+            writer.write_chunk(chunk)
+            chunk.clear()
+        archive = writer.close()
+        if archive is not None:
+            archives.append(archive)
+
+    for execution in pending.iterator(chunk_size=chunk_size):
+        day = execution["started_at"].date()
+        if writer is not None and (
+            writer.day != day or len(writer.entries) + len(chunk) >= settings.EXECUTION_ARCHIVE_FILE_MAX_EXECUTIONS
+        ):
+            close_writer()
+            writer = None
+        if writer is None:
+            writer = _ArchiveWriter(day)
+
+        chunk.append(execution)
+        written += 1
+        if len(chunk) >= chunk_size:
+            writer.write_chunk(chunk)
+            chunk.clear()
+
+    if writer is not None:
+        close_writer()
+
+    stats = {
+        "archived": written,
+        "files": [archive.path for archive in archives],
+        "bytes": sum(archive.size_bytes for archive in archives),
+    }
+    if written:
+        logger.info(f"Archived {written} executions into {len(archives)} files ({stats['bytes']} bytes)")
+    return stats
+
+
+def read_archived_execution(entry):
+    """Read one archived execution back from its archive file.
+
+    Only the gzip member holding the execution is read and decompressed.
+    """
+    path = archive_root() / entry.archive.path
+    try:
+        with open(path, "rb") as archive_file:
+            archive_file.seek(entry.offset)
+            member = archive_file.read(entry.length)
+        lines = gzip.decompress(member).splitlines()
+    except (OSError, EOFError) as e:
+        raise ArchiveError(f"Could not read {entry.archive.path}: {str(e)}") from e
+
+    execution_id = str(entry.execution_id)
+    for line in lines:
+        record = json.loads(line)
+        if record["execution"]["id"] == execution_id:
+            return record
+    raise ArchiveError(f"Execution {execution_id} not found in {entry.archive.path}")
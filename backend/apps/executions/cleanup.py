@@ -0,0 +1,165 @@
+"""
+Chunked, resumable deletion of expired executions in bounded transactions.
+"""
+
+import logging
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import Exists, OuterRef, Q
+from django.utils import timezone
+
+from .models import (
+    ArchivedExecution,
+    ExecutionLog,
+    ExecutionProfile,
+    ExecutionTrace,
+    NodeExecution,
+    WorkflowExecution,
+)
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINT_KEY = "execution_cleanup:checkpoint"
+LAST_RUN_KEY = "execution_cleanup:last_run"
+LOCK_KEY = "execution_cleanup:lock"
+
+FAILED_STATUSES = ["failed", "cancelled", "timeout"]
+
+# Tables holding rows of an execution, deleted before the execution itself: (model, column referencing it)
+CHILD_TABLES = [
+    (ExecutionLog, "workflow_execution_id"),
+    (ExecutionTrace, "workflow_execution_id"),
+    (ExecutionProfile, "workflow_execution_id"),
+    (NodeExecution, "workflow_execution_id"),
+]
+
+
+def expired_executions(successful_cutoff, failed_cutoff):
+    """Get executions past retention, which is shorter for completed runs than for failed ones."""
+    return WorkflowExecution.objects.filter(
+        Q(started_at__lt=failed_cutoff, status__in=FAILED_STATUSES)
+        | Q(started_at__lt=successful_cutoff, status="completed")
+    )
+
+
+def _delete_batch(ids):
+    """Delete a batch of executions and their rows with one statement per table, children first."""
+    pk_field = WorkflowExecution._meta.pk
+    params = [pk_field.get_db_prep_value(pk, connection) for pk in ids]
+    placeholders = ", ".join(["%s"] * len(params))
+
+    deleted = {}
+    with transaction.atomic(), connection.cursor() as cursor:
+        for model, column in CHILD_TABLES + [(WorkflowExecution, pk_field.column)]:
+            table = model._meta.db_table
+            cursor.execute(
+                f"DELETE FROM {connection.ops.quote_name(table)} "
+                f"WHERE {connection.ops.quote_name(column)} IN ({placeholders})",
+                params,
+            )
+            deleted[table] = cursor.rowcount
+    return deleted
+
+
+def _save_checkpoint(checkpoint):
+    cache.set(CHECKPOINT_KEY, checkpoint, timeout=settings.EXECUTION_CLEANUP_CHECKPOINT_TTL)
+
+
+def run_cleanup(max_runtime=None):
+    """Delete expired executions in primary-key order until done or out of time.
+
+    Each batch runs in its own short transaction, and its size adapts so a batch
+    takes about EXECUTION_CLEANUP_BATCH_SECONDS. Progress is checkpointed after
+    every batch, so a run that is killed or runs out of time resumes where it
+    stopped, with the same cutoffs, instead of rescanning. Returns the run's
+    statistics, with ``finished`` False when work is left.
+    """
+    if max_runtime is None:
+        max_runtime = settings.EXECUTION_CLEANUP_MAX_RUNTIME
+
+    if not cache.add(LOCK_KEY, 1, timeout=max_runtime + 60):
+        logger.info("Execution cleanup already running, skipping")
+        return {"status": "skipped", "reason": "Cleanup already running"}
+
+    try:
+        checkpoint = cache.get(CHECKPOINT_KEY)
+        if checkpoint:
+            logger.info(f"Resuming execution cleanup after {checkpoint['last_id']}")
+        else:
+            now = timezone.now()
+            checkpoint = {
+                "successful_cutoff": now - timedelta(days=settings.EXECUTION_RETENTION_DAYS),
+                "failed_cutoff": now - timedelta(days=settings.EXECUTION_FAILED_RETENTION_DAYS),
+                "last_id": None,
+                "deleted_failed": 0,
+                "deleted_successful": 0,
+                "deleted_rows": {},
+                "batches": 0,
+                "elapsed": 0.0,
+            }
+
+        expired = expired_executions(checkpoint["successful_cutoff"], checkpoint["failed_cutoff"]).order_by("id")
+        if settings.EXECUTION_ARCHIVE_ENABLED:
+            # Never delete anything the cold archive does not hold yet
+            expired = expired.filter(Exists(ArchivedExecution.objects.filter(execution_id=OuterRef("pk"))))
+        batch_size = settings.EXECUTION_CLEANUP_BATCH_SIZE
+        target = settings.EXECUTION_CLEANUP_BATCH_SECONDS
+        started = time.monotonic()
+        finished = False
+
+        while time.monotonic() - started < max_runtime:
+            batch_started = time.monotonic()
+            queryset = expired.filter(id__gt=checkpoint["last_id"]) if checkpoint["last_id"] else expired
+            batch = list(queryset.values_list("id", "status")[:batch_size])
+            if not batch:
+                finished = True
+                break
+
+            deleted = _delete_batch([pk for pk, _ in batch])
+
+            failed = sum(1 for _, status in batch if status in FAILED_STATUSES)
+            checkpoint["deleted_failed"] += failed
+            checkpoint["deleted_successful"] += len(batch) - failed
+            for table, count in deleted.items():
+                checkpoint["deleted_rows"][table] = checkpoint["deleted_rows"].get(table, 0) + count
+            checkpoint["last_id"] = str(batch[-1][0])
+            checkpoint["batches"] += 1
+            _save_checkpoint(checkpoint)
+
+            # Keep each transaction near the time budget: shrink quickly, grow gently
+            took = time.monotonic() - batch_started
+            if took > target:
+                batch_size = max(settings.EXECUTION_CLEANUP_MIN_BATCH_SIZE, batch_size // 2)
+            elif took < target / 2:
+                batch_size = min(settings.EXECUTION_CLEANUP_MAX_BATCH_SIZE, int(batch_size * 1.5))
+
+        checkpoint["elapsed"] += time.monotonic() - started
+        rows = sum(checkpoint["deleted_rows"].values())
+        stats = {
+            "deleted_failed": checkpoint["deleted_failed"],
+            "deleted_successful": checkpoint["deleted_successful"],
+            "total_deleted": checkpoint["deleted_failed"] + checkpoint["deleted_successful"],
+            "deleted_rows": checkpoint["deleted_rows"],
+            "batches": checkpoint["batches"],
+            "elapsed_seconds": round(checkpoint["elapsed"], 2),
+            "rows_per_second": round(rows / checkpoint["elapsed"], 1) if checkpoint["elapsed"] else 0,
+            "finished": finished,
+        }
+
+        if finished:
+            cache.delete(CHECKPOINT_KEY)
+            cache.set(LAST_RUN_KEY, {**stats, "finished_at": timezone.now().isoformat()}, timeout=None)
+        else:
+            _save_checkpoint(checkpoint)
+    finally:
+        cache.delete(LOCK_KEY)
+
+    logger.info(
+        f"Execution cleanup {'finished' if finished else 'paused'}: {stats['total_deleted']} executions "
+        f"({rows} rows) in {stats['batches']} batches, {stats['rows_per_second']} rows/s"
+    )
+    return stats
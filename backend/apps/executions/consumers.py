@@ -0,0 +1,50 @@
+"""
+WebSocket consumers streaming execution events.
+"""
+
+import asyncio
+
+from channels.db import database_sync_to_async
+from channels.generic.websocket import AsyncWebsocketConsumer
+
+from .events import execution_status, stream_events
+
+
+class ExecutionEventConsumer(AsyncWebsocketConsumer):
+    """Streams the events of one of the user's runs, or of all of them when the URL names no execution.
+
+    Messages are the JSON events published by the engine. A single run's
+    socket is closed by the server once the run has finished.
+    """
+
+    stream = None
+
+    async def connect(self):
+        user = self.scope["user"]
+        if not user.is_authenticated:
+            await self.close()
+            return
+
+        execution_id = self.scope["url_route"]["kwargs"].get("execution_id")
+        if execution_id is not None:
+            execution_id = str(execution_id)
+            if await database_sync_to_async(execution_status)(execution_id, user.id) is None:
+                await self.close()
+                return
+
+        await self.accept()
+        self.stream = asyncio.create_task(self.forward(user.id, execution_id))
+
+    async def disconnect(self, code):
+        if self.stream is not None:
+            self.stream.cancel()
+
+    async def receive(self, text_data=None, bytes_data=None):
+        # The stream is one-way; anything a client sends is ignored
+        pass
+
+    async def forward(self, user_id, execution_id):
+        """Send every event of the stream, then close the socket once it ends."""
+        async for event in stream_events(user_id, execution_id):
+            await self.send(text_data=event)
+        await self.close()
@@ -0,0 +1,313 @@
+"""
+Execution event stream: the engine publishes run, node and log deltas to Redis pub/sub for WebSocket and SSE clients.
+"""
+
+import asyncio
+import json
+import logging
+import threading
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from functools import partial
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.utils import timezone
+from redis.exceptions import RedisError
+
+from .models import FINISHED_STATUSES, WorkflowExecution
+from .statestore import STORE_UNAVAILABLE, get_execution, get_live_execution
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "exec_events"
+
+# Changed fields carried by status events; input and output payloads stay behind the REST API
+DELTA_FIELDS = ("started_at", "completed_at", "error_message", "retry_count")
+
+# Executions whose owner a publishing process remembers, so node and log events need no lookup
+OWNER_CACHE_SIZE = 1024
+
+
+def _channel(user_id, execution_id):
+    """Channel of one run's events; the user in the name lets a client follow all of a user's runs by pattern."""
+    return f"{KEY_PREFIX}:{user_id}:{execution_id}"
+
+
+def _redis():
+    from django_redis import get_redis_connection
+
+    return get_redis_connection("default")
+
+
+def _delta(fields):
+    return {name: value for name, value in fields.items() if name in DELTA_FIELDS}
+
+
+class EventPublisher:
+    """Publishes execution events to Redis pub/sub once the current transaction commits.
+
+    Events are deltas: a status change carries only the new status and the
+    timestamps and error written with it. Nothing is stored, so a client that
+    connects late loads the run from the REST API and applies events on top.
+    """
+
+    def __init__(self):
+        self._owners = OrderedDict()
+        self._lock = threading.Lock()
+
+    def remember_owner(self, execution_id, user_id):
+        """Record who owns a run, sparing the lookup when its node and log events are published."""
+        with self._lock:
+            self._owners[str(execution_id)] = str(user_id)
+            self._owners.move_to_end(str(execution_id))
+            if len(self._owners) > OWNER_CACHE_SIZE:
+                self._owners.popitem(last=False)
+
+    def _owner(self, execution_id):
+        with self._lock:
+            user_id = self._owners.get(str(execution_id))
+        if user_id is not None:
+            return user_id
+
+        user_id = WorkflowExecution.objects.filter(pk=execution_id).values_list("user_id", flat=True).first()
+        if user_id is None:
+            try:
+                execution = get_execution(execution_id)
+            except STORE_UNAVAILABLE:
+                execution = None
+            user_id = execution.user_id if execution is not None else None
+        if user_id is not None:
+            self.remember_owner(execution_id, user_id)
+        return user_id
+
+    def publish(self, execution_id, event_type, data=None, user_id=None):
+        """Publish one event of a run."""
+        self.publish_many([(execution_id, event_type, data or {}, user_id)])
+
+    def publish_many(self, events):
+        """Publish ``(execution id, event type, data, user id or None)`` events in one round trip."""
+        if not settings.EXECUTION_EVENTS_ENABLED or not events:
+            return
+
+        now = timezone.now()
+        messages = []
+        for execution_id, event_type, data, user_id in events:
+            owner = user_id if user_id is not None else self._owner(execution_id)
+            if owner is None:
+                continue
+            payload = {"type": event_type, "execution_id": str(execution_id), "timestamp": now, **data}
+            messages.append((_channel(owner, execution_id), json.dumps(payload, cls=DjangoJSONEncoder)))
+
+        if messages:
+            # Deferred so a client never sees a change that is rolled back
+            transaction.on_commit(partial(self._send, messages))
+
+    def _send(self, messages):
+        try:
+            pipeline = _redis().pipeline(transaction=False)
+            for channel, message in messages:
+                pipeline.publish(channel, message)
+            pipeline.execute()
+        except STORE_UNAVAILABLE as e:
+            # Streams are best effort; clients fall back to the REST API
+            logger.warning(f"Failed to publish {len(messages)} execution events: {str(e)}")
+
+
+execution_events = EventPublisher()
+
+
+def publish_execution_change(execution, to_status, fields):
+    """Publish a run's status change, as written by a transition."""
+    execution_events.publish(
+        execution.pk,
+        "execution.finished" if to_status in FINISHED_STATUSES else "execution.updated",
+        {"status": to_status, **_delta(fields)},
+        user_id=execution.user_id,
+    )
+
+
+def publish_node_change(node_execution, to_status, fields):
+    """Publish a node's status change, as written by a transition."""
+    execution_events.publish(
+        node_execution.workflow_execution_id,
+        "node.started" if to_status == "running" else "node.finished",
+        {
+            "node_execution_id": str(node_execution.pk),
+            "node_id": str(node_execution.node_id),
+            "status": to_status,
+            **_delta(fields),
+        },
+    )
+
+
+def _log_event(execution_id, node_execution_id, level, message, data, timestamp):
+    return (
+        execution_id,
+        "log",
+        {
+            "node_execution_id": str(node_execution_id) if node_execution_id else None,
+            "level": level,
+            "message": message,
+            "data": data,
+            "logged_at": timestamp,
+        },
+        None,
+    )
+
+
+def publish_log(execution_id, node_execution_id, level, message, data, timestamp):
+    """Publish one log entry of a run."""
+    execution_events.publish_many([_log_event(execution_id, node_execution_id, level, message, data, timestamp)])
+
+
+def publish_logs(entries):
+    """Publish ExecutionLog entries, in one round trip."""
+    execution_events.publish_many(
+        [
+            _log_event(
+                entry.workflow_execution_id,
+                entry.node_execution_id,
+                entry.level,
+                entry.message,
+                entry.data,
+                entry.timestamp,
+            )
+            for entry in entries
+        ]
+    )
+
+
+def execution_status(execution_id, user_id):
+    """Get the status of a user's run, or None if the user has no such run."""
+    live = get_live_execution(execution_id, user_id)
+    if live is not None:
+        return live.status
+    try:
+        return (
+            WorkflowExecution.objects.filter(pk=execution_id, user_id=user_id).values_list("status", flat=True).first()
+        )
+    except (DjangoValidationError, ValueError):
+        return None
+
+
+class EventHub:
+    """Shares one Redis pub/sub connection among all the event streams an ASGI process serves.
+
+    Each stream subscribes to a channel pattern; the first stream on a pattern
+    subscribes the connection to it and the last one unsubscribes. A single
+    reader task parses each message once and hands it to every stream on a
+    matching pattern through a bounded queue. A stream that falls
+    EXECUTION_EVENTS_QUEUE_SIZE events behind is cut off rather than buffered
+    without limit; its client reconnects and reloads the run.
+    """
+
+    def __init__(self):
+        self.loop = asyncio.get_running_loop()
+        self._queues = {}
+        self._lock = asyncio.Lock()
+        self._client = None
+        self._pubsub = None
+        self._reader = None
+
+    @asynccontextmanager
+    async def subscribe(self, pattern):
+        queue = asyncio.Queue(maxsize=settings.EXECUTION_EVENTS_QUEUE_SIZE)
+        async with self._lock:
+            if self._pubsub is None:
+                from redis import asyncio as aioredis
+
+                self._client = aioredis.from_url(settings.REDIS_URL)
+                self._pubsub = self._client.pubsub()
+            if pattern not in self._queues:
+                await self._pubsub.psubscribe(pattern)
+                self._queues[pattern] = set()
+            self._queues[pattern].add(queue)
+            if self._reader is None:
+                self._reader = asyncio.create_task(self._read())
+
+        try:
+            yield queue
+        finally:
+            async with self._lock:
+                queues = self._queues.get(pattern, set())
+                queues.discard(queue)
+                if not queues:
+                    self._queues.pop(pattern, None)
+                    try:
+                        await self._pubsub.punsubscribe(pattern)
+                    except (RedisError, OSError) as e:
+                        logger.warning(f"Failed to unsubscribe from {pattern}: {str(e)}")
+
+    async def _read(self):
+        while True:
+            if not self._queues:
+                async with self._lock:
+                    if not self._queues:
+                        self._reader = None
+                        return
+            try:
+                message = await self._pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+            except (RedisError, OSError) as e:
+                logger.warning(f"Execution event subscription failed, retrying: {str(e)}")
+                await asyncio.sleep(1)
+                continue
+            if message is None or message["type"] != "pmessage":
+                continue
+
+            raw = message["data"].decode()
+            event = (json.loads(raw)["type"], raw)
+            for queue in list(self._queues.get(message["pattern"].decode(), ())):
+                try:
+                    queue.put_nowait(event)
+                except asyncio.QueueFull:
+                    # Drop what the slow stream has not read and tell it to stop
+                    while not queue.empty():
+                        queue.get_nowait()
+                    queue.put_nowait(None)
+
+
+_hub = None
+
+
+def get_hub():
+    """Get the event hub of the running event loop."""
+    global _hub
+
+    if _hub is None or _hub.loop is not asyncio.get_running_loop():
+        _hub = EventHub()
+    return _hub
+
+
+async def stream_events(user_id, execution_id=None, keepalive=None):
+    """Yield the JSON events of one of a user's runs, or of all of them when no execution id is given.
+
+    Yields None after ``keepalive`` seconds without events. A single run's
+    stream ends once the run has finished, immediately if it already had when
+    the stream started. Any stream ends if its client falls too far behind.
+    """
+    pattern = _channel(user_id, execution_id if execution_id is not None else "*")
+    async with get_hub().subscribe(pattern) as queue:
+        if execution_id is not None:
+            # Checked after subscribing, so a run finishing meanwhile is never missed
+            status = await sync_to_async(execution_status)(str(execution_id), user_id)
+            if status in FINISHED_STATUSES:
+                payload = {"type": "execution.finished", "execution_id": str(execution_id), "status": status}
+                yield json.dumps(payload)
+                return
+
+        while True:
+            try:
+                event = await asyncio.wait_for(queue.get(), timeout=keepalive)
+            except asyncio.TimeoutError:
+                yield None
+                continue
+            if event is None:
+                return
+            event_type, raw = event
+            yield raw
+            if execution_id is not None and event_type == "execution.finished":
+                return
@@ -0,0 +1,243 @@
+"""
+Execution liveness: workers publish heartbeats and deadlines to Redis, and a watchdog closes out runs that miss them.
+"""
+
+import logging
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.db import DatabaseError, connection, transaction
+from django.utils import timezone
+
+from .aggcache import bump_versions
+from .events import execution_events
+from .models import NodeExecution, WorkflowExecution
+from .statestore import OPEN_STATUSES, STORE_UNAVAILABLE, get_execution
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "exec_liveness"
+HEARTBEAT_KEY = f"{KEY_PREFIX}:heartbeat"  # execution id -> time by which the next heartbeat is due
+DEADLINE_KEY = f"{KEY_PREFIX}:deadline"  # execution id -> time by which the run must have finished
+
+# Atomically take up to ARGV[2] members scored at or below ARGV[1] off a sorted set, so
+# concurrent watchdogs never both handle the same run.
+# KEYS: sorted set. ARGV: now, limit.
+POP_EXPIRED_SCRIPT = """
+local ids = redis.call("ZRANGEBYSCORE", KEYS[1], "-inf", ARGV[1], "LIMIT", 0, ARGV[2])
+if #ids > 0 then
+    redis.call("ZREM", KEYS[1], unpack(ids))
+end
+return ids
+"""
+
+_pop_expired_script = None
+
+RETURNED_FIELDS = ("id", "workflow_id", "user_id", "status", "started_at", "completed_at")
+
+
+def _redis():
+    from django_redis import get_redis_connection
+
+    return get_redis_connection("default")
+
+
+class HeartbeatPublisher:
+    """Keeps the heartbeats of the runs this process is executing fresh, from a single background thread.
+
+    Every EXECUTION_HEARTBEAT_INTERVAL seconds the thread pushes each run's
+    heartbeat deadline EXECUTION_HEARTBEAT_TIMEOUT seconds ahead in one ZADD.
+    When the process dies the heartbeats stop, and the watchdog notices once
+    the deadline passes.
+    """
+
+    def __init__(self):
+        self._execution_ids = set()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def start(self, execution_id):
+        """Publish a run's first heartbeat and runtime deadline, and keep it beating until ``stop``."""
+        execution_id = str(execution_id)
+        now = time.time()
+        try:
+            pipeline = _redis().pipeline()
+            pipeline.zadd(HEARTBEAT_KEY, {execution_id: now + settings.EXECUTION_HEARTBEAT_TIMEOUT})
+            if settings.EXECUTION_MAX_RUNTIME:
+                pipeline.zadd(DEADLINE_KEY, {execution_id: now + settings.EXECUTION_MAX_RUNTIME}, nx=True)
+            pipeline.execute()
+        except STORE_UNAVAILABLE as e:
+            # monitor_long_running_executions still times the run out eventually
+            logger.warning(f"Heartbeat store unavailable, execution {execution_id} is not watched: {str(e)}")
+            return
+
+        with self._lock:
+            self._execution_ids.add(execution_id)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="execution-heartbeats", daemon=True)
+                self._thread.start()
+
+    def stop(self, execution_id):
+        """Stop beating for a run and withdraw its deadlines."""
+        execution_id = str(execution_id)
+        with self._lock:
+            self._execution_ids.discard(execution_id)
+        try:
+            _redis().pipeline().zrem(HEARTBEAT_KEY, execution_id).zrem(DEADLINE_KEY, execution_id).execute()
+        except STORE_UNAVAILABLE as e:
+            logger.warning(f"Heartbeat store unavailable, could not withdraw execution {execution_id}: {str(e)}")
+
+    def beat(self):
+        """Push the heartbeat deadline of every registered run forward. Returns how many runs were refreshed."""
+        with self._lock:
+            execution_ids = list(self._execution_ids)
+        if not execution_ids:
+            return 0
+
+        due = time.time() + settings.EXECUTION_HEARTBEAT_TIMEOUT
+        # XX: a run the watchdog has already taken stays dead rather than being revived
+        _redis().zadd(HEARTBEAT_KEY, {execution_id: due for execution_id in execution_ids}, xx=True)
+        return len(execution_ids)
+
+    def _run(self):
+        while True:
+            time.sleep(settings.EXECUTION_HEARTBEAT_INTERVAL)
+            try:
+                self.beat()
+            except Exception as e:
+                logger.error(f"Failed to publish execution heartbeats: {str(e)}")
+            with self._lock:
+                if not self._execution_ids:
+                    self._thread = None
+                    return
+
+
+heartbeats = HeartbeatPublisher()
+
+
+def _pop_expired(key, now, limit):
+    global _pop_expired_script
+
+    if _pop_expired_script is None:
+        _pop_expired_script = _redis().register_script(POP_EXPIRED_SCRIPT)
+    return [execution_id.decode() for execution_id in _pop_expired_script(keys=[key], args=[now, limit])]
+
+
+def close_executions(to_status, error_message, execution_ids=None, started_before=None):
+    """Move open executions to ``to_status`` with one ``UPDATE ... RETURNING`` and close out their nodes.
+
+    Selects executions by id, or by start time for the periodic sweep. Each
+    run's in-flight node moves to ``to_status`` as well and the nodes that
+    never started are skipped, set-based too, and each run's change is
+    published to the event stream.
+    Returns the executions that were changed, loaded with the fields the
+    metrics rollups need.
+    """
+    from .rollups import record_finished_executions
+
+    opts = WorkflowExecution._meta
+    quote = connection.ops.quote_name
+    now = timezone.now()
+
+    conditions = [f"{quote('status')} IN ({', '.join(['%s'] * len(OPEN_STATUSES))})"]
+    params = [to_status, opts.get_field("completed_at").get_db_prep_value(now, connection), error_message]
+    params.extend(OPEN_STATUSES)
+    if execution_ids is not None:
+        if not execution_ids:
+            return []
+        conditions.append(f"{quote('id')} IN ({', '.join(['%s'] * len(execution_ids))})")
+        params.extend(opts.pk.get_db_prep_value(uuid.UUID(str(pk)), connection) for pk in execution_ids)
+    if started_before is not None:
+        conditions.append(f"{quote('started_at')} < %s")
+        params.append(opts.get_field("started_at").get_db_prep_value(started_before, connection))
+
+    sql = (
+        f"UPDATE {quote(opts.db_table)} "
+        f"SET {quote('status')} = %s, {quote('completed_at')} = %s, {quote('error_message')} = %s "
+        f"WHERE {' AND '.join(conditions)} "
+        f"RETURNING {', '.join(quote(name) for name in RETURNED_FIELDS)}"
+    )
+
+    with transaction.atomic():
+        executions = list(WorkflowExecution.objects.raw(sql, params))
+        if not executions:
+            return []
+
+        ids = [execution.pk for execution in executions]
+        # Nodes stay pending until they finish; each run's in-flight node takes the run's status
+        nodes = NodeExecution.objects.filter(workflow_execution_id__in=ids)
+        nodes.filter(pk__in=NodeExecution.in_flight_ids(ids), status__in=OPEN_STATUSES).update(
+            status=to_status, completed_at=now, error_message=error_message
+        )
+        nodes.filter(status="pending").update(status="skipped", completed_at=now)
+        WorkflowExecution.recount_node_counters(WorkflowExecution.objects.filter(pk__in=ids))
+
+        try:
+            with transaction.atomic():
+                record_finished_executions(executions)
+        except DatabaseError as e:
+            # Rollups are derived data; reconciliation repairs the missed increments
+            logger.error(f"Error updating rollups for {len(executions)} closed executions: {str(e)}")
+        bump_versions(execution.user_id for execution in executions)
+        execution_events.publish_many(
+            [
+                (
+                    execution.pk,
+                    "execution.finished",
+                    {"status": to_status, "completed_at": now, "error_message": error_message},
+                    execution.user_id,
+                )
+                for execution in executions
+            ]
+        )
+
+    return executions
+
+
+def _close(execution_ids, to_status, error_message):
+    """Close out runs by id, in the database or, for write-behind runs, in the state store."""
+    if not execution_ids:
+        return 0
+
+    closed = close_executions(to_status, error_message, execution_ids=execution_ids)
+    for execution in closed:
+        logger.warning(f"Marked execution {execution.pk} as {to_status}: {error_message}")
+
+    # Write-behind runs are only in the state store until they finish
+    count = len(closed)
+    for execution_id in set(execution_ids) - {str(execution.pk) for execution in closed}:
+        execution = get_execution(execution_id)
+        if execution is not None and execution.status in OPEN_STATUSES:
+            count += execution.finish(to_status, stop_in_flight=True, error_message=error_message)
+    return count
+
+
+def reap_dead_executions(batch_size=None):
+    """Fail runs whose heartbeats lapsed and time out runs past their runtime deadline.
+
+    Expired entries are popped from the sorted sets, so the executions table
+    is never scanned. A run that finished normally has already withdrawn its
+    entries, and the status guard in the UPDATE leaves any that finished
+    since untouched.
+    """
+    batch_size = batch_size or settings.EXECUTION_WATCHDOG_BATCH_SIZE
+    now = time.time()
+    overdue = _pop_expired(DEADLINE_KEY, now, batch_size)
+    lapsed = [
+        execution_id for execution_id in _pop_expired(HEARTBEAT_KEY, now, batch_size) if execution_id not in overdue
+    ]
+
+    # A run taken off one set is handled now; drop it from the other so it is not handled twice
+    pipeline = _redis().pipeline()
+    if overdue:
+        pipeline.zrem(HEARTBEAT_KEY, *overdue)
+    if lapsed:
+        pipeline.zrem(DEADLINE_KEY, *lapsed)
+    pipeline.execute()
+
+    return {
+        "timed_out": _close(overdue, "timeout", f"Execution timed out after {settings.EXECUTION_MAX_RUNTIME} seconds"),
+        "failed": _close(lapsed, "failed", "Execution stopped sending heartbeats; its worker is presumed dead"),
+    }
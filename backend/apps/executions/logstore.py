@@ -0,0 +1,84 @@
+"""
+Buffered writer for the append-only execution log store.
+"""
+
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .events import publish_logs
+from .models import ExecutionLog
+
+logger = logging.getLogger(__name__)
+
+
+class LogBuffer:
+    """Collects execution log entries in memory and writes them with one bulk insert.
+
+    The engine flushes at node boundaries; in between, a flush also happens once
+    the buffer reaches EXECUTION_LOG_BUFFER_SIZE entries or has been held for
+    EXECUTION_LOG_FLUSH_INTERVAL seconds. The interval is only checked when an
+    entry is appended, not by a timer: a flush from another thread would write
+    over its own database connection, outside the task's transaction. Entries
+    that fail to write are retried with the next flush, then dropped.
+    """
+
+    def __init__(self):
+        self._entries = []
+        # Entries whose first write failed, retried once with the next flush
+        self._retry = []
+        self._lock = threading.Lock()
+        self._last_flush = time.monotonic()
+
+    def append(self, workflow_execution_id, node_execution_id, level, message, data=None):
+        """Buffer a log entry, flushing if the buffer is full or overdue."""
+        entry = ExecutionLog(
+            workflow_execution_id=workflow_execution_id,
+            node_execution_id=node_execution_id,
+            level=level,
+            message=message,
+            data=data or {},
+            timestamp=timezone.now(),
+        )
+        with self._lock:
+            self._entries.append(entry)
+            due = (
+                len(self._entries) >= settings.EXECUTION_LOG_BUFFER_SIZE
+                or time.monotonic() - self._last_flush >= settings.EXECUTION_LOG_FLUSH_INTERVAL
+            )
+        if due:
+            self.flush()
+
+    def flush(self):
+        """Write every buffered entry. Returns the number of entries written."""
+        with self._lock:
+            retried, self._retry = self._retry, []
+            entries, self._entries = self._entries, []
+            self._last_flush = time.monotonic()
+
+        if not retried and not entries:
+            return 0
+
+        try:
+            # Atomic, so a failed batch leaves no partial write behind to duplicate on retry
+            with transaction.atomic():
+                ExecutionLog.objects.bulk_create(retried + entries, batch_size=500)
+        except Exception as e:
+            if retried:
+                logger.error(f"Dropping {len(retried)} execution log entries that failed to write twice: {str(e)}")
+            if entries:
+                logger.warning(f"Failed to write {len(entries)} execution log entries, retrying: {str(e)}")
+                with self._lock:
+                    self._retry = entries
+            return 0
+
+        # Streamed in the same batches they are written in
+        publish_logs(retried + entries)
+        return len(retried) + len(entries)
+
+
+log_buffer = LogBuffer()
@@ -0,0 +1,36 @@
+"""
+Management command to fill in the node progress counters of executions recorded before they existed.
+"""
+
+from django.core.management.base import BaseCommand
+
+from apps.executions.models import WorkflowExecution
+
+
+class Command(BaseCommand):
+    help = "Count the node executions of executions whose progress counters were never set"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Executions updated per UPDATE statement",
+        )
+
+    def handle(self, *args, **options):
+        """Recount the node executions of executions with no counted nodes, in batches."""
+        batch_size = options["batch_size"]
+        pending = WorkflowExecution.objects.filter(total_nodes=0).order_by("pk").values_list("pk", flat=True)
+
+        updated = 0
+        last_pk = None
+        while True:
+            batch = pending.filter(pk__gt=last_pk) if last_pk is not None else pending
+            ids = list(batch[:batch_size])
+            if not ids:
+                break
+            last_pk = ids[-1]
+            updated += WorkflowExecution.recount_node_counters(WorkflowExecution.objects.filter(pk__in=ids))
+
+        self.stdout.write(self.style.SUCCESS(f"Recounted node executions of {updated} executions"))
@@ -0,0 +1,79 @@
+"""
+Management command to maintain monthly partitions of the execution history tables.
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.executions.partitioning import (
+    PARTITIONED_TABLES,
+    convert_tables,
+    drop_expired_partitions,
+    ensure_partitions,
+    is_partitioned,
+    is_supported,
+    list_partitions,
+)
+
+
+class Command(BaseCommand):
+    help = "Create future monthly partitions of the execution tables, converting or pruning them on request"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--convert",
+            action="store_true",
+            help="Rebuild unpartitioned execution tables as partitioned tables (locks them while copying)",
+        )
+        parser.add_argument(
+            "--months-ahead",
+            type=int,
+            default=None,
+            help="Months of partitions to keep ready ahead of the current one",
+        )
+        parser.add_argument(
+            "--drop-expired",
+            action="store_true",
+            help="Detach and drop partitions older than the retention period",
+        )
+        parser.add_argument(
+            "--retention-days",
+            type=int,
+            default=None,
+            help=(
+                "Retention period for --drop-expired (defaults to EXECUTION_PARTITION_RETENTION_DAYS); "
+                "never shorter than the execution retention"
+            ),
+        )
+        parser.add_argument(
+            "--confirm",
+            action="store_true",
+            help="Required with --convert and --drop-expired, which rewrite or drop execution history tables",
+        )
+
+    def handle(self, *args, **options):
+        """Create, convert and drop partitions."""
+        if not is_supported():
+            raise CommandError("Table partitioning requires PostgreSQL")
+        if (options["convert"] or options["drop_expired"]) and not options["confirm"]:
+            # Both rewrite or drop the execution history; take a backup and rehearse on a copy first
+            raise CommandError("--convert and --drop-expired change the execution tables; pass --confirm to proceed")
+
+        if options["convert"]:
+            for table in convert_tables(months_ahead=options["months_ahead"]):
+                self.stdout.write(self.style.SUCCESS(f"Converted {table} to a partitioned table"))
+
+        unpartitioned = [table for table in PARTITIONED_TABLES if not is_partitioned(table)]
+        if unpartitioned:
+            self.stdout.write(self.style.WARNING(f"Not partitioned (run with --convert): {', '.join(unpartitioned)}"))
+
+        for name in ensure_partitions(months_ahead=options["months_ahead"]):
+            self.stdout.write(f"Created partition {name}")
+
+        if options["drop_expired"]:
+            for name in drop_expired_partitions(retention_days=options["retention_days"]):
+                self.stdout.write(f"Dropped partition {name}")
+
+        for table in PARTITIONED_TABLES:
+            if table not in unpartitioned:
+                months = [f"{month:%Y-%m}" for _, month in list_partitions(table)]
+                self.stdout.write(f"{table}: {', '.join(months) or 'no partitions'}")
@@ -6,6 +6,7 @@ from django.db import transaction
 from django.utils import timezone
 from faker import Faker
 
+from apps.executions.logstore import log_buffer
 from apps.executions.models import ExecutionMetrics, NodeExecution, WorkflowExecution
 from apps.integrations.models import (
     IntegrationCategory,
@@ -97,22 +98,27 @@ class Command(BaseCommand):
                 if status == WorkflowExecution.STATUS_CHOICES[1][0]:
                     end_time = None
 
+                nodes = list(workflow.nodes.all())
                 execution = WorkflowExecution.objects.create(
                     workflow=workflow,
                     user=workflow.owner,
                     started_at=start_time,
                     completed_at=end_time,
                     status=status,
+                    total_nodes=len(nodes),
+                    finished_nodes=len(nodes) if status == "completed" else 0,
                 )
 
                 # Create logs for node executions
-                for node in workflow.nodes.all():
+                for node in nodes:
                     node_execution = NodeExecution.objects.create(
                         workflow_execution=execution,
                         node=node,
                         status="completed" if status == "completed" else "pending",
                     )
-                    node_execution.add_log("INFO", f"Node {node.name} executed.")
+                    node_execution.add_log("info", f"Node {node.name} executed.")
+                # add_log only buffers; write the execution's entries before moving on
+                log_buffer.flush()
 
                 # Create metrics
                 if status == "completed":
@@ -2,17 +2,52 @@
 Execution models for workflow execution tracking and monitoring.
 """
 
+import logging
 import uuid
+from datetime import timedelta
 
 from django.contrib.auth import get_user_model
-from django.db import models
+from django.db import DatabaseError, models
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
 from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
+logger = logging.getLogger(__name__)
+
 User = get_user_model()
 
+FINISHED_STATUSES = ["completed", "failed", "cancelled", "timeout"]
+
+# Node statuses counted as progress of their execution
+NODE_PROGRESS_STATUSES = ["completed", "failed", "skipped", "cancelled", "timeout"]
+
+
+class StateTransitionMixin:
+    """Status changes written as one guarded ``UPDATE ... WHERE status IN (...)`` of only the changed columns."""
+
+    def transition(self, to_status, from_statuses, **fields):
+        """Move to ``to_status`` if the row is still in one of ``from_statuses``.
 
-class WorkflowExecution(models.Model):
+        Returns False and leaves the instance untouched when another writer
+        (for example a cancellation) changed the status first.
+        """
+        updated = type(self).objects.filter(pk=self.pk, status__in=from_statuses).update(status=to_status, **fields)
+        if not updated:
+            return False
+
+        self.status = to_status
+        for name, value in fields.items():
+            setattr(self, name, value)
+        return True
+
+    def refresh_status(self):
+        """Reload the status, e.g. after losing a transition to another writer."""
+        self.status = type(self).objects.values_list("status", flat=True).get(pk=self.pk)
+        return self.status
+
+
+class WorkflowExecution(StateTransitionMixin, models.Model):
     """Tracks individual workflow executions."""
 
     STATUS_CHOICES = [
@@ -48,6 +83,10 @@ class WorkflowExecution(models.Model):
         default="manual",
     )
     execution_context = models.JSONField(_("execution context"), default=dict)
+    # Progress counters, incremented in place as node executions are created and finish
+    total_nodes = models.PositiveIntegerField(_("total nodes"), default=0)
+    finished_nodes = models.PositiveIntegerField(_("finished nodes"), default=0)
+    failed_nodes = models.PositiveIntegerField(_("failed nodes"), default=0)
 
     class Meta:
         verbose_name = _("Workflow Execution")
@@ -56,6 +95,7 @@ class WorkflowExecution(models.Model):
         ordering = ["-started_at"]
         indexes = [
             models.Index(fields=["workflow", "status"]),
+            models.Index(fields=["workflow", "started_at"]),
             models.Index(fields=["user", "started_at"]),
             models.Index(fields=["status", "started_at"]),
         ]
@@ -80,6 +120,41 @@ class WorkflowExecution(models.Model):
         """Check if execution is completed (success or failure)."""
         return self.status in ["completed", "failed", "cancelled", "timeout"]
 
+    @property
+    def progress_percentage(self):
+        """Get the share of node executions that have finished, from the progress counters."""
+        if not self.total_nodes:
+            return 0
+        return round((self.finished_nodes / self.total_nodes) * 100, 2)
+
+    @staticmethod
+    def update_node_counters(execution_id, total=0, finished=0, failed=0):
+        """Add to an execution's progress counters in a single atomic UPDATE."""
+        increments = {"total_nodes": total, "finished_nodes": finished, "failed_nodes": failed}
+        counters = {name: F(name) + value for name, value in increments.items() if value}
+        if counters:
+            WorkflowExecution.objects.filter(pk=execution_id).update(**counters)
+
+    @staticmethod
+    def recount_node_counters(executions):
+        """Recompute the progress counters of a queryset of executions from their node executions, in one UPDATE."""
+
+        def node_count(**filters):
+            counts = (
+                NodeExecution.objects.filter(workflow_execution=OuterRef("pk"), **filters)
+                .order_by()
+                .values("workflow_execution")
+                .annotate(count=Count("id"))
+                .values("count")
+            )
+            return Coalesce(Subquery(counts, output_field=models.IntegerField()), 0)
+
+        return executions.update(
+            total_nodes=node_count(),
+            finished_nodes=node_count(status__in=NODE_PROGRESS_STATUSES),
+            failed_nodes=node_count(status="failed"),
+        )
+
     @property
     def success_rate(self):
         """Get success rate for this workflow."""
@@ -89,23 +164,77 @@ class WorkflowExecution(models.Model):
         successful = self.workflow.executions.filter(status="completed").count()
         return (successful / total) * 100
 
+    def transition(self, to_status, from_statuses, **fields):
+        """Move to ``to_status`` if the row is still in one of ``from_statuses``.
+
+        Also invalidates the user's cached aggregates, publishes the change to
+        the event stream, and reaching a terminal status counts the execution
+        in the metrics rollups.
+        """
+        from .aggcache import bump_version
+        from .events import publish_execution_change
+
+        if not super().transition(to_status, from_statuses, **fields):
+            return False
+
+        bump_version(self.user_id)
+        publish_execution_change(self, to_status, fields)
+
+        if to_status in FINISHED_STATUSES:
+            from .rollups import record_finished_executions
+
+            try:
+                record_finished_executions([self])
+            except DatabaseError as e:
+                # Rollups are derived data; reconciliation repairs the missed increment
+                logger.error(f"Error updating rollups for execution {self.pk}: {str(e)}")
+        return True
+
     def mark_as_completed(self, output_data=None):
         """Mark execution as completed."""
-        self.status = "completed"
-        self.completed_at = timezone.now()
+        fields = {"completed_at": timezone.now()}
         if output_data:
-            self.output_data = output_data
-        self.save()
+            fields["output_data"] = output_data
+        return self.transition("completed", ["pending", "running"], **fields)
 
     def mark_as_failed(self, error_message):
         """Mark execution as failed."""
-        self.status = "failed"
-        self.completed_at = timezone.now()
-        self.error_message = error_message
-        self.save()
-
-
-class NodeExecution(models.Model):
+        return self.transition(
+            "failed",
+            ["pending", "running"],
+            completed_at=timezone.now(),
+            error_message=error_message,
+        )
+
+    def skip_pending_nodes(self, in_flight_status=None, **fields):
+        """Mark node executions that never started as skipped, counting them as finished.
+
+        When the run is stopped from outside the engine, pass ``in_flight_status``:
+        the node the engine is executing is still pending, and it moves to that
+        status with ``fields`` instead of being skipped, as its side effects may
+        already have happened.
+        """
+        now = timezone.now()
+        stopped = 0
+        if in_flight_status is not None:
+            node_execution = NodeExecution.objects.filter(pk__in=NodeExecution.in_flight_ids([self.pk])).first()
+            if node_execution is not None:
+                stopped = node_execution.transition(
+                    in_flight_status, ["pending", "running"], completed_at=now, **fields
+                )
+
+        skipped = self.node_executions.filter(status="pending").update(status="skipped", completed_at=now)
+        if skipped:
+            WorkflowExecution.update_node_counters(self.pk, finished=skipped)
+        # Keep a loaded instance in step, without loading a deferred counter
+        if "finished_nodes" in self.__dict__:
+            self.finished_nodes += skipped + stopped
+        if stopped and in_flight_status == "failed" and "failed_nodes" in self.__dict__:
+            self.failed_nodes += 1
+        return skipped
+
+
+class NodeExecution(StateTransitionMixin, models.Model):
     """Tracks individual node executions within a workflow execution."""
 
     STATUS_CHOICES = [
@@ -114,11 +243,18 @@ class NodeExecution(models.Model):
         ("completed", _("Completed")),
         ("failed", _("Failed")),
         ("skipped", _("Skipped")),
+        ("cancelled", _("Cancelled")),
         ("timeout", _("Timeout")),
     ]
 
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
-    workflow_execution = models.ForeignKey(WorkflowExecution, on_delete=models.CASCADE, related_name="node_executions")
+    # No database-level constraint: a partitioned workflow_executions table cannot be referenced by ID alone
+    workflow_execution = models.ForeignKey(
+        WorkflowExecution,
+        on_delete=models.CASCADE,
+        related_name="node_executions",
+        db_constraint=False,
+    )
     node = models.ForeignKey("workflows.WorkflowNode", on_delete=models.CASCADE, related_name="executions")
     status = models.CharField(_("status"), max_length=20, choices=STATUS_CHOICES, default="pending")
     input_data = models.JSONField(_("input data"), default=dict)
@@ -127,7 +263,11 @@ class NodeExecution(models.Model):
     completed_at = models.DateTimeField(_("completed at"), null=True, blank=True)
     error_message = models.TextField(_("error message"), blank=True)
     retry_count = models.PositiveIntegerField(_("retry count"), default=0)
+    # Superseded by ExecutionLog and no longer written; rows recorded before it still hold their entries here
     execution_logs = models.JSONField(_("execution logs"), default=list)
+    prompt_tokens = models.PositiveIntegerField(_("prompt tokens"), default=0)
+    completion_tokens = models.PositiveIntegerField(_("completion tokens"), default=0)
+    provider_latency_ms = models.PositiveIntegerField(_("provider latency (ms)"), null=True, blank=True)
 
     class Meta:
         verbose_name = _("Node Execution")
@@ -136,6 +276,7 @@ class NodeExecution(models.Model):
         ordering = ["started_at"]
         indexes = [
             models.Index(fields=["workflow_execution", "status"]),
+            models.Index(fields=["workflow_execution", "started_at"]),
             models.Index(fields=["node", "started_at"]),
         ]
 
@@ -157,33 +298,205 @@ class NodeExecution(models.Model):
     @property
     def is_completed(self):
         """Check if node execution is completed."""
-        return self.status in ["completed", "failed", "skipped", "timeout"]
+        return self.status in ["completed", "failed", "skipped", "cancelled", "timeout"]
+
+    @staticmethod
+    def in_flight_ids(execution_ids):
+        """Get the ids of the node executions the engine is running for the given executions.
+
+        Nodes stay pending until their single outcome update, and the engine runs
+        them one at a time in plan order, so a run's in-flight node is its first
+        pending one. Between two nodes that is the node about to be dispatched.
+        Only a node run outside execute_workflow, such as a single-node retry,
+        is written as running when it starts.
+        """
+        in_flight = {}
+        open_nodes = (
+            NodeExecution.objects.filter(workflow_execution_id__in=execution_ids, status__in=["pending", "running"])
+            .order_by("node__position_x", "node__position_y")
+            .values_list("workflow_execution_id", "id", "status")
+        )
+        for execution_id, node_execution_id, status in open_nodes:
+            if status == "running":
+                in_flight[execution_id] = node_execution_id
+            else:
+                in_flight.setdefault(execution_id, node_execution_id)
+        return list(in_flight.values())
+
+    def transition(self, to_status, from_statuses, **fields):
+        """Move to ``to_status`` if the row is still in one of ``from_statuses``.
+
+        Finishing also counts the node in its execution's progress counters;
+        the status guard lets that happen only once per node. The change is
+        published to the event stream.
+        """
+        from .events import publish_node_change
+
+        if not super().transition(to_status, from_statuses, **fields):
+            return False
+
+        publish_node_change(self, to_status, fields)
+
+        if to_status in NODE_PROGRESS_STATUSES:
+            WorkflowExecution.update_node_counters(
+                self.workflow_execution_id, finished=1, failed=1 if to_status == "failed" else 0
+            )
+        return True
 
     def add_log(self, level, message, data=None):
-        """Add a log entry to the execution logs."""
-        log_entry = {
-            "timestamp": timezone.now().isoformat(),
-            "level": level,
-            "message": message,
-            "data": data or {},
-        }
-        self.execution_logs.append(log_entry)
-        self.save()
+        """Add a log entry to the buffered, append-only execution log store."""
+        from .logstore import log_buffer
 
-    def mark_as_completed(self, output_data=None):
-        """Mark node execution as completed."""
-        self.status = "completed"
-        self.completed_at = timezone.now()
+        log_buffer.append(self.workflow_execution_id, self.id, level, message, data)
+
+    @property
+    def total_tokens(self):
+        """Get the total number of provider tokens used."""
+        return self.prompt_tokens + self.completion_tokens
+
+    def record_usage(self, prompt_tokens=0, completion_tokens=0, latency_ms=None):
+        """Record provider token usage and latency."""
+        self.prompt_tokens = prompt_tokens
+        self.completion_tokens = completion_tokens
+        self.provider_latency_ms = latency_ms
+        self.save(update_fields=["prompt_tokens", "completion_tokens", "provider_latency_ms"])
+
+    def mark_as_completed(self, output_data=None, **fields):
+        """Mark node execution as completed, writing any extra ``fields`` in the same update."""
+        fields["completed_at"] = timezone.now()
         if output_data:
-            self.output_data = output_data
-        self.save()
+            fields["output_data"] = output_data
+        return self.transition("completed", ["pending", "running"], **fields)
+
+    def mark_as_failed(self, error_message, **fields):
+        """Mark node execution as failed, writing any extra ``fields`` in the same update."""
+        return self.transition(
+            "failed",
+            ["pending", "running"],
+            completed_at=timezone.now(),
+            error_message=error_message,
+            **fields,
+        )
+
+
+class ExecutionLog(models.Model):
+    """Append-only log entry written during a workflow execution."""
+
+    LEVEL_CHOICES = [
+        ("debug", _("Debug")),
+        ("info", _("Info")),
+        ("warning", _("Warning")),
+        ("error", _("Error")),
+        ("critical", _("Critical")),
+    ]
 
-    def mark_as_failed(self, error_message):
-        """Mark node execution as failed."""
-        self.status = "failed"
-        self.completed_at = timezone.now()
-        self.error_message = error_message
-        self.save()
+    # No database-level constraints, as the referenced tables may be partitioned (see partitioning.py)
+    workflow_execution = models.ForeignKey(
+        WorkflowExecution,
+        on_delete=models.CASCADE,
+        related_name="logs",
+        db_constraint=False,
+    )
+    node_execution = models.ForeignKey(
+        NodeExecution,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name="logs",
+        db_constraint=False,
+    )
+    level = models.CharField(_("level"), max_length=20, choices=LEVEL_CHOICES, default="info")
+    message = models.TextField(_("message"))
+    data = models.JSONField(_("data"), default=dict)
+    timestamp = models.DateTimeField(_("timestamp"), default=timezone.now)
+
+    class Meta:
+        verbose_name = _("Execution Log")
+        verbose_name_plural = _("Execution Logs")
+        db_table = "execution_logs"
+        ordering = ["id"]
+        indexes = [
+            models.Index(fields=["workflow_execution", "id"]),
+            models.Index(fields=["node_execution", "id"]),
+        ]
+
+    def __str__(self):
+        return f"{self.level} - {self.message[:50]}"
+
+
+class ExecutionTrace(models.Model):
+    """Timing spans of one execution, recorded by the engine and its node tasks.
+
+    Spans are stored as compact rows, ``[span id, parent span id, name, start
+    offset (µs), duration (µs), attributes, error]``, with offsets counted from
+    ``started_at``; see tracing.py.
+    """
+
+    # No database-level constraint, as the referenced table may be partitioned (see partitioning.py)
+    workflow_execution = models.OneToOneField(
+        WorkflowExecution,
+        on_delete=models.CASCADE,
+        related_name="trace",
+        db_constraint=False,
+    )
+    trace_id = models.CharField(_("trace id"), max_length=32)
+    started_at = models.DateTimeField(_("started at"))
+    duration_ms = models.PositiveIntegerField(_("duration (ms)"), default=0)
+    span_count = models.PositiveIntegerField(_("span count"), default=0)
+    spans = models.JSONField(_("spans"), default=list)
+
+    class Meta:
+        verbose_name = _("Execution Trace")
+        verbose_name_plural = _("Execution Traces")
+        db_table = "execution_traces"
+        ordering = ["-started_at"]
+        indexes = [
+            models.Index(fields=["started_at"]),
+        ]
+
+    def __str__(self):
+        return f"{self.workflow_execution_id} - {self.span_count} spans"
+
+
+class ExecutionProfile(models.Model):
+    """Aggregated profile of an execution run with profiling enabled; see profiling.py.
+
+    ``functions`` holds the top functions by cumulative time as ``[function,
+    calls, self seconds, cumulative seconds]`` rows, summed over the run's
+    tasks. Sampled profiles do not count calls.
+    """
+
+    MODE_CHOICES = [
+        ("sampling", _("Sampling")),
+        ("deterministic", _("Deterministic")),
+    ]
+
+    # No database-level constraint, as the referenced table may be partitioned (see partitioning.py)
+    workflow_execution = models.OneToOneField(
+        WorkflowExecution,
+        on_delete=models.CASCADE,
+        related_name="profile",
+        db_constraint=False,
+    )
+    mode = models.CharField(_("mode"), max_length=20, choices=MODE_CHOICES)
+    duration_ms = models.PositiveIntegerField(_("profiled time (ms)"), default=0)
+    sample_count = models.PositiveIntegerField(_("sample count"), default=0)
+    sample_interval_ms = models.FloatField(_("sample interval (ms)"), null=True, blank=True)
+    task_count = models.PositiveIntegerField(_("task count"), default=0)
+    functions = models.JSONField(_("functions"), default=list)
+    created_at = models.DateTimeField(_("created at"), auto_now_add=True)
+
+    class Meta:
+        verbose_name = _("Execution Profile")
+        verbose_name_plural = _("Execution Profiles")
+        db_table = "execution_profiles"
+        ordering = ["-created_at"]
+        indexes = [
+            models.Index(fields=["created_at"]),
+        ]
+
+    def __str__(self):
+        return f"{self.workflow_execution_id} - {self.mode}"
 
 
 class ExecutionMetrics(models.Model):
@@ -227,3 +540,206 @@ class ExecutionMetrics(models.Model):
         if self.total_executions == 0:
             return 0
         return (self.failed_executions / self.total_executions) * 100
+
+
+class ExecutionRollup(models.Model):
+    """Execution counts and durations of a workflow over one hour or day, kept current as executions finish.
+
+    Executions are bucketed by start time. Rows are incremented atomically when
+    an execution finishes and periodically recomputed from the executions
+    themselves to repair drift.
+    """
+
+    GRANULARITY_CHOICES = [
+        ("hour", _("Hour")),
+        ("day", _("Day")),
+    ]
+
+    workflow = models.ForeignKey("workflows.Workflow", on_delete=models.CASCADE, related_name="rollups")
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="execution_rollups")
+    granularity = models.CharField(_("granularity"), max_length=10, choices=GRANULARITY_CHOICES)
+    period_start = models.DateTimeField(_("period start"))
+    total_executions = models.PositiveIntegerField(_("total executions"), default=0)
+    successful_executions = models.PositiveIntegerField(_("successful executions"), default=0)
+    failed_executions = models.PositiveIntegerField(_("failed executions"), default=0)
+    total_duration = models.DurationField(_("total duration"), default=timedelta)
+    max_duration = models.DurationField(_("max duration"), default=timedelta)
+    # Log-scale latency histogram, see histograms.py
+    duration_histogram = models.BinaryField(_("duration histogram"), default=bytes)
+    updated_at = models.DateTimeField(_("updated at"), auto_now=True)
+
+    class Meta:
+        verbose_name = _("Execution Rollup")
+        verbose_name_plural = _("Execution Rollups")
+        db_table = "execution_rollups"
+        ordering = ["-period_start"]
+        unique_together = ["workflow", "granularity", "period_start"]
+        indexes = [
+            models.Index(fields=["user", "granularity", "period_start"]),
+        ]
+
+    def __str__(self):
+        return f"{self.workflow.name} - {self.granularity} {self.period_start.strftime('%Y-%m-%d %H:%M')}"
+
+    @property
+    def avg_duration(self):
+        """Get the average duration of the period's executions."""
+        if self.total_executions == 0:
+            return None
+        return self.total_duration / self.total_executions
+
+    @property
+    def success_rate(self):
+        """Calculate success rate."""
+        if self.total_executions == 0:
+            return 0
+        return (self.successful_executions / self.total_executions) * 100
+
+    @property
+    def duration_percentiles(self):
+        """Get p50, p90 and p99 durations in seconds from the latency histogram."""
+        from .histograms import from_bytes, percentile_summary
+
+        return percentile_summary(from_bytes(self.duration_histogram), self.max_duration)
+
+
+class NodeExecutionRollup(models.Model):
+    """Execution counts and latency histogram of a workflow node over one hour or day.
+
+    Maintained like ExecutionRollup, from the node executions of each finished run.
+    """
+
+    node = models.ForeignKey("workflows.WorkflowNode", on_delete=models.CASCADE, related_name="rollups")
+    workflow = models.ForeignKey("workflows.Workflow", on_delete=models.CASCADE, related_name="node_rollups")
+    granularity = models.CharField(_("granularity"), max_length=10, choices=ExecutionRollup.GRANULARITY_CHOICES)
+    period_start = models.DateTimeField(_("period start"))
+    total_executions = models.PositiveIntegerField(_("total executions"), default=0)
+    successful_executions = models.PositiveIntegerField(_("successful executions"), default=0)
+    failed_executions = models.PositiveIntegerField(_("failed executions"), default=0)
+    total_duration = models.DurationField(_("total duration"), default=timedelta)
+    max_duration = models.DurationField(_("max duration"), default=timedelta)
+    duration_histogram = models.BinaryField(_("duration histogram"), default=bytes)
+    # Size of the JSON input and output payloads, summed over the period
+    input_bytes = models.PositiveBigIntegerField(_("input bytes"), default=0)
+    output_bytes = models.PositiveBigIntegerField(_("output bytes"), default=0)
+    updated_at = models.DateTimeField(_("updated at"), auto_now=True)
+
+    class Meta:
+        verbose_name = _("Node Execution Rollup")
+        verbose_name_plural = _("Node Execution Rollups")
+        db_table = "node_execution_rollups"
+        ordering = ["-period_start"]
+        unique_together = ["node", "granularity", "period_start"]
+        indexes = [
+            models.Index(fields=["workflow", "granularity", "period_start"]),
+        ]
+
+    def __str__(self):
+        return f"{self.node.name} - {self.granularity} {self.period_start.strftime('%Y-%m-%d %H:%M')}"
+
+    @property
+    def avg_duration(self):
+        """Get the average duration of the period's node executions."""
+        if self.total_executions == 0:
+            return None
+        return self.total_duration / self.total_executions
+
+    @property
+    def duration_percentiles(self):
+        """Get p50, p90 and p99 durations in seconds from the latency histogram."""
+        from .histograms import from_bytes, percentile_summary
+
+        return percentile_summary(from_bytes(self.duration_histogram), self.max_duration)
+
+
+class OutboundEmail(models.Model):
+    """Email queued in the outbox awaiting batched delivery."""
+
+    STATUS_CHOICES = [
+        ("pending", _("Pending")),
+        ("sending", _("Sending")),
+        ("sent", _("Sent")),
+        ("failed", _("Failed")),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    recipient = models.EmailField(_("recipient"))
+    recipient_domain = models.CharField(_("recipient domain"), max_length=255)
+    from_email = models.CharField(_("from email"), max_length=254, blank=True)
+    subject = models.CharField(_("subject"), max_length=998)
+    body = models.TextField(_("body"))
+    status = models.CharField(_("status"), max_length=20, choices=STATUS_CHOICES, default="pending")
+    attempts = models.PositiveIntegerField(_("attempts"), default=0)
+    last_error = models.TextField(_("last error"), blank=True)
+    next_attempt_at = models.DateTimeField(_("next attempt at"), default=timezone.now)
+    created_at = models.DateTimeField(_("created at"), auto_now_add=True)
+    sent_at = models.DateTimeField(_("sent at"), null=True, blank=True)
+
+    class Meta:
+        verbose_name = _("Outbound Email")
+        verbose_name_plural = _("Outbound Emails")
+        db_table = "outbound_emails"
+        ordering = ["created_at"]
+        indexes = [
+            models.Index(fields=["status", "next_attempt_at"]),
+            models.Index(fields=["recipient_domain", "status"]),
+        ]
+
+    def __str__(self):
+        return f"{self.recipient} - {self.subject} - {self.status}"
+
+
+class ExecutionArchive(models.Model):
+    """A compressed NDJSON file of archived executions in the cold archive."""
+
+    path = models.CharField(_("path"), max_length=500, unique=True)
+    partition_date = models.DateField(_("partition date"))
+    execution_count = models.PositiveIntegerField(_("execution count"), default=0)
+    size_bytes = models.PositiveBigIntegerField(_("size (bytes)"), default=0)
+    created_at = models.DateTimeField(_("created at"), auto_now_add=True)
+
+    class Meta:
+        verbose_name = _("Execution Archive")
+        verbose_name_plural = _("Execution Archives")
+        db_table = "execution_archives"
+        ordering = ["-partition_date", "-created_at"]
+        indexes = [
+            models.Index(fields=["partition_date"]),
+        ]
+
+    def __str__(self):
+        return self.path
+
+
+class ArchivedExecution(models.Model):
+    """Manifest entry locating one archived execution inside an archive file.
+
+    ``offset`` and ``length`` delimit the gzip member holding the execution, so
+    it can be read back without decompressing the rest of the file.
+    """
+
+    execution_id = models.UUIDField(_("execution id"), unique=True)
+    archive = models.ForeignKey(ExecutionArchive, on_delete=models.CASCADE, related_name="executions")
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="archived_executions")
+    # Plain values rather than foreign keys: the workflow may be deleted long before the archive
+    workflow_id = models.UUIDField(_("workflow id"))
+    workflow_name = models.CharField(_("workflow name"), max_length=200)
+    status = models.CharField(_("status"), max_length=20)
+    started_at = models.DateTimeField(_("started at"))
+    completed_at = models.DateTimeField(_("completed at"), null=True, blank=True)
+    offset = models.PositiveBigIntegerField(_("offset"))
+    length = models.PositiveIntegerField(_("length"))
+    archived_at = models.DateTimeField(_("archived at"), auto_now_add=True)
+
+    class Meta:
+        verbose_name = _("Archived Execution")
+        verbose_name_plural = _("Archived Executions")
+        db_table = "archived_executions"
+        ordering = ["-started_at"]
+        indexes = [
+            models.Index(fields=["user", "started_at"]),
+            models.Index(fields=["workflow_id", "started_at"]),
+        ]
+
+    def __str__(self):
+        return f"{self.workflow_name} - {self.started_at.strftime('%Y-%m-%d %H:%M:%S')}"
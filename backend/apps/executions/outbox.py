@@ -0,0 +1,202 @@
+"""
+Email outbox with batched delivery over a pooled SMTP connection.
+"""
+
+import logging
+import time
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.utils import timezone
+
+from .models import OutboundEmail
+
+logger = logging.getLogger(__name__)
+
+FLUSH_SCHEDULED_KEY = "email_outbox:flush_scheduled"
+
+
+def enqueue_email(subject, message, recipients, from_email=None):
+    """Queue an email per recipient and schedule a batched flush."""
+    from_email = from_email if from_email is not None else settings.EMAIL_HOST_USER
+
+    emails = OutboundEmail.objects.bulk_create(
+        [
+            OutboundEmail(
+                recipient=recipient,
+                recipient_domain=_recipient_domain(recipient),
+                from_email=from_email,
+                subject=subject,
+                body=message,
+            )
+            for recipient in recipients
+        ]
+    )
+
+    transaction.on_commit(schedule_flush)
+    return emails
+
+
+def schedule_flush(delay=None):
+    """Schedule an outbox flush, folding further requests within the delay into the same flush."""
+    from .tasks import flush_email_outbox
+
+    if delay is None:
+        delay = settings.EMAIL_OUTBOX_FLUSH_DELAY
+
+    if cache.add(FLUSH_SCHEDULED_KEY, 1, timeout=max(int(delay), 1)):
+        flush_email_outbox.apply_async(countdown=delay)
+
+
+def flush_outbox(batch_size=None):
+    """Deliver due outbox emails in batches over a single SMTP connection."""
+    batch_size = batch_size or settings.EMAIL_OUTBOX_BATCH_SIZE
+
+    # Anything queued from now on needs a flush of its own
+    cache.delete(FLUSH_SCHEDULED_KEY)
+    _release_stale_claims()
+
+    claimed = _claim_batch(batch_size)
+    stats = {"sent": 0, "retried": 0, "failed": 0, "deferred": 0}
+    if not claimed:
+        return stats
+
+    by_domain = defaultdict(list)
+    for email in claimed:
+        by_domain[email.recipient_domain].append(email)
+
+    deliverable = []
+    deferred_ids = []
+    for domain, emails in by_domain.items():
+        allowance = _take_domain_allowance(domain, len(emails))
+        deliverable.extend(emails[:allowance])
+        deferred_ids.extend(email.id for email in emails[allowance:])
+
+    next_window = 60 - int(time.time()) % 60
+    if deferred_ids:
+        # Over the domain's throttle; hold them back until the next window opens
+        OutboundEmail.objects.filter(id__in=deferred_ids).update(
+            status="pending", next_attempt_at=timezone.now() + timedelta(seconds=next_window)
+        )
+        stats["deferred"] = len(deferred_ids)
+
+    sent_ids, failures = _deliver(deliverable)
+
+    if sent_ids:
+        OutboundEmail.objects.filter(id__in=sent_ids).update(status="sent", sent_at=timezone.now(), last_error="")
+    for email, error in failures:
+        if _record_failure(email, error):
+            stats["retried"] += 1
+        else:
+            stats["failed"] += 1
+    stats["sent"] = len(sent_ids)
+
+    if len(claimed) == batch_size:
+        schedule_flush(delay=0)
+    elif deferred_ids:
+        schedule_flush(delay=next_window)
+    elif stats["retried"]:
+        schedule_flush(delay=settings.EMAIL_OUTBOX_RETRY_BACKOFF)
+
+    logger.info(
+        f"Email outbox flush: {stats['sent']} sent, {stats['retried']} retrying, "
+        f"{stats['failed']} failed, {stats['deferred']} deferred"
+    )
+    return stats
+
+
+def _deliver(emails):
+    """Send emails over one SMTP session and report which were accepted."""
+    sent_ids = []
+    failures = []
+    if not emails:
+        return sent_ids, failures
+
+    connection = get_connection(fail_silently=False)
+    try:
+        connection.open()
+    except Exception as e:
+        logger.error(f"Could not open SMTP connection for outbox flush: {str(e)}")
+        return sent_ids, [(email, e) for email in emails]
+
+    try:
+        for email in emails:
+            message = EmailMessage(
+                subject=email.subject,
+                body=email.body,
+                from_email=email.from_email or None,
+                to=[email.recipient],
+                connection=connection,
+            )
+            # One message per call so a rejected recipient only retries itself
+            try:
+                connection.send_messages([message])
+                sent_ids.append(email.id)
+            except Exception as e:
+                failures.append((email, e))
+    finally:
+        connection.close()
+
+    return sent_ids, failures
+
+
+def _claim_batch(batch_size):
+    """Claim due emails so concurrent flushes never send the same message twice."""
+    now = timezone.now()
+    with transaction.atomic():
+        emails = list(
+            OutboundEmail.objects.select_for_update(skip_locked=True)
+            .filter(status="pending", next_attempt_at__lte=now)
+            .order_by("next_attempt_at")[:batch_size]
+        )
+        # next_attempt_at doubles as the claim time while an email is sending
+        claimed_ids = [email.id for email in emails]
+        OutboundEmail.objects.filter(id__in=claimed_ids).update(status="sending", next_attempt_at=now)
+    return emails
+
+
+def _release_stale_claims():
+    """Return emails claimed by a flush that died before finishing to the queue."""
+    threshold = timezone.now() - timedelta(seconds=settings.EMAIL_OUTBOX_CLAIM_TIMEOUT)
+    OutboundEmail.objects.filter(status="sending", next_attempt_at__lt=threshold).update(status="pending")
+
+
+def _take_domain_allowance(domain, wanted):
+    """Reserve up to ``wanted`` sends from the domain's per-minute throttle."""
+    limit = int(settings.EMAIL_OUTBOX_DOMAIN_RATES.get(domain, settings.EMAIL_OUTBOX_DEFAULT_DOMAIN_RATE))
+    if limit <= 0:
+        return wanted
+
+    key = f"email_outbox:rate:{domain}:{int(time.time() // 60)}"
+    cache.add(key, 0, timeout=120)
+    used = cache.incr(key, wanted)
+    allowance = max(0, min(wanted, limit - (used - wanted)))
+    if allowance < wanted:
+        cache.decr(key, wanted - allowance)
+    return allowance
+
+
+def _record_failure(email, error):
+    """Schedule a retry with exponential backoff, or give up. Returns True if retrying."""
+    email.attempts += 1
+    email.last_error = str(error)
+
+    if email.attempts >= settings.EMAIL_OUTBOX_MAX_ATTEMPTS:
+        email.status = "failed"
+        logger.error(f"Giving up on email to {email.recipient} after {email.attempts} attempts: {str(error)}")
+    else:
+        email.status = "pending"
+        backoff = settings.EMAIL_OUTBOX_RETRY_BACKOFF * 2 ** (email.attempts - 1)
+        email.next_attempt_at = timezone.now() + timedelta(seconds=backoff)
+
+    email.save(update_fields=["attempts", "last_error", "status", "next_attempt_at"])
+    return email.status == "pending"
+
+
+def _recipient_domain(recipient):
+    """Get the lower-cased domain of an email address."""
+    return recipient.rpartition("@")[2].lower()
@@ -0,0 +1,287 @@
+"""
+Monthly range partitioning of the execution history tables on PostgreSQL.
+"""
+
+import logging
+import re
+from datetime import date, datetime, time, timedelta
+from datetime import timezone as dt_timezone
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import ExecutionProfile, ExecutionTrace, WorkflowExecution
+from .statestore import OPEN_STATUSES
+
+logger = logging.getLogger(__name__)
+
+# Partitioned table -> partition key. Converted in this order, so a table's
+# incoming foreign keys are always dropped before the tables holding them move.
+PARTITIONED_TABLES = {
+    "workflow_executions": "started_at",
+    "node_executions": "started_at",
+    "execution_logs": "timestamp",
+}
+
+PARTITION_NAME_RE = re.compile(r"^(?P<table>.+)_p(?P<year>\d{4})(?P<month>\d{2})$")
+
+
+def is_supported():
+    """Check whether the database supports declarative partitioning."""
+    return connection.vendor == "postgresql"
+
+
+def month_start(value):
+    """Get the first day of the month containing ``value``."""
+    return date(value.year, value.month, 1)
+
+
+def add_months(month, months):
+    """Shift the first day of a month by a number of months."""
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(table, month):
+    """Get the name of a table's partition for a month."""
+    return f"{table}_p{month:%Y%m}"
+
+
+def is_partitioned(table):
+    """Check whether a table has already been converted to a partitioned table."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM pg_partitioned_table pt JOIN pg_class c ON c.oid = pt.partrelid "
+            "WHERE c.relname = %s AND pg_table_is_visible(c.oid)",
+            [table],
+        )
+        return cursor.fetchone() is not None
+
+
+def list_partitions(table):
+    """List a table's monthly partitions as ``(name, month)`` pairs, oldest first."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT child.relname FROM pg_inherits i "
+            "JOIN pg_class parent ON parent.oid = i.inhparent "
+            "JOIN pg_class child ON child.oid = i.inhrelid "
+            "WHERE parent.relname = %s AND pg_table_is_visible(parent.oid)",
+            [table],
+        )
+        names = [row[0] for row in cursor.fetchall()]
+
+    partitions = []
+    for name in names:
+        match = PARTITION_NAME_RE.match(name)
+        # Partitions attached by hand under other names are left alone
+        if match and match.group("table") == table:
+            partitions.append((name, date(int(match.group("year")), int(match.group("month")), 1)))
+    return sorted(partitions, key=lambda partition: partition[1])
+
+
+def _create_partition(cursor, table, month):
+    """Create a table's partition for one month if it does not exist yet."""
+    # Bounds are computed dates rendered as UTC literals, so formatting them into the DDL is safe
+    cursor.execute(
+        f'CREATE TABLE IF NOT EXISTS "{partition_name(table, month)}" PARTITION OF "{table}" '
+        f"FOR VALUES FROM ('{month.isoformat()} 00:00:00+00') TO ('{add_months(month, 1).isoformat()} 00:00:00+00')"
+    )
+
+
+def ensure_partitions(months_ahead=None):
+    """Create partitions from the current month through ``months_ahead`` months ahead.
+
+    Rows whose month has no partition cannot be inserted, so this must run well
+    before each month starts. Returns the names of the partitions created.
+    """
+    if months_ahead is None:
+        months_ahead = settings.EXECUTION_PARTITION_MONTHS_AHEAD
+
+    current = month_start(timezone.now())
+    created = []
+    for table in PARTITIONED_TABLES:
+        if not is_partitioned(table):
+            continue
+
+        existing = {name for name, _ in list_partitions(table)}
+        with transaction.atomic(), connection.cursor() as cursor:
+            for offset in range(months_ahead + 1):
+                month = add_months(current, offset)
+                if partition_name(table, month) not in existing:
+                    _create_partition(cursor, table, month)
+                    created.append(partition_name(table, month))
+
+    if created:
+        logger.info(f"Created execution partitions: {', '.join(created)}")
+    return created
+
+
+def expiry_cutoff(retention_days=None):
+    """Get the start, in UTC, of the oldest month partition retention keeps, or None when partitions are kept.
+
+    The retention is raised to EXECUTION_RETENTION_DAYS and
+    EXECUTION_FAILED_RETENTION_DAYS where it is shorter, so no partition goes
+    before cleanup and the cold archive are done with every row in it.
+    """
+    if retention_days is None:
+        retention_days = settings.EXECUTION_PARTITION_RETENTION_DAYS
+    if not retention_days:
+        return None
+
+    minimum = max(settings.EXECUTION_RETENTION_DAYS, settings.EXECUTION_FAILED_RETENTION_DAYS)
+    if retention_days < minimum:
+        logger.warning(
+            f"Partition retention of {retention_days} days is shorter than the execution retention; "
+            f"keeping partitions for {minimum} days"
+        )
+        retention_days = minimum
+
+    month = month_start(timezone.now() - timedelta(days=retention_days))
+    return datetime.combine(month, time.min, tzinfo=dt_timezone.utc)
+
+
+def drop_expired_partitions(retention_days=None):
+    """Detach and drop whole partitions whose every row is older than the retention period.
+
+    Partitions still holding pending or running executions are kept, and so
+    are all newer ones; close those executions first so they are archived.
+    Returns the names of the partitions dropped.
+    """
+    cutoff = expiry_cutoff(retention_days)
+    if cutoff is None:
+        return []
+
+    stale = (
+        WorkflowExecution.objects.filter(started_at__lt=cutoff, status__in=OPEN_STATUSES)
+        .order_by("started_at")
+        .values_list("started_at", flat=True)
+        .first()
+    )
+    if stale is not None:
+        logger.error(
+            f"Keeping execution partitions from {stale:%Y-%m} on: they hold pending or running executions "
+            f"started before {cutoff:%Y-%m-%d}"
+        )
+        cutoff = datetime.combine(month_start(stale), time.min, tzinfo=dt_timezone.utc)
+
+    dropped = []
+    for table in PARTITIONED_TABLES:
+        if not is_partitioned(table):
+            continue
+
+        for name, month in list_partitions(table):
+            # A partition holds a whole month, so it goes once the month after it is past the cutoff
+            if add_months(month, 1) > cutoff.date():
+                break
+            with transaction.atomic(), connection.cursor() as cursor:
+                cursor.execute(f'ALTER TABLE "{table}" DETACH PARTITION "{name}"')
+                cursor.execute(f'DROP TABLE "{name}"')
+            dropped.append(name)
+
+    if dropped:
+        # Traces and profiles are not partitioned; drop the ones whose executions went with the partitions
+        ExecutionTrace.objects.filter(started_at__lt=cutoff).delete()
+        ExecutionProfile.objects.filter(created_at__lt=cutoff).delete()
+        logger.info(f"Dropped expired execution partitions: {', '.join(dropped)}")
+    return dropped
+
+
+def convert_table(table, months_ahead=None):
+    """Rebuild a table as a partitioned table of monthly partitions, keeping its rows.
+
+    Runs in one transaction holding an exclusive lock on the table, so writers
+    wait until the copy finishes; run it in a maintenance window. The primary
+    key becomes ``(id, <partition key>)`` as PostgreSQL requires, which means
+    other tables can no longer hold foreign keys to this one. Those constraints
+    are dropped; the ORM still cascades deletes itself.
+    """
+    if months_ahead is None:
+        months_ahead = settings.EXECUTION_PARTITION_MONTHS_AHEAD
+
+    column = PARTITIONED_TABLES[table]
+    legacy = f"{table}_unpartitioned"
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f'LOCK TABLE "{table}" IN ACCESS EXCLUSIVE MODE')
+
+        # Secondary indexes are recreated on the partitioned table once the old one is gone
+        cursor.execute(
+            "SELECT pg_get_indexdef(indexrelid) FROM pg_index WHERE indrelid = %s::regclass AND NOT indisunique",
+            [table],
+        )
+        index_definitions = [row[0] for row in cursor.fetchall()]
+
+        cursor.execute(
+            "SELECT attname FROM pg_attribute WHERE attrelid = %s::regclass AND attidentity <> '' AND NOT attisdropped",
+            [table],
+        )
+        identity_columns = [row[0] for row in cursor.fetchall()]
+
+        cursor.execute(
+            "SELECT conrelid::regclass::text, conname FROM pg_constraint "
+            "WHERE contype = 'f' AND confrelid = %s::regclass",
+            [table],
+        )
+        for referencing_table, constraint in cursor.fetchall():
+            cursor.execute(f'ALTER TABLE {referencing_table} DROP CONSTRAINT "{constraint}"')
+
+        # Outgoing foreign keys to unpartitioned tables (workflows, users, nodes) carry over
+        cursor.execute(
+            "SELECT c.conname, pg_get_constraintdef(c.oid) FROM pg_constraint c "
+            "JOIN pg_class target ON target.oid = c.confrelid "
+            "WHERE c.contype = 'f' AND c.conrelid = %s::regclass "
+            "AND NOT EXISTS (SELECT 1 FROM pg_partitioned_table pt WHERE pt.partrelid = target.oid)",
+            [table],
+        )
+        foreign_keys = cursor.fetchall()
+
+        cursor.execute(f'ALTER TABLE "{table}" RENAME TO "{legacy}"')
+        cursor.execute(
+            f'CREATE TABLE "{table}" (LIKE "{legacy}" INCLUDING DEFAULTS INCLUDING CONSTRAINTS) '
+            f'PARTITION BY RANGE ("{column}")'
+        )
+        cursor.execute(
+            f'ALTER TABLE "{table}" ADD CONSTRAINT "{table}_partitioned_pkey" PRIMARY KEY ("id", "{column}")'
+        )
+        for constraint, definition in foreign_keys:
+            cursor.execute(f'ALTER TABLE "{table}" ADD CONSTRAINT "{constraint}" {definition}')
+
+        cursor.execute(f'SELECT min("{column}"), max("{column}") FROM "{legacy}"')
+        oldest, newest = cursor.fetchone()
+        now = timezone.now()
+        first = month_start(oldest or now)
+        last = max(month_start(newest or now), add_months(month_start(now), months_ahead))
+        month = first
+        while month <= last:
+            _create_partition(cursor, table, month)
+            month = add_months(month, 1)
+
+        cursor.execute(f'INSERT INTO "{table}" SELECT * FROM "{legacy}"')
+        cursor.execute(f'DROP TABLE "{legacy}"')
+
+        for definition in index_definitions:
+            cursor.execute(definition)
+
+        # Identity columns cannot be declared on partitioned tables; use a plain sequence instead
+        for identity_column in identity_columns:
+            sequence = f"{table}_{identity_column}_seq"
+            cursor.execute(f'CREATE SEQUENCE "{sequence}" OWNED BY "{table}"."{identity_column}"')
+            cursor.execute(
+                f'ALTER TABLE "{table}" ALTER COLUMN "{identity_column}" SET DEFAULT nextval(\'"{sequence}"\')'
+            )
+            cursor.execute(
+                f'SELECT setval(\'"{sequence}"\', COALESCE(max("{identity_column}"), 0) + 1, false) FROM "{table}"'
+            )
+
+    logger.info(f"Converted {table} to monthly partitions on {column} ({first:%Y-%m} to {last:%Y-%m})")
+
+
+def convert_tables(months_ahead=None):
+    """Convert every execution history table that is not partitioned yet. Returns the tables converted."""
+    converted = []
+    for table in PARTITIONED_TABLES:
+        if not is_partitioned(table):
+            convert_table(table, months_ahead=months_ahead)
+            converted.append(table)
+    return converted
@@ -0,0 +1,247 @@
+"""
+Opt-in profiling of runs: the workflow and node tasks run under a sampling or deterministic profiler, and the merged
+profile is stored with the execution.
+"""
+
+import cProfile
+import logging
+import pstats
+import sys
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.db import DatabaseError
+
+from .models import ExecutionProfile
+
+logger = logging.getLogger(__name__)
+
+MODES = ("sampling", "deterministic")
+
+# One profiler per thread: when node tasks run inline (eager mode), the workflow task's profiler already sees them
+_active = threading.local()
+
+
+def profile_mode(value):
+    """Normalize a profiling flag: True or "true" for the default profiler, or a profiler name. None when off.
+
+    Raises ValueError for an unknown profiler name.
+    """
+    if value in (None, False, "") or str(value).lower() in ("false", "0", "off"):
+        return None
+    if value is True or str(value).lower() in ("true", "1", "on"):
+        return settings.EXECUTION_PROFILER
+    if value not in MODES:
+        raise ValueError(f"Unknown profiler {value!r}; expected one of {', '.join(MODES)}")
+    return value
+
+
+def profile_options(mode):
+    """Build the options a run's tasks are profiled with, or None when profiling is off."""
+    if mode is None:
+        return None
+    return {"mode": mode, "deadline": time.time() + settings.EXECUTION_PROFILE_MAX_DURATION}
+
+
+def _function_name(filename, line, name):
+    # cProfile reports built-ins with a "~" file
+    return name if filename == "~" else f"{name} ({filename}:{line})"
+
+
+class SamplingProfiler:
+    """Samples the profiled thread's stack every EXECUTION_PROFILE_SAMPLE_INTERVAL seconds from a background thread.
+
+    A function's self time is the samples it was on top of the stack for,
+    its cumulative time the samples it was anywhere on the stack for; call
+    counts are not known. Sampling stops after EXECUTION_PROFILE_MAX_SAMPLES
+    samples or once the run's profiling deadline passes.
+    """
+
+    mode = "sampling"
+
+    def __init__(self, deadline):
+        self.interval = settings.EXECUTION_PROFILE_SAMPLE_INTERVAL
+        self.max_samples = settings.EXECUTION_PROFILE_MAX_SAMPLES
+        self.deadline = deadline
+        self.samples = 0
+        self._self = Counter()
+        self._cumulative = Counter()
+        self._stopped = threading.Event()
+        self._thread = None
+        self._thread_id = None
+
+    def start(self):
+        self._thread_id = threading.get_ident()
+        self._started = time.monotonic()
+        self._thread = threading.Thread(target=self._run, name="execution-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self.duration = time.monotonic() - self._started
+        self._stopped.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            if self.samples >= self.max_samples or time.time() > self.deadline:
+                return
+            frame = sys._current_frames().get(self._thread_id)
+            if frame is None:
+                continue
+
+            self.samples += 1
+            seen = set()
+            top = True
+            while frame is not None:
+                code = frame.f_code
+                key = (code.co_filename, code.co_firstlineno, code.co_name)
+                if top:
+                    self._self[key] += 1
+                    top = False
+                # Recursive frames count once towards cumulative time
+                if key not in seen:
+                    seen.add(key)
+                    self._cumulative[key] += 1
+                frame = frame.f_back
+
+    def functions(self):
+        # Samples are spread over the measured duration rather than assumed to be exactly one interval apart
+        per_sample = self.duration / self.samples if self.samples else self.interval
+        return [
+            [_function_name(*key), 0, self._self[key] * per_sample, samples * per_sample]
+            for key, samples in self._cumulative.items()
+        ]
+
+
+class DeterministicProfiler:
+    """Profiles every call of the profiled thread with cProfile.
+
+    Exact call counts and times, at a much higher overhead than sampling;
+    meant for short runs. The deadline only keeps it from starting: once
+    enabled, cProfile runs until the task ends, as it can only be disabled
+    from the thread it profiles.
+    """
+
+    mode = "deterministic"
+    samples = 0
+
+    def __init__(self, deadline):
+        self._profile = cProfile.Profile()
+
+    def start(self):
+        self._started = time.monotonic()
+        self._profile.enable()
+
+    def stop(self):
+        self._profile.disable()
+        self.duration = time.monotonic() - self._started
+
+    def functions(self):
+        stats = pstats.Stats(self._profile).stats
+        return [
+            [_function_name(*key), calls, self_time, cumulative]
+            for key, (_, calls, self_time, cumulative, _) in stats.items()
+        ]
+
+
+PROFILERS = {profiler.mode: profiler for profiler in (SamplingProfiler, DeterministicProfiler)}
+
+
+def _top(functions):
+    return sorted(functions, key=lambda row: row[3], reverse=True)[: settings.EXECUTION_PROFILE_TOP_FUNCTIONS]
+
+
+def start_profiler(options):
+    """Start profiling the current thread as ``options`` ask, returning the profiler or None.
+
+    Nothing is profiled when profiling is off, the run's profiling deadline has
+    passed, or this thread is already being profiled.
+    """
+    if not options or time.time() > options["deadline"] or getattr(_active, "profiler", None) is not None:
+        return None
+
+    profiler = PROFILERS[options["mode"]](options["deadline"])
+    _active.profiler = profiler
+    profiler.start()
+    return profiler
+
+
+def stop_profiler(profiler):
+    """Stop a profiler and export its top functions, compact enough to travel back with a task result."""
+    profiler.stop()
+    _active.profiler = None
+    return {
+        "mode": profiler.mode,
+        "duration": profiler.duration,
+        "samples": profiler.samples,
+        "functions": _top(profiler.functions()),
+    }
+
+
+class RunProfile:
+    """Collects the profile of one run: the workflow task's own, plus the ones node tasks hand back."""
+
+    def __init__(self, options):
+        self.options = options
+        self.parts = []
+        self.profiler = start_profiler(options)
+
+    def add(self, part):
+        """Add the exported profile of a node task."""
+        if part:
+            self.parts.append(part)
+
+    def save(self, execution_id):
+        """Stop the workflow task's profiler and store the merged profile as the run's ExecutionProfile.
+
+        With no execution id, as when the run failed before it was created,
+        the profiler is only stopped. Profiling is diagnostic, so a failure to
+        store the profile is logged rather than failing the run.
+        """
+        if self.profiler is not None:
+            self.parts.append(stop_profiler(self.profiler))
+            self.profiler = None
+        if execution_id is None or not self.parts:
+            return None
+
+        merged = {}
+        for part in self.parts:
+            for name, calls, self_time, cumulative in part["functions"]:
+                row = merged.setdefault(name, [name, 0, 0.0, 0.0])
+                row[1] += calls
+                row[2] += self_time
+                row[3] += cumulative
+
+        mode = self.options["mode"]
+        try:
+            return ExecutionProfile.objects.create(
+                workflow_execution_id=execution_id,
+                mode=mode,
+                duration_ms=int(sum(part["duration"] for part in self.parts) * 1000),
+                sample_count=sum(part["samples"] for part in self.parts),
+                sample_interval_ms=settings.EXECUTION_PROFILE_SAMPLE_INTERVAL * 1000 if mode == "sampling" else None,
+                task_count=len(self.parts),
+                functions=[[name, calls, round(s, 6), round(c, 6)] for name, calls, s, c in _top(merged.values())],
+            )
+        except DatabaseError as e:
+            logger.error(f"Failed to store the profile of execution {execution_id}: {str(e)}")
+            return None
+
+
+def render_text(execution_profile):
+    """Render a stored profile as a plain-text report, in the spirit of pstats output."""
+    if execution_profile.mode == "sampling":
+        method = f"sampled every {execution_profile.sample_interval_ms:g} ms, {execution_profile.sample_count} samples"
+    else:
+        method = "deterministic"
+    lines = [
+        f"Profile of execution {execution_profile.workflow_execution_id} ({method})",
+        f"{execution_profile.task_count} tasks, {execution_profile.duration_ms} ms profiled",
+        "",
+        f"{'calls':>10} {'self (s)':>12} {'cumulative (s)':>15}  function",
+    ]
+    for name, calls, self_time, cumulative in execution_profile.functions:
+        lines.append(f"{calls or '-':>10} {self_time:>12.4f} {cumulative:>15.4f}  {name}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,404 @@
+"""
+Hourly and daily execution rollups, incremented as executions finish and reconciled from the raw rows.
+"""
+
+import json
+import logging
+import operator
+from collections import defaultdict
+from datetime import timedelta
+from datetime import timezone as dt_timezone
+from functools import reduce
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import DurationField, F, Q, Value
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from . import histograms
+from .models import FINISHED_STATUSES, ExecutionRollup, NodeExecution, NodeExecutionRollup, WorkflowExecution
+
+logger = logging.getLogger(__name__)
+
+GRANULARITIES = ["hour", "day"]
+
+# Skipped nodes never ran, so they are left out of node rollups
+NODE_FINISHED_STATUSES = ["completed", "failed", "timeout"]
+
+# Rollup model -> (field identifying the rolled-up object, field copied along with it)
+ROLLUP_KEYS = {
+    ExecutionRollup: ("workflow", "user"),
+    NodeExecutionRollup: ("node", "workflow"),
+}
+
+COUNTER_FIELDS = ["total_executions", "successful_executions", "failed_executions", "total_duration"]
+PAYLOAD_FIELDS = ["input_bytes", "output_bytes"]
+
+# Rollup model -> fields added up when merging deltas
+ROLLUP_COUNTERS = {
+    ExecutionRollup: COUNTER_FIELDS,
+    NodeExecutionRollup: COUNTER_FIELDS + PAYLOAD_FIELDS,
+}
+
+
+def period_start(value, granularity):
+    """Get the start of the UTC hour or day containing ``value``."""
+    value = value.astimezone(dt_timezone.utc).replace(minute=0, second=0, microsecond=0)
+    if granularity == "day":
+        value = value.replace(hour=0)
+    return value
+
+
+def payload_size(value):
+    """Get the size in bytes of a JSON payload as it is stored."""
+    if not value:
+        return 0
+    return len(json.dumps(value, cls=DjangoJSONEncoder).encode())
+
+
+def _node_row(node_execution, workflow_id):
+    """Get the ``_collect`` row of a node execution instance or state record."""
+    return (
+        node_execution.node_id,
+        workflow_id,
+        node_execution.status,
+        node_execution.started_at,
+        node_execution.completed_at,
+        {
+            "input_bytes": payload_size(node_execution.input_data),
+            "output_bytes": payload_size(node_execution.output_data),
+        },
+    )
+
+
+def _collect(rows, finished_statuses):
+    """Fold ``(owner id, related id, status, started_at, completed_at, extra counters)`` rows into per-bucket deltas."""
+    deltas = {}
+    for owner_id, related_id, status, started_at, completed_at, extra in rows:
+        if status not in finished_statuses or not completed_at or not started_at:
+            continue
+        duration = max(completed_at - started_at, timedelta(0))
+        for granularity in GRANULARITIES:
+            key = (str(owner_id), granularity, period_start(started_at, granularity))
+            delta = deltas.get(key)
+            if delta is None:
+                delta = deltas[key] = {
+                    "related_id": related_id,
+                    "total_executions": 0,
+                    "successful_executions": 0,
+                    "failed_executions": 0,
+                    "total_duration": timedelta(0),
+                    "max_duration": timedelta(0),
+                    "durations_ms": [],
+                    **dict.fromkeys(extra, 0),
+                }
+            delta["total_executions"] += 1
+            delta["successful_executions" if status == "completed" else "failed_executions"] += 1
+            delta["total_duration"] += duration
+            delta["max_duration"] = max(delta["max_duration"], duration)
+            delta["durations_ms"].append(duration.total_seconds() * 1000)
+            for name, value in extra.items():
+                delta[name] += value
+    return deltas
+
+
+def _merge(model, deltas):
+    """Add deltas to their rollup rows: counters with F() expressions, histograms merged under a row lock.
+
+    Missing rows are inserted empty first, then all rows are locked in key order
+    and written back with a single bulk UPDATE.
+    """
+    if not deltas:
+        return 0
+
+    owner_field, related_field = ROLLUP_KEYS[model]
+    counters = ROLLUP_COUNTERS[model]
+    keys = sorted(deltas)
+    with transaction.atomic():
+        model.objects.bulk_create(
+            [
+                model(
+                    **{
+                        f"{owner_field}_id": owner_id,
+                        f"{related_field}_id": deltas[(owner_id, granularity, start)]["related_id"],
+                        "granularity": granularity,
+                        "period_start": start,
+                    }
+                )
+                for owner_id, granularity, start in keys
+            ],
+            ignore_conflicts=True,
+        )
+        lookup = reduce(
+            operator.or_,
+            (
+                Q(**{f"{owner_field}_id": owner_id, "granularity": granularity, "period_start": start})
+                for owner_id, granularity, start in keys
+            ),
+        )
+        rows = list(
+            model.objects.select_for_update()
+            .filter(lookup)
+            .only("id", owner_field, "granularity", "period_start", "duration_histogram")
+            .order_by("id")
+        )
+
+        now = timezone.now()
+        for row in rows:
+            delta = deltas[(str(getattr(row, f"{owner_field}_id")), row.granularity, row.period_start)]
+            for name in counters:
+                setattr(row, name, F(name) + Value(delta[name], output_field=model._meta.get_field(name)))
+            row.max_duration = Greatest("max_duration", Value(delta["max_duration"], output_field=DurationField()))
+            row.duration_histogram = histograms.to_bytes(
+                histograms.merge([row.duration_histogram, histograms.build(delta["durations_ms"])])
+            )
+            row.updated_at = now
+        model.objects.bulk_update(rows, counters + ["max_duration", "duration_histogram", "updated_at"], batch_size=500)
+    return len(rows)
+
+
+def record_finished_executions(executions, node_executions=None):
+    """Count finished executions, and their node executions, in their hourly and daily rollups.
+
+    ``executions`` may be model instances or state-store records; anything with
+    pk, workflow_id, user_id, status, started_at and completed_at will do. Node
+    executions are loaded from the database unless given. Executions falling
+    into the same bucket are folded into one row update.
+    """
+    executions = list(executions)
+    if not executions:
+        return 0
+
+    workflows = {str(execution.pk): execution.workflow_id for execution in executions}
+    if node_executions is None:
+        node_executions = NodeExecution.objects.filter(
+            workflow_execution_id__in=list(workflows), status__in=NODE_FINISHED_STATUSES
+        ).only("workflow_execution", "node", "status", "started_at", "completed_at", "input_data", "output_data")
+
+    with transaction.atomic():
+        updated = _merge(
+            ExecutionRollup,
+            _collect(
+                (
+                    (
+                        execution.workflow_id,
+                        execution.user_id,
+                        execution.status,
+                        execution.started_at,
+                        execution.completed_at,
+                        {},
+                    )
+                    for execution in executions
+                ),
+                FINISHED_STATUSES,
+            ),
+        )
+        updated += _merge(
+            NodeExecutionRollup,
+            _collect(
+                (
+                    _node_row(node_execution, workflows[str(node_execution.workflow_execution_id)])
+                    for node_execution in node_executions
+                    if node_execution.status in NODE_FINISHED_STATUSES
+                ),
+                NODE_FINISHED_STATUSES,
+            ),
+        )
+    return updated
+
+
+def _replace(model, deltas, since, reconciled_at):
+    """Overwrite the window's rollup rows with recomputed values in one upsert, dropping rows left untouched."""
+    owner_field, related_field = ROLLUP_KEYS[model]
+    counters = ROLLUP_COUNTERS[model]
+    rollups = [
+        model(
+            **{
+                f"{owner_field}_id": owner_id,
+                f"{related_field}_id": delta["related_id"],
+                "granularity": granularity,
+                "period_start": start,
+                **{name: delta[name] for name in counters},
+                "max_duration": delta["max_duration"],
+                "duration_histogram": histograms.to_bytes(histograms.build(delta["durations_ms"])),
+            }
+        )
+        for (owner_id, granularity, start), delta in deltas.items()
+    ]
+
+    with transaction.atomic():
+        model.objects.bulk_create(
+            rollups,
+            batch_size=500,
+            update_conflicts=True,
+            unique_fields=[owner_field, "granularity", "period_start"],
+            update_fields=counters + ["max_duration", "duration_histogram", "updated_at"],
+        )
+        # Rows the upsert did not touch belong to executions that no longer exist
+        removed = model.objects.filter(period_start__gte=since, updated_at__lt=reconciled_at).delete()[0]
+    return len(rollups), removed
+
+
+def reconcile_rollups(since=None):
+    """Recompute the rollups of executions started since ``since`` from the executions themselves.
+
+    Defaults to the last EXECUTION_ROLLUP_RECONCILE_HOURS, widened to whole days
+    so daily rows are rebuilt completely. Returns the number of rows written and
+    removed.
+    """
+    if since is None:
+        since = timezone.now() - timedelta(hours=settings.EXECUTION_ROLLUP_RECONCILE_HOURS)
+    since = period_start(since, "day")
+    reconciled_at = timezone.now()
+
+    execution_rows = (
+        (*row, {})
+        for row in WorkflowExecution.objects.filter(started_at__gte=since, status__in=FINISHED_STATUSES)
+        .order_by()
+        .values_list("workflow_id", "user_id", "status", "started_at", "completed_at")
+        .iterator(chunk_size=2000)
+    )
+    node_rows = (
+        (*row, {"input_bytes": payload_size(input_data), "output_bytes": payload_size(output_data)})
+        for *row, input_data, output_data in NodeExecution.objects.filter(
+            started_at__gte=since, status__in=NODE_FINISHED_STATUSES
+        )
+        .order_by()
+        .values_list(
+            "node_id",
+            "workflow_execution__workflow_id",
+            "status",
+            "started_at",
+            "completed_at",
+            "input_data",
+            "output_data",
+        )
+        .iterator(chunk_size=2000)
+    )
+
+    written = removed = 0
+    for model, rows, finished_statuses in [
+        (ExecutionRollup, execution_rows, FINISHED_STATUSES),
+        (NodeExecutionRollup, node_rows, NODE_FINISHED_STATUSES),
+    ]:
+        model_written, model_removed = _replace(model, _collect(rows, finished_statuses), since, reconciled_at)
+        written += model_written
+        removed += model_removed
+
+    logger.info(f"Reconciled execution rollups since {since.isoformat()}: {written} written, {removed} removed")
+    return {"since": since.isoformat(), "written": written, "removed": removed}
+
+
+def duration_percentiles(rollups):
+    """Merge the latency histograms of a rollup queryset and get its p50, p90 and p99 in seconds."""
+    rows = list(rollups.values_list("duration_histogram", "max_duration"))
+    return histograms.percentile_summary(
+        histograms.merge([histogram for histogram, _ in rows]),
+        max((max_duration for _, max_duration in rows), default=None),
+    )
+
+
+def node_duration_percentiles(rollups):
+    """Get p50, p90 and p99 in seconds of every node in a node rollup queryset, keyed by node ID."""
+    by_node = defaultdict(list)
+    for node_id, histogram, max_duration in rollups.values_list("node_id", "duration_histogram", "max_duration"):
+        by_node[str(node_id)].append((histogram, max_duration))
+    return {
+        node_id: histograms.percentile_summary(
+            histograms.merge([histogram for histogram, _ in rows]),
+            max(max_duration for _, max_duration in rows),
+        )
+        for node_id, rows in by_node.items()
+    }
+
+
+def node_hotspots(rollups, limit=10):
+    """Rank the nodes of a node rollup queryset by where runtime goes.
+
+    ``hottest`` orders nodes by their share of total node runtime, where
+    optimization saves the most overall; ``slowest`` orders them by p90
+    duration, the latency a single run is likely to wait on. Reads the rollups
+    in one query and merges histograms per node.
+    """
+    nodes = {}
+    for row in rollups.values(
+        "node_id",
+        "node__name",
+        "node__node_type",
+        "workflow_id",
+        "workflow__name",
+        "total_executions",
+        "failed_executions",
+        "total_duration",
+        "max_duration",
+        "input_bytes",
+        "output_bytes",
+        "duration_histogram",
+    ):
+        node = nodes.get(row["node_id"])
+        if node is None:
+            node = nodes[row["node_id"]] = {
+                "node_id": str(row["node_id"]),
+                "node_name": row["node__name"],
+                "node_type": row["node__node_type"],
+                "workflow_id": str(row["workflow_id"]),
+                "workflow_name": row["workflow__name"],
+                "executions": 0,
+                "failed_executions": 0,
+                "total_duration": timedelta(0),
+                "max_duration": timedelta(0),
+                "input_bytes": 0,
+                "output_bytes": 0,
+                "histograms": [],
+            }
+        for name in ["total_duration", "input_bytes", "output_bytes", "failed_executions"]:
+            node[name] += row[name]
+        node["executions"] += row["total_executions"]
+        node["max_duration"] = max(node["max_duration"], row["max_duration"])
+        node["histograms"].append(row["duration_histogram"])
+
+    total_runtime = sum((node["total_duration"] for node in nodes.values()), timedelta(0)).total_seconds()
+    report = []
+    for node in nodes.values():
+        executions = node["executions"]
+        total_duration = node["total_duration"].total_seconds()
+        report.append(
+            {
+                "node_id": node["node_id"],
+                "node_name": node["node_name"],
+                "node_type": node["node_type"],
+                "workflow_id": node["workflow_id"],
+                "workflow_name": node["workflow_name"],
+                "executions": executions,
+                "failed_executions": node["failed_executions"],
+                "failure_rate": (node["failed_executions"] / executions) * 100 if executions else 0,
+                "total_duration": total_duration,
+                "runtime_share": (total_duration / total_runtime) * 100 if total_runtime else 0,
+                "average_duration": total_duration / executions if executions else None,
+                "max_duration": node["max_duration"].total_seconds(),
+                "duration_percentiles": histograms.percentile_summary(
+                    histograms.merge(node["histograms"]), node["max_duration"]
+                ),
+                "average_input_bytes": node["input_bytes"] / executions if executions else 0,
+                "average_output_bytes": node["output_bytes"] / executions if executions else 0,
+            }
+        )
+
+    return {
+        "total_node_runtime": total_runtime,
+        "hottest": sorted(report, key=lambda node: node["total_duration"], reverse=True)[:limit],
+        "slowest": sorted(report, key=lambda node: node["duration_percentiles"]["p90"] or 0, reverse=True)[:limit],
+    }
+
+
+def prune_hourly_rollups(retention_days=None):
+    """Delete hourly rollups older than the retention period; daily rollups are kept."""
+    if retention_days is None:
+        retention_days = settings.EXECUTION_ROLLUP_HOURLY_RETENTION_DAYS
+    if not retention_days:
+        return 0
+
+    cutoff = timezone.now() - timedelta(days=retention_days)
+    return sum(model.objects.filter(granularity="hour", period_start__lt=cutoff).delete()[0] for model in ROLLUP_KEYS)
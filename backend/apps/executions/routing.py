@@ -0,0 +1,12 @@
+"""
+WebSocket URL configuration for executions app.
+"""
+
+from django.urls import path
+
+from . import consumers
+
+websocket_urlpatterns = [
+    path("ws/executions/", consumers.ExecutionEventConsumer.as_asgi()),
+    path("ws/executions/<uuid:execution_id>/", consumers.ExecutionEventConsumer.as_asgi()),
+]
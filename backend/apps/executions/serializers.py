@@ -7,12 +7,23 @@ from drf_spectacular.types import OpenApiTypes
 from drf_spectacular.utils import extend_schema_field
 from rest_framework import serializers
 
-from .models import ExecutionMetrics, NodeExecution, WorkflowExecution
+from orchestrix.fieldsets import SparseFieldsetMixin
+
+from .models import (
+    ArchivedExecution,
+    ExecutionLog,
+    ExecutionMetrics,
+    ExecutionRollup,
+    NodeExecution,
+    NodeExecutionRollup,
+    WorkflowExecution,
+)
+from .profiling import profile_mode
 
 User = get_user_model()
 
 
-class NodeExecutionSerializer(serializers.ModelSerializer):
+class NodeExecutionSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     """Serializer for NodeExecution model."""
 
     node_name = serializers.CharField(source="node.name", read_only=True)
@@ -38,8 +49,22 @@ class NodeExecutionSerializer(serializers.ModelSerializer):
             "completed_at",
             "duration_seconds",
             "retry_count",
+            "prompt_tokens",
+            "completion_tokens",
+            "provider_latency_ms",
         ]
-        read_only_fields = ["id", "started_at", "completed_at", "duration_seconds"]
+        read_only_fields = [
+            "id",
+            "started_at",
+            "completed_at",
+            "duration_seconds",
+            "prompt_tokens",
+            "completion_tokens",
+            "provider_latency_ms",
+        ]
+        field_sources = {
+            "duration_seconds": ["started_at", "completed_at"],
+        }
 
     @extend_schema_field(OpenApiTypes.FLOAT)
     def get_duration_seconds(self, obj):
@@ -50,7 +75,7 @@ class NodeExecutionSerializer(serializers.ModelSerializer):
         return None
 
 
-class WorkflowExecutionSerializer(serializers.ModelSerializer):
+class WorkflowExecutionSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     """Serializer for WorkflowExecution model."""
 
     workflow_name = serializers.CharField(source="workflow.name", read_only=True)
@@ -80,6 +105,9 @@ class WorkflowExecutionSerializer(serializers.ModelSerializer):
             "completed_at",
             "duration_seconds",
             "progress_percentage",
+            "total_nodes",
+            "finished_nodes",
+            "failed_nodes",
             "node_executions",
         ]
         read_only_fields = [
@@ -89,7 +117,14 @@ class WorkflowExecutionSerializer(serializers.ModelSerializer):
             "completed_at",
             "duration_seconds",
             "progress_percentage",
+            "total_nodes",
+            "finished_nodes",
+            "failed_nodes",
         ]
+        field_sources = {
+            "duration_seconds": ["started_at", "completed_at"],
+            "progress_percentage": ["total_nodes", "finished_nodes"],
+        }
 
     @extend_schema_field(OpenApiTypes.FLOAT)
     def get_duration_seconds(self, obj):
@@ -106,17 +141,11 @@ class WorkflowExecutionSerializer(serializers.ModelSerializer):
 
     @extend_schema_field(OpenApiTypes.FLOAT)
     def get_progress_percentage(self, obj):
-        """Calculate execution progress percentage."""
-        total_nodes = obj.node_executions.count()
-        if total_nodes == 0:
-            return 0
-
-        completed_nodes = obj.node_executions.filter(status__in=["completed", "failed", "skipped"]).count()
-
-        return round((completed_nodes / total_nodes) * 100, 2)
+        """Calculate execution progress percentage from the execution's node counters."""
+        return obj.progress_percentage
 
 
-class WorkflowExecutionListSerializer(serializers.ModelSerializer):
+class WorkflowExecutionListSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     """Lightweight serializer for execution lists."""
 
     workflow_name = serializers.CharField(source="workflow.name", read_only=True)
@@ -135,6 +164,9 @@ class WorkflowExecutionListSerializer(serializers.ModelSerializer):
             "completed_at",
             "duration_seconds",
         ]
+        field_sources = {
+            "duration_seconds": ["started_at", "completed_at"],
+        }
 
     @extend_schema_field(OpenApiTypes.FLOAT)
     def get_duration_seconds(self, obj):
@@ -145,6 +177,43 @@ class WorkflowExecutionListSerializer(serializers.ModelSerializer):
         return None
 
 
+class ExecutionLogSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    """Serializer for ExecutionLog model."""
+
+    class Meta:
+        model = ExecutionLog
+        fields = [
+            "id",
+            "workflow_execution",
+            "node_execution",
+            "level",
+            "message",
+            "data",
+            "timestamp",
+        ]
+        read_only_fields = fields
+
+
+class ArchivedExecutionSerializer(serializers.ModelSerializer):
+    """Serializer for cold archive manifest entries."""
+
+    archive_path = serializers.CharField(source="archive.path", read_only=True)
+
+    class Meta:
+        model = ArchivedExecution
+        fields = [
+            "execution_id",
+            "workflow_id",
+            "workflow_name",
+            "status",
+            "started_at",
+            "completed_at",
+            "archived_at",
+            "archive_path",
+        ]
+        read_only_fields = fields
+
+
 class ExecutionMetricsSerializer(serializers.ModelSerializer):
     """Serializer for ExecutionMetrics model."""
 
@@ -172,14 +241,75 @@ class ExecutionMetricsSerializer(serializers.ModelSerializer):
         read_only_fields = ["id", "user"]
 
 
+class ExecutionRollupSerializer(serializers.ModelSerializer):
+    """Serializer for hourly and daily execution rollups."""
+
+    workflow_name = serializers.CharField(source="workflow.name", read_only=True)
+    average_duration = serializers.DurationField(source="avg_duration", read_only=True)
+    success_rate = serializers.FloatField(read_only=True)
+    duration_percentiles = serializers.DictField(read_only=True)
+
+    class Meta:
+        model = ExecutionRollup
+        fields = [
+            "id",
+            "workflow",
+            "workflow_name",
+            "granularity",
+            "period_start",
+            "total_executions",
+            "successful_executions",
+            "failed_executions",
+            "success_rate",
+            "average_duration",
+            "total_duration",
+            "max_duration",
+            "duration_percentiles",
+            "updated_at",
+        ]
+        read_only_fields = fields
+
+
+class NodeExecutionRollupSerializer(serializers.ModelSerializer):
+    """Serializer for hourly and daily node execution rollups."""
+
+    node_name = serializers.CharField(source="node.name", read_only=True)
+    average_duration = serializers.DurationField(source="avg_duration", read_only=True)
+    duration_percentiles = serializers.DictField(read_only=True)
+
+    class Meta:
+        model = NodeExecutionRollup
+        fields = [
+            "id",
+            "node",
+            "node_name",
+            "workflow",
+            "granularity",
+            "period_start",
+            "total_executions",
+            "successful_executions",
+            "failed_executions",
+            "average_duration",
+            "total_duration",
+            "max_duration",
+            "duration_percentiles",
+            "input_bytes",
+            "output_bytes",
+            "updated_at",
+        ]
+        read_only_fields = fields
+
+
 class ExecutionCreateSerializer(serializers.ModelSerializer):
     """Serializer for creating new executions."""
 
     trigger_data = serializers.JSONField(source="input_data", required=False)
+    # True for the default profiler, or "sampling" / "deterministic"
+    profile = serializers.JSONField(required=False, write_only=True)
 
     class Meta:
         model = WorkflowExecution
-        fields = ["workflow", "trigger_data"]
+        fields = ["workflow", "trigger_data", "profile"]
 
     def validate_workflow(self, value):
         """Validate that user owns the workflow."""
@@ -192,7 +322,16 @@ class ExecutionCreateSerializer(serializers.ModelSerializer):
 
         return value
 
+    def validate_profile(self, value):
+        """Normalize the profiling flag to a profiler name, or None."""
+        try:
+            return profile_mode(value)
+        except ValueError as e:
+            raise serializers.ValidationError(str(e))
+
     def create(self, validated_data):
         """Create execution with user from context."""
         validated_data["user"] = self.context["request"].user
+        # Passed to the task rather than stored
+        validated_data.pop("profile", None)
         return super().create(validated_data)
@@ -0,0 +1,16 @@
+"""
+Signal handlers for execution models.
+"""
+
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from .aggcache import bump_version
+from .models import WorkflowExecution
+
+
+@receiver(post_save, sender=WorkflowExecution)
+def invalidate_aggregates_on_new_execution(sender, instance, created, **kwargs):
+    """Drop the user's cached aggregates when an execution is created; status changes go through transition()."""
+    if created:
+        bump_version(instance.user_id)
@@ -0,0 +1,658 @@
+"""
+Write-behind execution state: in-flight runs live in Redis hashes and finished runs are persisted in batches.
+"""
+
+import json
+import logging
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from redis.exceptions import RedisError
+
+from .aggcache import bump_versions
+from .models import NODE_PROGRESS_STATUSES, ExecutionLog, NodeExecution, WorkflowExecution
+from .rollups import record_finished_executions
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "exec_state"
+ACTIVE_KEY = f"{KEY_PREFIX}:active"  # execution id -> last state change (unix time)
+FLUSH_QUEUE_KEY = f"{KEY_PREFIX}:flush"  # execution id -> finish time, waiting to be persisted
+FLUSH_SCHEDULED_KEY = f"{KEY_PREFIX}:flush_scheduled"
+FLUSH_LOCK_KEY = f"{KEY_PREFIX}:flush_lock"
+
+OPEN_STATUSES = ["pending", "running"]
+
+# Redis is down, or the default cache is not Redis at all (django_redis raises NotImplementedError)
+STORE_UNAVAILABLE = (RedisError, NotImplementedError)
+
+EXECUTION_FIELDS = (
+    "id",
+    "workflow_id",
+    "user_id",
+    "status",
+    "input_data",
+    "output_data",
+    "started_at",
+    "completed_at",
+    "error_message",
+    "trigger_source",
+    "execution_context",
+)
+NODE_FIELDS = (
+    "id",
+    "workflow_execution_id",
+    "node_id",
+    "status",
+    "input_data",
+    "output_data",
+    "started_at",
+    "completed_at",
+    "error_message",
+    "retry_count",
+    "prompt_tokens",
+    "completion_tokens",
+    "provider_latency_ms",
+)
+DATETIME_FIELDS = {"started_at", "completed_at"}
+
+# Guarded status change on a state hash, the Redis counterpart of StateTransitionMixin.transition.
+# Hash values are JSON-encoded, so statuses are compared in encoded form. Also bumps the
+# execution's last-activity score, which crash recovery uses to spot abandoned runs.
+# KEYS: state hash, active set. ARGV: execution id, now, allowed status count,
+# allowed statuses, then field/value pairs to write.
+TRANSITION_SCRIPT = """
+local status = redis.call("HGET", KEYS[1], "status")
+if not status then
+    return 0
+end
+local allowed = tonumber(ARGV[3])
+local matched = false
+for i = 4, allowed + 3 do
+    if ARGV[i] == status then
+        matched = true
+    end
+end
+if not matched then
+    return 0
+end
+for i = allowed + 4, #ARGV, 2 do
+    redis.call("HSET", KEYS[1], ARGV[i], ARGV[i + 1])
+end
+redis.call("ZADD", KEYS[2], "XX", ARGV[2], ARGV[1])
+return 1
+"""
+
+_transition_script = None
+
+
+def _redis():
+    """Get the raw Redis client behind the default cache."""
+    from django_redis import get_redis_connection
+
+    return get_redis_connection("default")
+
+
+def _execution_key(execution_id):
+    return f"{KEY_PREFIX}:{execution_id}"
+
+
+def _nodes_key(execution_id):
+    return f"{KEY_PREFIX}:{execution_id}:nodes"
+
+
+def _node_key(execution_id, node_id):
+    return f"{KEY_PREFIX}:{execution_id}:node:{node_id}"
+
+
+def _logs_key(execution_id):
+    return f"{KEY_PREFIX}:{execution_id}:logs"
+
+
+def _dumps(value):
+    return json.dumps(value, cls=DjangoJSONEncoder)
+
+
+def _encode(values):
+    """JSON-encode every value of a state hash."""
+    return {name: _dumps(value) for name, value in values.items()}
+
+
+def _decode(raw):
+    """Decode a state hash read from Redis."""
+    values = {}
+    for name, value in raw.items():
+        name = name.decode() if isinstance(name, bytes) else name
+        value = json.loads(value)
+        if name in DATETIME_FIELDS and value:
+            value = parse_datetime(value)
+        values[name] = value
+    return values
+
+
+def _decode_log(raw):
+    """Decode a log entry read from Redis."""
+    entry = json.loads(raw)
+    entry["timestamp"] = parse_datetime(entry["timestamp"])
+    return entry
+
+
+def use_write_behind(workflow):
+    """Check whether a workflow's runs keep their state in Redis rather than the database."""
+    return bool(workflow.configuration.get("write_behind", settings.EXECUTION_WRITE_BEHIND))
+
+
+class _StateRecord:
+    """A Redis-backed stand-in mirroring the state-transition interface of the execution models."""
+
+    fields = ()
+
+    def __init__(self, key, values):
+        self.key = key
+        self.extra = {name: value for name, value in values.items() if name not in self.fields}
+        for name in self.fields:
+            setattr(self, name, values.get(name))
+
+    @property
+    def pk(self):
+        return self.id
+
+    @property
+    def execution_id(self):
+        raise NotImplementedError
+
+    def transition(self, to_status, from_statuses, **fields):
+        """Move to ``to_status`` if the hash is still in one of ``from_statuses``, publishing the change."""
+        global _transition_script
+
+        from .events import publish_execution_change, publish_node_change
+
+        if _transition_script is None:
+            _transition_script = _redis().register_script(TRANSITION_SCRIPT)
+
+        args = [self.execution_id, time.time(), len(from_statuses), *(_dumps(status) for status in from_statuses)]
+        for name, value in _encode({"status": to_status, **fields}).items():
+            args.extend([name, value])
+        if not _transition_script(keys=[self.key, ACTIVE_KEY], args=args):
+            return False
+
+        self.status = to_status
+        for name, value in fields.items():
+            setattr(self, name, value)
+
+        publish = publish_execution_change if isinstance(self, ExecutionState) else publish_node_change
+        publish(self, to_status, fields)
+        return True
+
+    def refresh_status(self):
+        """Reload the status, from the database once the run has been persisted."""
+        raw = _redis().hget(self.key, "status")
+        if raw is not None:
+            self.status = json.loads(raw)
+        else:
+            model = WorkflowExecution if isinstance(self, ExecutionState) else NodeExecution
+            self.status = model.objects.filter(pk=self.pk).values_list("status", flat=True).first() or self.status
+        return self.status
+
+
+class ExecutionState(_StateRecord):
+    """In-flight WorkflowExecution state held in Redis."""
+
+    fields = EXECUTION_FIELDS
+
+    @property
+    def execution_id(self):
+        return self.id
+
+    def finish(self, to_status, stop_in_flight=False, **fields):
+        """Move to a terminal status, skip nodes that have not finished and queue the run for persistence.
+
+        With ``stop_in_flight``, for a run stopped from outside the engine, the
+        node still executing moves to ``to_status`` rather than being skipped;
+        either way its own completion is then refused by the status guard.
+        """
+        if not self.transition(to_status, OPEN_STATUSES, completed_at=timezone.now(), **fields):
+            return False
+
+        in_flight_fields = {"error_message": fields["error_message"]} if "error_message" in fields else {}
+        self.skip_pending_nodes(to_status if stop_in_flight else None, **in_flight_fields)
+
+        _redis().pipeline().zrem(ACTIVE_KEY, self.id).zadd(FLUSH_QUEUE_KEY, {self.id: time.time()}).execute()
+        schedule_flush()
+        return True
+
+    def mark_as_completed(self, output_data=None):
+        """Mark execution as completed."""
+        fields = {"output_data": output_data} if output_data else {}
+        return self.finish("completed", **fields)
+
+    def mark_as_failed(self, error_message):
+        """Mark execution as failed."""
+        return self.finish("failed", error_message=error_message)
+
+    def node_executions(self):
+        """Load the run's node states in execution order."""
+        redis = _redis()
+        node_ids = [node_id.decode() for node_id in redis.lrange(_nodes_key(self.id), 0, -1)]
+        pipeline = redis.pipeline(transaction=False)
+        for node_id in node_ids:
+            pipeline.hgetall(_node_key(self.id, node_id))
+        return [
+            NodeExecutionState(_node_key(self.id, node_id), _decode(raw))
+            for node_id, raw in zip(node_ids, pipeline.execute())
+            if raw
+        ]
+
+    def skip_pending_nodes(self, in_flight_status=None, **fields):
+        """Mark node executions that never started as skipped.
+
+        With ``in_flight_status`` the first pending node, the one being executed,
+        moves to that status with ``fields`` instead.
+        """
+        now = timezone.now()
+        pending = [node_execution for node_execution in self.node_executions() if node_execution.status == "pending"]
+        if in_flight_status is not None and pending:
+            pending.pop(0).transition(in_flight_status, ["pending"], completed_at=now, **fields)
+        return sum(node_execution.transition("skipped", ["pending"], completed_at=now) for node_execution in pending)
+
+
+class NodeExecutionState(_StateRecord):
+    """In-flight NodeExecution state held in Redis."""
+
+    fields = NODE_FIELDS
+
+    @property
+    def execution_id(self):
+        return self.workflow_execution_id
+
+    def mark_as_completed(self, output_data=None, **fields):
+        """Mark node execution as completed, writing any extra ``fields`` in the same update."""
+        fields["completed_at"] = timezone.now()
+        if output_data:
+            fields["output_data"] = output_data
+        return self.transition("completed", OPEN_STATUSES, **fields)
+
+    def mark_as_failed(self, error_message, **fields):
+        """Mark node execution as failed, writing any extra ``fields`` in the same update."""
+        return self.transition(
+            "failed",
+            OPEN_STATUSES,
+            completed_at=timezone.now(),
+            error_message=error_message,
+            **fields,
+        )
+
+    def add_log(self, level, message, data=None):
+        """Append a log entry; it is written to the log store when the run is persisted."""
+        from .events import publish_log
+
+        entry = {
+            "node_execution_id": self.id,
+            "level": level,
+            "message": message,
+            "data": data or {},
+            "timestamp": timezone.now(),
+        }
+        _redis().rpush(_logs_key(self.execution_id), _dumps(entry))
+        publish_log(self.execution_id, self.id, level, message, entry["data"], entry["timestamp"])
+
+    def record_usage(self, prompt_tokens=0, completion_tokens=0, latency_ms=None):
+        """Record provider token usage and latency."""
+        self.prompt_tokens = prompt_tokens
+        self.completion_tokens = completion_tokens
+        self.provider_latency_ms = latency_ms
+        _redis().hset(
+            self.key,
+            mapping=_encode(
+                {
+                    "prompt_tokens": prompt_tokens,
+                    "completion_tokens": completion_tokens,
+                    "provider_latency_ms": latency_ms,
+                }
+            ),
+        )
+
+
+def create_execution(workflow, user, nodes, input_data=None, trigger_source="manual", execution_context=None):
+    """Create the state of a new run and all of its pending node executions in one round trip."""
+    now = timezone.now()
+    execution_id = str(uuid.uuid4())
+    execution_values = {
+        "id": execution_id,
+        "workflow_id": str(workflow.id),
+        "user_id": str(user.id),
+        "status": "running",
+        "input_data": input_data or {},
+        "output_data": {},
+        "started_at": now,
+        "completed_at": None,
+        "error_message": "",
+        "trigger_source": trigger_source,
+        "execution_context": execution_context or {},
+        # Display-only fields for the live status API
+        "workflow_name": workflow.name,
+        "user_email": user.email,
+    }
+
+    keys = [_execution_key(execution_id), _nodes_key(execution_id)]
+    pipeline = _redis().pipeline()
+    pipeline.hset(keys[0], mapping=_encode(execution_values))
+    for node in nodes:
+        node_key = _node_key(execution_id, node.id)
+        keys.append(node_key)
+        pipeline.hset(
+            node_key,
+            mapping=_encode(
+                {
+                    "id": str(uuid.uuid4()),
+                    "workflow_execution_id": execution_id,
+                    "node_id": str(node.id),
+                    "status": "pending",
+                    "input_data": {},
+                    "output_data": {},
+                    "started_at": now,
+                    "completed_at": None,
+                    "error_message": "",
+                    "retry_count": 0,
+                    "prompt_tokens": 0,
+                    "completion_tokens": 0,
+                    "provider_latency_ms": None,
+                    "node_name": node.name,
+                    "node_type": node.node_type,
+                }
+            ),
+        )
+    if nodes:
+        pipeline.rpush(keys[1], *(str(node.id) for node in nodes))
+    pipeline.zadd(ACTIVE_KEY, {execution_id: time.time()})
+    # Safety net so state that is never persisted does not live forever
+    for key in keys + [_logs_key(execution_id)]:
+        pipeline.expire(key, settings.EXECUTION_STATE_KEY_TTL)
+    pipeline.execute()
+
+    return ExecutionState(keys[0], _decode(_encode(execution_values)))
+
+
+def get_execution(execution_id):
+    """Load the in-flight state of a run, or None if it is not held in Redis."""
+    raw = _redis().hgetall(_execution_key(execution_id))
+    return ExecutionState(_execution_key(execution_id), _decode(raw)) if raw else None
+
+
+def get_node_execution(execution_id, node_id):
+    """Load the in-flight state of one node of a run, or None if it is not held in Redis."""
+    key = _node_key(execution_id, node_id)
+    raw = _redis().hgetall(key)
+    return NodeExecutionState(key, _decode(raw)) if raw else None
+
+
+def get_live_execution(execution_id, user_id):
+    """Get a user's in-flight run, failing open to None when Redis is unavailable."""
+    try:
+        execution = get_execution(execution_id)
+    except STORE_UNAVAILABLE as e:
+        logger.warning(f"Execution state store unavailable: {str(e)}")
+        return None
+    if execution is None or execution.user_id != str(user_id):
+        return None
+    return execution
+
+
+def list_live_executions(user_id):
+    """List a user's in-flight runs, most recently active first."""
+    try:
+        redis = _redis()
+        execution_ids = [execution_id.decode() for execution_id in redis.zrevrange(ACTIVE_KEY, 0, -1)]
+        pipeline = redis.pipeline(transaction=False)
+        for execution_id in execution_ids:
+            pipeline.hgetall(_execution_key(execution_id))
+        raws = pipeline.execute()
+    except STORE_UNAVAILABLE as e:
+        logger.warning(f"Execution state store unavailable: {str(e)}")
+        return []
+
+    executions = [
+        ExecutionState(_execution_key(execution_id), _decode(raw))
+        for execution_id, raw in zip(execution_ids, raws)
+        if raw
+    ]
+    return [execution for execution in executions if execution.user_id == str(user_id)]
+
+
+def snapshot(execution, include_nodes=True):
+    """Render an in-flight run in the shape of WorkflowExecutionSerializer."""
+    end = execution.completed_at or timezone.now()
+    data = {
+        "id": execution.id,
+        "workflow": execution.workflow_id,
+        "workflow_name": execution.extra.get("workflow_name"),
+        "user": execution.user_id,
+        "user_email": execution.extra.get("user_email"),
+        "status": execution.status,
+        "trigger_data": execution.input_data,
+        "result_data": execution.output_data,
+        "error_data": execution.error_message,
+        "started_at": execution.started_at,
+        "completed_at": execution.completed_at,
+        "duration_seconds": (end - execution.started_at).total_seconds(),
+        "live": True,
+    }
+    if not include_nodes:
+        return data
+
+    node_executions = execution.node_executions()
+    finished = sum(1 for node in node_executions if node.status in NODE_PROGRESS_STATUSES)
+    data["progress_percentage"] = round(finished / len(node_executions) * 100, 2) if node_executions else 0
+    data["total_nodes"] = len(node_executions)
+    data["finished_nodes"] = finished
+    data["failed_nodes"] = sum(1 for node in node_executions if node.status == "failed")
+    data["node_executions"] = [
+        {
+            "id": node.id,
+            "workflow_execution": node.workflow_execution_id,
+            "node": node.node_id,
+            "node_name": node.extra.get("node_name"),
+            "node_type": node.extra.get("node_type"),
+            "status": node.status,
+            "input_data": node.input_data,
+            "output_data": node.output_data,
+            "error_data": node.error_message,
+            "started_at": node.started_at,
+            "completed_at": node.completed_at,
+            "duration_seconds": ((node.completed_at - node.started_at).total_seconds() if node.completed_at else None),
+            "retry_count": node.retry_count,
+            "prompt_tokens": node.prompt_tokens,
+            "completion_tokens": node.completion_tokens,
+            "provider_latency_ms": node.provider_latency_ms,
+        }
+        for node in node_executions
+    ]
+    return data
+
+
+def schedule_flush(delay=None):
+    """Schedule a flush of finished runs, folding further requests within the delay into the same flush."""
+    from .tasks import flush_execution_state
+
+    if delay is None:
+        delay = settings.EXECUTION_STATE_FLUSH_DELAY
+
+    if cache.add(FLUSH_SCHEDULED_KEY, 1, timeout=max(int(delay), 1)):
+        flush_execution_state.apply_async(countdown=delay)
+
+
+def flush_finished_executions(batch_size=None):
+    """Persist finished runs to the database in one transaction per batch, then drop their Redis state."""
+    batch_size = batch_size or settings.EXECUTION_STATE_FLUSH_BATCH_SIZE
+
+    # Anything finishing from now on needs a flush of its own
+    cache.delete(FLUSH_SCHEDULED_KEY)
+    if not cache.add(FLUSH_LOCK_KEY, 1, timeout=settings.EXECUTION_STATE_FLUSH_LOCK_TIMEOUT):
+        # Another flush is running; come back for whatever it leaves behind
+        schedule_flush()
+        return {"persisted": 0}
+
+    try:
+        redis = _redis()
+        execution_ids = [execution_id.decode() for execution_id in redis.zrange(FLUSH_QUEUE_KEY, 0, batch_size - 1)]
+        if not execution_ids:
+            return {"persisted": 0}
+
+        runs = _load_runs(redis, execution_ids)
+        persisted = _persist_runs(runs)
+
+        # Only drop state once it is committed; a crash before this point re-persists idempotently
+        pipeline = redis.pipeline()
+        pipeline.zrem(FLUSH_QUEUE_KEY, *execution_ids)
+        for execution_id in execution_ids:
+            node_keys = [_node_key(execution_id, node_id) for node_id in runs.get(execution_id, {}).get("node_ids", [])]
+            pipeline.delete(_execution_key(execution_id), _nodes_key(execution_id), _logs_key(execution_id), *node_keys)
+        pipeline.execute()
+    finally:
+        cache.delete(FLUSH_LOCK_KEY)
+
+    if len(execution_ids) == batch_size:
+        schedule_flush(delay=0)
+
+    logger.info(f"Execution state flush: persisted {persisted} of {len(execution_ids)} finished runs")
+    return {"persisted": persisted}
+
+
+def _load_runs(redis, execution_ids):
+    """Read the execution, node and log state of several runs in two round trips."""
+    pipeline = redis.pipeline(transaction=False)
+    for execution_id in execution_ids:
+        pipeline.hgetall(_execution_key(execution_id))
+        pipeline.lrange(_nodes_key(execution_id), 0, -1)
+        pipeline.lrange(_logs_key(execution_id), 0, -1)
+    replies = pipeline.execute()
+
+    runs = {}
+    for index, execution_id in enumerate(execution_ids):
+        raw_execution, raw_node_ids, raw_logs = replies[index * 3 : index * 3 + 3]
+        if not raw_execution:
+            # Expired or already cleaned up; nothing left to persist
+            continue
+        runs[execution_id] = {
+            "execution": _decode(raw_execution),
+            "node_ids": [node_id.decode() for node_id in raw_node_ids],
+            "logs": [_decode_log(entry) for entry in raw_logs],
+        }
+
+    pipeline = redis.pipeline(transaction=False)
+    for execution_id, run in runs.items():
+        for node_id in run["node_ids"]:
+            pipeline.hgetall(_node_key(execution_id, node_id))
+    replies = iter(pipeline.execute())
+    for run in runs.values():
+        run["nodes"] = [_decode(raw) for raw in (next(replies) for _ in run["node_ids"]) if raw]
+
+    return runs
+
+
+def _persist_runs(runs):
+    """Insert runs that are not in the database yet as one group commit. Returns how many were written."""
+    from apps.workflows.models import Workflow, WorkflowNode
+
+    if not runs:
+        return 0
+
+    existing = {str(pk) for pk in WorkflowExecution.objects.filter(id__in=list(runs)).values_list("id", flat=True)}
+    # Runs of workflows or nodes deleted mid-flight have nothing left to belong to
+    live_workflows = {
+        str(pk)
+        for pk in Workflow.objects.filter(
+            id__in={run["execution"]["workflow_id"] for run in runs.values()}
+        ).values_list("id", flat=True)
+    }
+    live_nodes = {
+        str(pk)
+        for pk in WorkflowNode.objects.filter(
+            id__in={node["node_id"] for run in runs.values() for node in run["nodes"]}
+        ).values_list("id", flat=True)
+    }
+
+    executions, node_executions, logs = [], [], []
+    for execution_id, run in runs.items():
+        if execution_id in existing or run["execution"]["workflow_id"] not in live_workflows:
+            continue
+
+        execution = WorkflowExecution(**{name: run["execution"][name] for name in EXECUTION_FIELDS})
+        executions.append(execution)
+        node_execution_ids = set()
+        for node in run["nodes"]:
+            if node["node_id"] in live_nodes:
+                node_executions.append(NodeExecution(**{name: node[name] for name in NODE_FIELDS}))
+                node_execution_ids.add(node["id"])
+                # The run is written once it has finished, so its progress counters are final here
+                execution.total_nodes += 1
+                execution.finished_nodes += node["status"] in NODE_PROGRESS_STATUSES
+                execution.failed_nodes += node["status"] == "failed"
+        for entry in run["logs"]:
+            node_execution_id = entry["node_execution_id"]
+            logs.append(
+                ExecutionLog(
+                    workflow_execution_id=execution_id,
+                    node_execution_id=node_execution_id if node_execution_id in node_execution_ids else None,
+                    level=entry["level"],
+                    message=entry["message"],
+                    data=entry["data"],
+                    timestamp=entry["timestamp"],
+                )
+            )
+
+    if not executions:
+        return 0
+
+    # started_at is auto_now_add, which bulk_create overwrites; restore the recorded times afterwards
+    started = {obj.id: obj.started_at for obj in executions + node_executions}
+    with transaction.atomic():
+        WorkflowExecution.objects.bulk_create(executions, batch_size=500)
+        NodeExecution.objects.bulk_create(node_executions, batch_size=500)
+        for obj in executions + node_executions:
+            obj.started_at = started[obj.id]
+        WorkflowExecution.objects.bulk_update(executions, ["started_at"], batch_size=500)
+        if node_executions:
+            NodeExecution.objects.bulk_update(node_executions, ["started_at"], batch_size=500)
+        ExecutionLog.objects.bulk_create(logs, batch_size=500)
+        # Counted in the same transaction, so a run is counted exactly when it is persisted
+        record_finished_executions(executions, node_executions)
+        bump_versions(execution.user_id for execution in executions)
+
+    return len(executions)
+
+
+def recover_abandoned_executions():
+    """Close out runs whose worker stopped reporting and queue them for persistence.
+
+    A run counts as abandoned once it has had no state change for
+    EXECUTION_STATE_RECOVERY_AFTER seconds. Runs that already reached a terminal
+    status but never made it onto the flush queue are queued as they are.
+    """
+    redis = _redis()
+    threshold = time.time() - settings.EXECUTION_STATE_RECOVERY_AFTER
+    stale_ids = [execution_id.decode() for execution_id in redis.zrangebyscore(ACTIVE_KEY, "-inf", threshold)]
+
+    recovered = 0
+    for execution_id in stale_ids:
+        execution = get_execution(execution_id)
+        if execution is None:
+            redis.zrem(ACTIVE_KEY, execution_id)
+            continue
+
+        if execution.status in OPEN_STATUSES:
+            execution.finish("failed", error_message="Execution state recovered after its worker stopped reporting")
+        else:
+            redis.pipeline().zrem(ACTIVE_KEY, execution_id).zadd(FLUSH_QUEUE_KEY, {execution_id: time.time()}).execute()
+        recovered += 1
+        logger.warning(f"Recovered abandoned execution {execution_id} from the state store")
+
+    if recovered:
+        schedule_flush(delay=0)
+    return {"recovered": recovered}
@@ -6,139 +6,114 @@ import logging
 from datetime import timedelta
 
 from celery import shared_task
-from django.db import models
-from django.db.models import Avg, Count
+from django.conf import settings
 from django.utils import timezone
 
-from .models import ExecutionMetrics, WorkflowExecution
+from .aggcache import bump_versions
+from .archive import archive_expired_executions
+from .cleanup import run_cleanup
+from .heartbeats import close_executions, reap_dead_executions
+from .models import ExecutionMetrics, ExecutionRollup, WorkflowExecution
+from .outbox import enqueue_email, flush_outbox
+from .partitioning import drop_expired_partitions, ensure_partitions, expiry_cutoff, is_supported
+from .rollups import period_start, prune_hourly_rollups, reconcile_rollups
+from .statestore import flush_finished_executions, recover_abandoned_executions
 
 logger = logging.getLogger(__name__)
 
 
 @shared_task
 def cleanup_old_executions():
-    """Clean up old execution records to manage database size."""
-    # Delete executions older than 90 days
-    cutoff_date = timezone.now() - timedelta(days=90)
-
-    # Keep successful executions for longer, delete failed ones sooner
-    old_failed_executions = WorkflowExecution.objects.filter(
-        started_at__lt=cutoff_date - timedelta(days=30),
-        status__in=["failed", "cancelled", "timeout"],
-    )
-
-    old_successful_executions = WorkflowExecution.objects.filter(started_at__lt=cutoff_date, status="completed")
-
-    failed_count = old_failed_executions.count()
-    successful_count = old_successful_executions.count()
+    """Clean up old execution records to manage database size.
 
-    # Delete old executions
-    old_failed_executions.delete()
-    old_successful_executions.delete()
+    Deletes in small checkpointed batches; a run that hits its time budget
+    queues a follow-up that resumes from the checkpoint. Expired executions
+    are copied to the cold archive first.
+    """
+    if settings.EXECUTION_ARCHIVE_ENABLED:
+        archive_expired_executions()
 
-    logger.info(f"Cleaned up {failed_count} failed and {successful_count} successful old executions")
-
-    return {
-        "deleted_failed": failed_count,
-        "deleted_successful": successful_count,
-        "total_deleted": failed_count + successful_count,
-    }
+    stats = run_cleanup()
+    if stats.get("finished") is False:
+        cleanup_old_executions.apply_async(countdown=settings.EXECUTION_CLEANUP_RESUME_DELAY)
+    return stats
 
 
 @shared_task
 def generate_execution_metrics():
-    """Generate daily execution metrics for reporting."""
-    today = timezone.now().date()
-
-    # Get all executions from today
-    today_executions = WorkflowExecution.objects.filter(started_at__date=today)
-
-    # Group by workflow and user
-    workflow_user_groups = today_executions.values("workflow", "user").annotate(
-        total=Count("id"),
-        successful=Count("id", filter=models.Q(status="completed")),
-        failed=Count("id", filter=models.Q(status__in=["failed", "cancelled", "timeout"])),
-        avg_duration=Avg("completed_at") - Avg("started_at"),
-    )
-
-    metrics_created = 0
-
-    for group in workflow_user_groups:
-        # Calculate total duration
-        workflow_executions = today_executions.filter(
-            workflow_id=group["workflow"],
-            user_id=group["user"],
-            completed_at__isnull=False,
-        )
-
-        total_duration = sum(
-            [(execution.completed_at - execution.started_at).total_seconds() for execution in workflow_executions]
-        )
-
-        # Create or update metrics
-        metrics, created = ExecutionMetrics.objects.get_or_create(
-            workflow_id=group["workflow"],
-            user_id=group["user"],
+    """Generate daily execution metrics for reporting from today's daily rollups."""
+    now = timezone.now()
+    today = now.date()
+
+    metrics = [
+        ExecutionMetrics(
+            workflow_id=rollup.workflow_id,
+            user_id=rollup.user_id,
             date=today,
-            defaults={
-                "total_executions": group["total"],
-                "successful_executions": group["successful"],
-                "failed_executions": group["failed"],
-                "avg_duration": (timedelta(seconds=total_duration / group["total"]) if group["total"] > 0 else None),
-                "total_duration": timedelta(seconds=total_duration),
-            },
+            total_executions=rollup.total_executions,
+            successful_executions=rollup.successful_executions,
+            failed_executions=rollup.failed_executions,
+            avg_duration=rollup.avg_duration,
+            total_duration=rollup.total_duration,
         )
+        for rollup in ExecutionRollup.objects.filter(granularity="day", period_start=period_start(now, "day"))
+    ]
+    ExecutionMetrics.objects.bulk_create(
+        metrics,
+        batch_size=500,
+        update_conflicts=True,
+        unique_fields=["workflow", "user", "date"],
+        update_fields=[
+            "total_executions",
+            "successful_executions",
+            "failed_executions",
+            "avg_duration",
+            "total_duration",
+            "updated_at",
+        ],
+    )
 
-        if not created:
-            # Update existing metrics
-            metrics.total_executions = group["total"]
-            metrics.successful_executions = group["successful"]
-            metrics.failed_executions = group["failed"]
-            metrics.avg_duration = timedelta(seconds=total_duration / group["total"]) if group["total"] > 0 else None
-            metrics.total_duration = timedelta(seconds=total_duration)
-            metrics.save()
-
-        metrics_created += 1
+    bump_versions(metric.user_id for metric in metrics)
 
-    logger.info(f"Generated metrics for {metrics_created} workflow-user combinations")
+    logger.info(f"Generated metrics for {len(metrics)} workflow-user combinations")
 
-    return {"date": today.isoformat(), "metrics_generated": metrics_created}
+    return {"date": today.isoformat(), "metrics_generated": len(metrics)}
 
 
 @shared_task
-def monitor_long_running_executions():
-    """Monitor and handle long-running executions."""
-    # Find executions running for more than 1 hour
-    timeout_threshold = timezone.now() - timedelta(hours=1)
+def reconcile_execution_rollups():
+    """Recompute recent execution rollups from the executions to repair drift, and prune old hourly rows."""
+    stats = reconcile_rollups()
+    stats["pruned_hourly"] = prune_hourly_rollups()
+    return stats
 
-    long_running = WorkflowExecution.objects.filter(status="running", started_at__lt=timeout_threshold)
 
-    timed_out_count = 0
-
-    for execution in long_running:
-        try:
-            # Mark as timed out
-            execution.status = "timeout"
-            execution.completed_at = timezone.now()
-            execution.error_message = "Execution timed out after 1 hour"
-            execution.save()
-
-            # Also mark running node executions as timed out
-            running_nodes = execution.node_executions.filter(status="running")
-            for node_execution in running_nodes:
-                node_execution.status = "timeout"
-                node_execution.completed_at = timezone.now()
-                node_execution.error_message = "Node execution timed out"
-                node_execution.save()
-
-            timed_out_count += 1
+@shared_task
+def watch_execution_heartbeats():
+    """Close out runs whose worker stopped sending heartbeats or that ran past their deadline."""
+    return reap_dead_executions()
 
-            logger.warning(f"Marked execution {execution.id} as timed out")
 
-        except Exception as e:
-            logger.error(f"Error timing out execution {execution.id}: {str(e)}")
+@shared_task
+def monitor_long_running_executions():
+    """Time out executions running for longer than EXECUTION_MAX_RUNTIME.
+
+    A backstop for runs the heartbeat watchdog never saw, e.g. ones started
+    while Redis was unavailable; all of them are closed with one UPDATE.
+    """
+    if not settings.EXECUTION_MAX_RUNTIME:
+        return {"timed_out_executions": 0}
+
+    timeout_threshold = timezone.now() - timedelta(seconds=settings.EXECUTION_MAX_RUNTIME)
+    timed_out = close_executions(
+        "timeout",
+        f"Execution timed out after {settings.EXECUTION_MAX_RUNTIME} seconds",
+        started_before=timeout_threshold,
+    )
+    for execution in timed_out:
+        logger.warning(f"Marked execution {execution.id} as timed out")
 
-    return {"timed_out_executions": timed_out_count}
+    return {"timed_out_executions": len(timed_out)}
 
 
 @shared_task
@@ -180,22 +155,13 @@ def send_execution_notifications(execution_id, notification_type="completed"):
         else:
             return {"status": "skipped", "reason": "Unknown notification type"}
 
-        # Send email notification
-        from django.conf import settings
-        from django.core.mail import send_mail
-
-        send_mail(
-            subject,
-            message,
-            settings.EMAIL_HOST_USER,
-            [user.email],
-            fail_silently=False,
-        )
+        # Queue the notification; the outbox delivers bursts over one SMTP connection
+        enqueue_email(subject, message, [user.email])
 
-        logger.info(f"Sent {notification_type} notification to {user.email} for execution {execution_id}")
+        logger.info(f"Queued {notification_type} notification to {user.email} for execution {execution_id}")
 
         return {
-            "status": "sent",
+            "status": "queued",
             "notification_type": notification_type,
             "recipient": user.email,
         }
@@ -206,3 +172,43 @@ def send_execution_notifications(execution_id, notification_type="completed"):
     except Exception as e:
         logger.error(f"Error sending notification for execution {execution_id}: {str(e)}")
         return {"status": "failed", "reason": str(e)}
+
+
+@shared_task
+def flush_email_outbox():
+    """Deliver queued outbox emails in batches over a pooled SMTP connection."""
+    return flush_outbox()
+
+
+@shared_task
+def flush_execution_state():
+    """Persist finished write-behind runs from Redis to the database in batches."""
+    return flush_finished_executions()
+
+
+@shared_task
+def recover_execution_state():
+    """Close out write-behind runs abandoned by a crashed worker and queue them for persistence."""
+    return recover_abandoned_executions()
+
+
+@shared_task
+def maintain_execution_partitions():
+    """Create upcoming monthly partitions and drop the ones past retention."""
+    if not is_supported():
+        return {"status": "skipped", "reason": "Partitioning requires PostgreSQL"}
+
+    created = ensure_partitions()
+    cutoff = expiry_cutoff()
+    if cutoff is None:
+        return {"created": created, "dropped": []}
+
+    # Runs still open in an expiring partition were abandoned long ago; close them so they are archived too
+    closed = close_executions("failed", "Execution was still open when its partition expired", started_before=cutoff)
+    if closed:
+        logger.warning(f"Closed {len(closed)} abandoned executions before dropping their partitions")
+    if settings.EXECUTION_ARCHIVE_ENABLED:
+        # Partitions past retention only hold expired executions; archive them before they are dropped
+        archive_expired_executions()
+    dropped = drop_expired_partitions()
+    return {"created": created, "closed": len(closed), "dropped": dropped}
@@ -0,0 +1,173 @@
+"""
+Tests for the email outbox, delivered to a local SMTP stand-in.
+"""
+
+import socketserver
+import threading
+from datetime import timedelta
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from apps.executions.models import OutboundEmail
+from apps.executions.outbox import enqueue_email, flush_outbox
+
+LOCMEM_CACHES = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+
+
+class MockSMTPHandler(socketserver.StreamRequestHandler):
+    """Speaks just enough SMTP to accept messages, refusing the server's rejected recipients."""
+
+    def reply(self, line):
+        self.wfile.write(f"{line}\r\n".encode())
+
+    def handle(self):
+        self.server.sessions += 1
+        recipients = []
+        self.reply("220 localhost ESMTP")
+        for line in self.rfile:
+            command = line.decode().strip()
+            verb = command[:4].upper()
+            if verb in ("EHLO", "HELO"):
+                self.reply("250 localhost")
+            elif verb == "RCPT":
+                recipient = command.partition(":")[2].strip().strip("<>")
+                if recipient in self.server.rejected:
+                    self.reply("550 Mailbox unavailable")
+                else:
+                    recipients.append(recipient)
+                    self.reply("250 OK")
+            elif verb == "DATA":
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+                for data in self.rfile:
+                    if data == b".\r\n":
+                        break
+                self.server.messages.extend(recipients)
+                recipients = []
+                self.reply("250 OK")
+            elif verb == "QUIT":
+                self.reply("221 Bye")
+                return
+            else:
+                # MAIL, RSET and NOOP
+                if verb in ("MAIL", "RSET"):
+                    recipients = []
+                self.reply("250 OK")
+
+
+class OutboxFlushTests(TestCase):
+    """Flushes the outbox to the SMTP stand-in."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), MockSMTPHandler)
+        cls.server.daemon_threads = True
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    def setUp(self):
+        overrides = override_settings(
+            CACHES=LOCMEM_CACHES,
+            EMAIL_BACKEND="django.core.mail.backends.smtp.EmailBackend",
+            EMAIL_HOST="127.0.0.1",
+            EMAIL_PORT=self.server.server_address[1],
+            EMAIL_USE_TLS=False,
+            EMAIL_HOST_USER="",
+            EMAIL_HOST_PASSWORD="",
+            EMAIL_OUTBOX_DEFAULT_DOMAIN_RATE=0,
+            EMAIL_OUTBOX_DOMAIN_RATES={},
+            EMAIL_OUTBOX_RETRY_BACKOFF=60,
+        )
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        cache.clear()
+        self.server.sessions = 0
+        self.server.messages = []
+        self.server.rejected = set()
+
+        # Follow-up flushes are recorded rather than queued
+        patcher = mock.patch("apps.executions.outbox.schedule_flush")
+        self.schedule_flush = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_batch_is_sent_over_one_connection(self):
+        recipients = ["a@example.com", "b@example.org", "c@example.net"]
+        enqueue_email("Subject", "Body", recipients)
+
+        stats = flush_outbox()
+
+        self.assertEqual(stats, {"sent": 3, "retried": 0, "failed": 0, "deferred": 0})
+        self.assertEqual(self.server.sessions, 1)
+        self.assertCountEqual(self.server.messages, recipients)
+        self.assertFalse(OutboundEmail.objects.exclude(status="sent").exists())
+        self.schedule_flush.assert_not_called()
+
+    def test_batch_size_schedules_the_next_batch(self):
+        enqueue_email("Subject", "Body", ["a@example.com", "b@example.com", "c@example.com"])
+
+        stats = flush_outbox(batch_size=2)
+
+        self.assertEqual(stats["sent"], 2)
+        self.assertEqual(OutboundEmail.objects.filter(status="pending").count(), 1)
+        self.schedule_flush.assert_called_once_with(delay=0)
+
+    @override_settings(EMAIL_OUTBOX_DOMAIN_RATES={"example.com": "2"})
+    def test_domain_throttle_defers_the_excess(self):
+        enqueue_email("Subject", "Body", ["a@example.com", "b@example.com", "c@example.com", "d@example.org"])
+
+        stats = flush_outbox()
+
+        self.assertEqual(stats, {"sent": 3, "retried": 0, "failed": 0, "deferred": 1})
+        self.assertEqual(sum(recipient.endswith("@example.com") for recipient in self.server.messages), 2)
+        (deferred,) = OutboundEmail.objects.filter(status="pending")
+        self.assertEqual(deferred.recipient_domain, "example.com")
+        self.assertEqual(deferred.attempts, 0)
+        self.assertGreater(deferred.next_attempt_at, timezone.now())
+        # The follow-up waits for the next throttle window
+        (call,) = self.schedule_flush.call_args_list
+        self.assertTrue(0 < call.kwargs["delay"] <= 60)
+
+    def test_rejected_recipient_backs_off(self):
+        self.server.rejected = {"bounce@example.com"}
+        enqueue_email("Subject", "Body", ["ok@example.com", "bounce@example.com"])
+
+        stats = flush_outbox()
+
+        self.assertEqual(stats, {"sent": 1, "retried": 1, "failed": 0, "deferred": 0})
+        bounced = OutboundEmail.objects.get(recipient="bounce@example.com")
+        self.assertEqual(bounced.status, "pending")
+        self.assertEqual(bounced.attempts, 1)
+        self.assertIn("Mailbox unavailable", bounced.last_error)
+        self.assertAlmostEqual(
+            bounced.next_attempt_at, timezone.now() + timedelta(seconds=60), delta=timedelta(seconds=5)
+        )
+        self.schedule_flush.assert_called_once_with(delay=60)
+
+        # The second failure waits twice as long
+        OutboundEmail.objects.filter(id=bounced.id).update(next_attempt_at=timezone.now())
+        self.schedule_flush.reset_mock()
+        flush_outbox()
+        bounced.refresh_from_db()
+        self.assertEqual(bounced.attempts, 2)
+        self.assertAlmostEqual(
+            bounced.next_attempt_at, timezone.now() + timedelta(seconds=120), delta=timedelta(seconds=5)
+        )
+
+    @override_settings(EMAIL_OUTBOX_MAX_ATTEMPTS=1)
+    def test_gives_up_after_max_attempts(self):
+        self.server.rejected = {"bounce@example.com"}
+        enqueue_email("Subject", "Body", ["bounce@example.com"])
+
+        stats = flush_outbox()
+
+        self.assertEqual(stats, {"sent": 0, "retried": 0, "failed": 1, "deferred": 0})
+        self.assertEqual(OutboundEmail.objects.get().status, "failed")
+        self.schedule_flush.assert_not_called()
@@ -0,0 +1,259 @@
+"""
+Span-based tracing of runs: the engine and node tasks time their steps, and each run's spans are stored as one trace.
+"""
+
+import contextvars
+import json
+import logging
+import os
+import secrets
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from datetime import timezone as dt_timezone
+
+from django.conf import settings
+from django.db import DatabaseError
+
+from .models import ExecutionTrace
+
+logger = logging.getLogger(__name__)
+
+SERVICE_NAME = "orchestrix"
+SCOPE_NAME = "orchestrix.executions"
+
+# OpenTelemetry span status codes
+STATUS_UNSET = 0
+STATUS_ERROR = 2
+
+_current_span = contextvars.ContextVar("execution_trace_span", default=None)
+
+
+class Trace:
+    """The spans one task records for a run.
+
+    Spans are kept as rows, ``[span id, parent span id, name, start (unix ns),
+    end (unix ns), attributes, error]``, so a node task can hand its spans back
+    to the workflow task with its result.
+    """
+
+    def __init__(self, trace_id=None):
+        self.trace_id = trace_id or secrets.token_hex(16)
+        self.rows = []
+
+
+class Span:
+    """One timed step of a run."""
+
+    __slots__ = ("trace", "span_id", "parent_id", "name", "start", "attributes", "error")
+
+    def __init__(self, trace, name, parent_id=None, attributes=None, start=None):
+        self.trace = trace
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.name = name
+        self.start = start or time.time_ns()
+        self.attributes = attributes or {}
+        self.error = None
+
+    def set(self, **attributes):
+        """Add attributes learned while the step runs, such as a response status."""
+        self.attributes.update(attributes)
+
+    def finish(self, end=None):
+        self.trace.rows.append(
+            [self.span_id, self.parent_id, self.name, self.start, end or time.time_ns(), self.attributes, self.error]
+        )
+
+
+def _error(exception):
+    return f"{type(exception).__name__}: {str(exception)}"
+
+
+@contextmanager
+def span(name, **attributes):
+    """Time a block as a child of the current span. Does nothing, yielding None, outside a trace."""
+    parent = _current_span.get()
+    if parent is None:
+        yield None
+        return
+
+    current = Span(parent.trace, name, parent.span_id, attributes)
+    token = _current_span.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.error = _error(e)
+        raise
+    finally:
+        _current_span.reset(token)
+        current.finish()
+
+
+@contextmanager
+def trace_task(name, context=None, **attributes):
+    """Open the root span of a task's trace, yielding the Trace, or None when tracing is disabled.
+
+    ``context`` comes from ``propagation_context`` in the task that sent this
+    one: the trace is continued under the sender's span, and the time the
+    message spent waiting for a worker is recorded as a ``queue.wait`` span.
+    """
+    if not settings.EXECUTION_TRACING_ENABLED:
+        yield None
+        return
+
+    trace = Trace(context["trace_id"] if context else None)
+    root = Span(trace, name, context["parent_id"] if context else None, attributes)
+    if context and context.get("sent_at"):
+        Span(trace, "queue.wait", root.parent_id, start=context["sent_at"]).finish(end=root.start)
+
+    token = _current_span.set(root)
+    try:
+        yield trace
+    except BaseException as e:
+        root.error = _error(e)
+        raise
+    finally:
+        _current_span.reset(token)
+        root.finish()
+
+
+def propagation_context():
+    """Get the context a task sent from the current span continues the trace with, or None outside a trace."""
+    current = _current_span.get()
+    if current is None:
+        return None
+    return {"trace_id": current.trace.trace_id, "parent_id": current.span_id, "sent_at": time.time_ns()}
+
+
+def merge_spans(rows):
+    """Add spans another task recorded for this run to the current trace."""
+    current = _current_span.get()
+    if current is not None and rows:
+        current.trace.rows.extend(rows)
+
+
+def save_trace(execution_id, trace):
+    """Store a run's spans compactly as its ExecutionTrace, and export them when an export directory is set.
+
+    Tracing is diagnostic, so a failure to store the trace is logged rather
+    than failing the run.
+    """
+    if not trace.rows:
+        return None
+
+    started = min(row[3] for row in trace.rows)
+    ended = max(row[4] for row in trace.rows)
+    rows = sorted(trace.rows, key=lambda row: row[3])
+    try:
+        execution_trace = ExecutionTrace.objects.create(
+            workflow_execution_id=execution_id,
+            trace_id=trace.trace_id,
+            started_at=datetime.fromtimestamp(started / 1e9, tz=dt_timezone.utc),
+            duration_ms=(ended - started) // 1_000_000,
+            span_count=len(rows),
+            spans=[
+                [span_id, parent_id, name, (start - started) // 1000, (end - start) // 1000, attributes, error]
+                for span_id, parent_id, name, start, end, attributes, error in rows
+            ],
+        )
+    except DatabaseError as e:
+        logger.error(f"Failed to store the trace of execution {execution_id}: {str(e)}")
+        return None
+
+    if settings.EXECUTION_TRACE_EXPORT_DIR:
+        path = os.path.join(settings.EXECUTION_TRACE_EXPORT_DIR, f"{execution_id}.json")
+        try:
+            os.makedirs(settings.EXECUTION_TRACE_EXPORT_DIR, exist_ok=True)
+            with open(path, "w") as f:
+                json.dump(to_otel(execution_trace), f)
+        except OSError as e:
+            logger.error(f"Failed to export the trace of execution {execution_id} to {path}: {str(e)}")
+    return execution_trace
+
+
+def _otel_value(value):
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def _otel_attributes(attributes):
+    return [{"key": key, "value": _otel_value(value)} for key, value in attributes.items() if value is not None]
+
+
+def to_otel(execution_trace):
+    """Render a trace as OpenTelemetry JSON, in the OTLP ``ExportTraceServiceRequest`` shape."""
+    started_ns = int(execution_trace.started_at.timestamp() * 1_000_000) * 1000
+    spans = []
+    for span_id, parent_id, name, offset_us, duration_us, attributes, error in execution_trace.spans:
+        start = started_ns + offset_us * 1000
+        spans.append(
+            {
+                "traceId": execution_trace.trace_id,
+                "spanId": span_id,
+                "parentSpanId": parent_id or "",
+                "name": name,
+                "kind": 1,  # SPAN_KIND_INTERNAL
+                "startTimeUnixNano": str(start),
+                "endTimeUnixNano": str(start + duration_us * 1000),
+                "attributes": _otel_attributes(attributes),
+                "status": {"code": STATUS_ERROR, "message": error} if error else {"code": STATUS_UNSET},
+            }
+        )
+    return {
+        "resourceSpans": [
+            {
+                "resource": {
+                    "attributes": _otel_attributes(
+                        {
+                            "service.name": SERVICE_NAME,
+                            "orchestrix.execution_id": str(execution_trace.workflow_execution_id),
+                        }
+                    )
+                },
+                "scopeSpans": [{"scope": {"name": SCOPE_NAME}, "spans": spans}],
+            }
+        ]
+    }
+
+
+def waterfall(execution_trace):
+    """Lay a trace out as a waterfall: spans in tree order, each with its depth and its offset from the run start."""
+    children = {}
+    span_ids = {row[0] for row in execution_trace.spans}
+    for row in execution_trace.spans:
+        # A span whose parent was lost, e.g. with a retried task, is shown at the top level
+        parent_id = row[1] if row[1] in span_ids else None
+        children.setdefault(parent_id, []).append(row)
+
+    spans = []
+    stack = [(row, 0) for row in reversed(children.get(None, []))]
+    while stack:
+        (span_id, parent_id, name, offset_us, duration_us, attributes, error), depth = stack.pop()
+        spans.append(
+            {
+                "span_id": span_id,
+                "parent_id": parent_id,
+                "name": name,
+                "depth": depth,
+                "offset_ms": offset_us / 1000,
+                "duration_ms": duration_us / 1000,
+                "attributes": attributes,
+                "error": error,
+            }
+        )
+        stack.extend((row, depth + 1) for row in reversed(children.get(span_id, [])))
+
+    return {
+        "execution_id": str(execution_trace.workflow_execution_id),
+        "trace_id": execution_trace.trace_id,
+        "started_at": execution_trace.started_at,
+        "duration_ms": execution_trace.duration_ms,
+        "span_count": execution_trace.span_count,
+        "spans": spans,
+    }
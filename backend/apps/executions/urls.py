@@ -8,10 +8,14 @@ from rest_framework.routers import DefaultRouter
 from . import views
 
 # Create a router and register viewsets
+# Prefixed viewsets come first so the root viewset's detail route does not swallow their URLs
 router = DefaultRouter()
-router.register(r"", views.WorkflowExecutionViewSet, basename="workflowexecution")
 router.register(r"node-executions", views.NodeExecutionViewSet, basename="nodeexecution")
 router.register(r"metrics", views.ExecutionMetricsViewSet, basename="executionmetrics")
+router.register(r"rollups", views.ExecutionRollupViewSet, basename="executionrollup")
+router.register(r"node-rollups", views.NodeExecutionRollupViewSet, basename="nodeexecutionrollup")
+router.register(r"archived", views.ArchivedExecutionViewSet, basename="archivedexecution")
+router.register(r"", views.WorkflowExecutionViewSet, basename="workflowexecution")
 
 urlpatterns = [
     path("", include(router.urls)),
@@ -2,27 +2,118 @@
 Views for execution management.
 """
 
+import logging
+import time
+import uuid
+from contextlib import aclosing
 from datetime import timedelta
 
-from django.db import models
+from django.conf import settings
+from django.http import HttpResponse, StreamingHttpResponse
 from django.utils import timezone
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import filters, status, viewsets
 from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.generics import get_object_or_404
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.renderers import BaseRenderer, JSONRenderer
 from rest_framework.response import Response
-
-from .models import ExecutionMetrics, NodeExecution, WorkflowExecution
+from rest_framework_simplejwt.authentication import JWTAuthentication
+
+from apps.authentication.authentication import QueryParamJWTAuthentication
+from orchestrix.fieldsets import SparseFieldsetViewMixin
+from orchestrix.pagination import KeysetPagination
+
+from .aggcache import get_or_compute
+from .aggregates import aggregate_executions, summarize_metrics
+from .archive import ArchiveError, read_archived_execution
+from .events import execution_status, stream_events
+from .models import (
+    ArchivedExecution,
+    ExecutionLog,
+    ExecutionMetrics,
+    ExecutionProfile,
+    ExecutionRollup,
+    ExecutionTrace,
+    NodeExecution,
+    NodeExecutionRollup,
+    WorkflowExecution,
+)
+from .profiling import render_text
+from .rollups import duration_percentiles, node_hotspots, period_start
 from .serializers import (
+    ArchivedExecutionSerializer,
     ExecutionCreateSerializer,
+    ExecutionLogSerializer,
     ExecutionMetricsSerializer,
+    ExecutionRollupSerializer,
+    NodeExecutionRollupSerializer,
     NodeExecutionSerializer,
     WorkflowExecutionListSerializer,
     WorkflowExecutionSerializer,
 )
+from .statestore import get_live_execution, list_live_executions, snapshot
+from .tracing import to_otel, waterfall
+
+logger = logging.getLogger(__name__)
+
+
+def _filter_logs(logs, request):
+    """Apply the ``level`` and ``after`` (log entry ID, for tailing) query params to a log queryset."""
+    level = request.query_params.get("level")
+    if level:
+        logs = logs.filter(level=level)
+
+    after = request.query_params.get("after")
+    if after:
+        if not after.isdigit():
+            raise ValidationError({"after": "Must be a log entry ID."})
+        logs = logs.filter(id__gt=int(after))
+
+    return logs.order_by("id")
+
+
+def _filter_rollups(rollups, request):
+    """Apply the ``days`` query param, limiting a rollup queryset to recent periods."""
+    days = request.query_params.get("days")
+    if days:
+        if not days.isdigit():
+            raise ValidationError({"days": "Must be a number of days."})
+        rollups = rollups.filter(period_start__gte=timezone.now() - timedelta(days=int(days)))
+    return rollups
+
 
+class EventStreamRenderer(BaseRenderer):
+    """Lets clients negotiate ``text/event-stream``; streams bypass rendering, so only errors are rendered, as JSON."""
 
-class WorkflowExecutionViewSet(viewsets.ModelViewSet):
+    media_type = "text/event-stream"
+    format = "event-stream"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return JSONRenderer().render(data)
+
+
+async def _server_sent_events(user_id, execution_id=None):
+    """Render an execution event stream as SSE, ending it after EXECUTION_EVENTS_SSE_MAX_AGE seconds."""
+    deadline = time.monotonic() + settings.EXECUTION_EVENTS_SSE_MAX_AGE
+    events = stream_events(user_id, execution_id, keepalive=settings.EXECUTION_EVENTS_KEEPALIVE)
+    async with aclosing(events):
+        async for event in events:
+            yield ": keep-alive\n\n" if event is None else f"data: {event}\n\n"
+            if time.monotonic() >= deadline:
+                return
+
+
+def _event_stream_response(user_id, execution_id=None):
+    # Served asynchronously under ASGI; the stream never ends on its own, so WSGI cannot serve it
+    response = StreamingHttpResponse(_server_sent_events(user_id, execution_id), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"
+    return response
+
+
+class WorkflowExecutionViewSet(SparseFieldsetViewMixin, viewsets.ModelViewSet):
     """ViewSet for workflow executions."""
 
     permission_classes = [IsAuthenticated]
@@ -35,6 +126,7 @@ class WorkflowExecutionViewSet(viewsets.ModelViewSet):
     search_fields = ["workflow__name"]
     ordering_fields = ["started_at", "completed_at"]
     ordering = ["-started_at"]
+    pagination_class = KeysetPagination
 
     def get_queryset(self):
         """Get executions for workflows owned by the current user."""
@@ -65,11 +157,59 @@ class WorkflowExecutionViewSet(viewsets.ModelViewSet):
             user_id=str(self.request.user.id),
             input_data=execution.input_data,
             trigger_source="manual",
+            profile=serializer.validated_data.get("profile"),
         )
 
+    def retrieve(self, request, *args, **kwargs):
+        """Get an execution, reading live state from Redis while a write-behind run is active."""
+        live = get_live_execution(kwargs["pk"], request.user.id)
+        if live is not None:
+            return Response(snapshot(live))
+        return super().retrieve(request, *args, **kwargs)
+
+    @action(detail=False, methods=["get"])
+    def live(self, request):
+        """List the user's write-behind runs that are still held in Redis."""
+        return Response(
+            [snapshot(execution, include_nodes=False) for execution in list_live_executions(request.user.id)]
+        )
+
+    @action(
+        detail=False,
+        methods=["get"],
+        url_path="events",
+        renderer_classes=[JSONRenderer, EventStreamRenderer],
+        authentication_classes=[JWTAuthentication, QueryParamJWTAuthentication],
+    )
+    def user_events(self, request):
+        """Stream the events of all of the user's executions as Server-Sent Events."""
+        return _event_stream_response(request.user.id)
+
+    @action(
+        detail=True,
+        methods=["get"],
+        url_path="events",
+        renderer_classes=[JSONRenderer, EventStreamRenderer],
+        authentication_classes=[JWTAuthentication, QueryParamJWTAuthentication],
+    )
+    def events(self, request, pk=None):
+        """Stream the execution's events as Server-Sent Events until it finishes."""
+        if execution_status(pk, request.user.id) is None:
+            raise NotFound()
+        return _event_stream_response(request.user.id, pk)
+
     @action(detail=True, methods=["post"])
     def cancel(self, request, pk=None):
         """Cancel a running execution."""
+        live = get_live_execution(pk, request.user.id)
+        if live is not None:
+            if not live.finish("cancelled", stop_in_flight=True):
+                return Response(
+                    {"error": "Execution is not running"},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+            return Response(snapshot(live, include_nodes=False))
+
         execution = self.get_object()
 
         if execution.status not in ["running", "pending"]:
@@ -78,12 +218,15 @@ class WorkflowExecutionViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
-        execution.status = "cancelled"
-        execution.completed_at = timezone.now()
-        execution.save(update_fields=["status", "completed_at"])
+        now = timezone.now()
+        if not execution.transition("cancelled", ["running", "pending"], completed_at=now):
+            return Response(
+                {"error": "Execution is not running"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
 
-        # Cancel running node executions
-        execution.node_executions.filter(status="running").update(status="cancelled", completed_at=timezone.now())
+        # Cancel the node in flight and skip the ones that never started
+        execution.skip_pending_nodes(in_flight_status="cancelled")
 
         serializer = self.get_serializer(execution)
         return Response(serializer.data)
@@ -121,6 +264,61 @@ class WorkflowExecutionViewSet(viewsets.ModelViewSet):
         serializer = self.get_serializer(new_execution)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
+    @action(detail=True, methods=["get"])
+    def trace(self, request, pk=None):
+        """Get the execution's trace as a waterfall of spans, or as OpenTelemetry JSON with ``?export=otel``."""
+        execution_trace = get_object_or_404(
+            ExecutionTrace.objects.all(), workflow_execution_id=pk, workflow_execution__user=request.user
+        )
+        if request.query_params.get("export") == "otel":
+            return Response(to_otel(execution_trace))
+        return Response(waterfall(execution_trace))
+
+    @action(detail=True, methods=["get"])
+    def profile(self, request, pk=None):
+        """Get the profile of a profiled execution; ``?download=json`` or ``?download=text`` returns it as a file."""
+        execution_profile = get_object_or_404(
+            ExecutionProfile.objects.all(), workflow_execution_id=pk, workflow_execution__user=request.user
+        )
+        data = {
+            "execution_id": str(execution_profile.workflow_execution_id),
+            "mode": execution_profile.mode,
+            "duration_ms": execution_profile.duration_ms,
+            "sample_count": execution_profile.sample_count,
+            "sample_interval_ms": execution_profile.sample_interval_ms,
+            "task_count": execution_profile.task_count,
+            "created_at": execution_profile.created_at,
+            "functions": [
+                {"function": name, "calls": calls, "self_seconds": self_time, "cumulative_seconds": cumulative}
+                for name, calls, self_time, cumulative in execution_profile.functions
+            ],
+        }
+
+        download = request.query_params.get("download")
+        if download == "text":
+            response = HttpResponse(render_text(execution_profile), content_type="text/plain; charset=utf-8")
+        elif download == "json":
+            response = HttpResponse(JSONRenderer().render(data), content_type="application/json")
+        else:
+            return Response(data)
+        extension = "txt" if download == "text" else "json"
+        response["Content-Disposition"] = f'attachment; filename="profile-{pk}.{extension}"'
+        return response
+
+    @action(detail=True, methods=["get"])
+    def logs(self, request, pk=None):
+        """Page through the execution's log entries."""
+        execution = self.get_object()
+        logs = _filter_logs(ExecutionLog.objects.filter(workflow_execution=execution), request)
+
+        page = self.paginate_queryset(logs)
+        if page is not None:
+            serializer = ExecutionLogSerializer(page, many=True)
+            return self.get_paginated_response(serializer.data)
+
+        serializer = ExecutionLogSerializer(logs, many=True)
+        return Response(serializer.data)
+
     @action(detail=False, methods=["get"])
     def stats(self, request):
         """Get execution statistics."""
@@ -132,33 +330,14 @@ class WorkflowExecutionViewSet(viewsets.ModelViewSet):
 
         recent_executions = executions.filter(started_at__gte=start_date)
 
-        stats = {
-            "total_executions": recent_executions.count(),
-            "successful_executions": recent_executions.filter(status="completed").count(),
-            "failed_executions": recent_executions.filter(status="failed").count(),
-            "running_executions": recent_executions.filter(status="running").count(),
-            "cancelled_executions": recent_executions.filter(status="cancelled").count(),
-            "average_duration": None,
-            "workflows_executed": recent_executions.values("workflow").distinct().count(),
-        }
-
-        # Calculate average duration for completed executions
-        completed_executions = recent_executions.filter(status="completed", completed_at__isnull=False)
-
-        if completed_executions.exists():
-            durations = []
-            for execution in completed_executions:
-                if execution.started_at and execution.completed_at:
-                    duration = execution.completed_at - execution.started_at
-                    durations.append(duration.total_seconds())
-
-            if durations:
-                stats["average_duration"] = sum(durations) / len(durations)
+        stats = get_or_compute(
+            request.user.id, "execution_stats", {"days": days}, lambda: aggregate_executions(recent_executions)
+        )
 
         return Response(stats)
 
 
-class NodeExecutionViewSet(viewsets.ReadOnlyModelViewSet):
+class NodeExecutionViewSet(SparseFieldsetViewMixin, viewsets.ReadOnlyModelViewSet):
     """ViewSet for node executions (read-only)."""
 
     serializer_class = NodeExecutionSerializer
@@ -167,6 +346,7 @@ class NodeExecutionViewSet(viewsets.ReadOnlyModelViewSet):
     filterset_fields = ["status", "node__node_type", "workflow_execution"]
     ordering_fields = ["started_at", "completed_at"]
     ordering = ["started_at"]
+    pagination_class = KeysetPagination
 
     def get_queryset(self):
         """Get node executions for workflows owned by the current user."""
@@ -174,6 +354,20 @@ class NodeExecutionViewSet(viewsets.ReadOnlyModelViewSet):
             "workflow_execution", "node"
         )
 
+    @action(detail=True, methods=["get"])
+    def logs(self, request, pk=None):
+        """Page through the node execution's log entries."""
+        node_execution = self.get_object()
+        logs = _filter_logs(ExecutionLog.objects.filter(node_execution=node_execution), request)
+
+        page = self.paginate_queryset(logs)
+        if page is not None:
+            serializer = ExecutionLogSerializer(page, many=True)
+            return self.get_paginated_response(serializer.data)
+
+        serializer = ExecutionLogSerializer(logs, many=True)
+        return Response(serializer.data)
+
     @action(detail=True, methods=["post"])
     def retry_node(self, request, pk=None):
         """Retry a failed node execution."""
@@ -207,6 +401,38 @@ class NodeExecutionViewSet(viewsets.ReadOnlyModelViewSet):
         return Response(serializer.data)
 
 
+class ArchivedExecutionViewSet(viewsets.ReadOnlyModelViewSet):
+    """ViewSet for executions in the cold archive (read-only)."""
+
+    serializer_class = ArchivedExecutionSerializer
+    permission_classes = [IsAuthenticated]
+    filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
+    filterset_fields = ["status", "workflow_id"]
+    ordering_fields = ["started_at", "archived_at"]
+    ordering = ["-started_at"]
+    lookup_field = "execution_id"
+
+    def get_queryset(self):
+        """Get archived executions of the current user."""
+        return ArchivedExecution.objects.filter(user=self.request.user).select_related("archive")
+
+    def retrieve(self, request, *args, **kwargs):
+        """Get one archived execution, read back from its archive file."""
+        entry = self.get_object()
+        try:
+            record = read_archived_execution(entry)
+        except ArchiveError as e:
+            logger.error(f"Error reading archived execution {entry.execution_id}: {str(e)}")
+            return Response(
+                {"error": "Archived execution could not be read"},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE,
+            )
+
+        data = self.get_serializer(entry).data
+        data.update(record)
+        return Response(data)
+
+
 class ExecutionMetricsViewSet(viewsets.ReadOnlyModelViewSet):
     """ViewSet for execution metrics (read-only)."""
 
@@ -232,20 +458,67 @@ class ExecutionMetricsViewSet(viewsets.ReadOnlyModelViewSet):
 
         recent_metrics = metrics.filter(date__gte=start_date)
 
-        summary = {
-            "total_days": recent_metrics.count(),
-            "total_executions": recent_metrics.aggregate(total=models.Sum("total_executions"))["total"] or 0,
-            "total_successful": recent_metrics.aggregate(total=models.Sum("successful_executions"))["total"] or 0,
-            "total_failed": recent_metrics.aggregate(total=models.Sum("failed_executions"))["total"] or 0,
-            "average_daily_executions": recent_metrics.aggregate(avg=models.Avg("total_executions"))["avg"] or 0,
-            "average_duration": recent_metrics.aggregate(avg=models.Avg("average_duration"))["avg"] or 0,
-        }
+        def compute():
+            summary = summarize_metrics(recent_metrics)
+            summary["duration_percentiles"] = duration_percentiles(
+                ExecutionRollup.objects.filter(user=request.user, granularity="day", period_start__date__gte=start_date)
+            )
+            return summary
 
-        # Calculate success rate
-        total_executions = summary["total_executions"]
-        if total_executions > 0:
-            summary["success_rate"] = (summary["total_successful"] / total_executions) * 100
-        else:
-            summary["success_rate"] = 0
+        return Response(get_or_compute(request.user.id, "metrics_summary", {"days": days}, compute))
+
+
+class ExecutionRollupViewSet(viewsets.ReadOnlyModelViewSet):
+    """ViewSet for hourly and daily execution rollups (read-only)."""
+
+    serializer_class = ExecutionRollupSerializer
+    permission_classes = [IsAuthenticated]
+    filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
+    filterset_fields = ["workflow", "granularity"]
+    ordering_fields = ["period_start"]
+    ordering = ["-period_start"]
+
+    def get_queryset(self):
+        """Get rollups of the current user's workflows, optionally limited to the last ``days``."""
+        rollups = ExecutionRollup.objects.filter(user=self.request.user).select_related("workflow")
+        return _filter_rollups(rollups, self.request)
 
-        return Response(summary)
+
+class NodeExecutionRollupViewSet(viewsets.ReadOnlyModelViewSet):
+    """ViewSet for hourly and daily node execution rollups (read-only)."""
+
+    serializer_class = NodeExecutionRollupSerializer
+    permission_classes = [IsAuthenticated]
+    filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
+    filterset_fields = ["workflow", "node", "granularity"]
+    ordering_fields = ["period_start"]
+    ordering = ["-period_start"]
+
+    def get_queryset(self):
+        """Get node rollups of the current user's workflows, optionally limited to the last ``days``."""
+        rollups = NodeExecutionRollup.objects.filter(workflow__user=self.request.user).select_related("node")
+        return _filter_rollups(rollups, self.request)
+
+    @action(detail=False, methods=["get"])
+    def hotspots(self, request):
+        """Get the hottest and slowest nodes over the last ``days`` (default 7), for one ``workflow`` or all."""
+        days = request.query_params.get("days", "7")
+        limit = request.query_params.get("limit", "10")
+        if not days.isdigit():
+            raise ValidationError({"days": "Must be a number of days."})
+        if not limit.isdigit():
+            raise ValidationError({"limit": "Must be a number of nodes."})
+
+        rollups = NodeExecutionRollup.objects.filter(
+            workflow__user=request.user,
+            granularity="day",
+            period_start__gte=period_start(timezone.now() - timedelta(days=int(days)), "day"),
+        )
+        workflow = request.query_params.get("workflow")
+        if workflow:
+            try:
+                rollups = rollups.filter(workflow_id=uuid.UUID(workflow))
+            except ValueError:
+                raise ValidationError({"workflow": "Must be a workflow ID."})
+
+        return Response({"days": int(days), **node_hotspots(rollups, limit=int(limit))})
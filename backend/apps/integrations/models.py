@@ -3,6 +3,7 @@ Integration models for external service connections and API integrations.
 """
 
 import base64
+import functools
 import uuid
 
 from cryptography.fernet import Fernet, InvalidToken
@@ -14,6 +15,15 @@ from django.utils.translation import gettext_lazy as _
 User = get_user_model()
 
 
+@functools.lru_cache(maxsize=1)
+def get_credential_cipher():
+    """Get the Fernet cipher used to encrypt integration credentials."""
+    # Generate a key for encryption (in production, use proper key management)
+    key = settings.SECRET_KEY.encode()[:32]  # Use first 32 chars of secret key
+    key = base64.urlsafe_b64encode(key.ljust(32, b"0"))
+    return Fernet(key)
+
+
 class IntegrationCategory(models.Model):
     """Categories for organizing integrations."""
 
@@ -93,10 +103,7 @@ class Integration(models.Model):
         if not credentials:
             return {}
 
-        # Generate a key for encryption (in production, use proper key management)
-        key = settings.SECRET_KEY.encode()[:32]  # Use first 32 chars of secret key
-        key = base64.urlsafe_b64encode(key.ljust(32, b"0"))
-        f = Fernet(key)
+        f = get_credential_cipher()
 
         encrypted_creds = {}
         for key_name, value in credentials.items():
@@ -115,9 +122,7 @@ class Integration(models.Model):
         if not self.credentials:
             return {}
 
-        key = settings.SECRET_KEY.encode()[:32]
-        key = base64.urlsafe_b64encode(key.ljust(32, b"0"))
-        f = Fernet(key)
+        f = get_credential_cipher()
 
         decrypted_creds = {}
         for key_name, value in self.credentials.items():
@@ -225,6 +230,7 @@ class IntegrationLog(models.Model):
         ordering = ["-created_at"]
         indexes = [
             models.Index(fields=["integration", "level"]),
+            models.Index(fields=["integration", "created_at"]),
             models.Index(fields=["user", "created_at"]),
         ]
 
@@ -293,6 +299,7 @@ class WebhookEvent(models.Model):
         ordering = ["-created_at"]
         indexes = [
             models.Index(fields=["endpoint", "status"]),
+            models.Index(fields=["endpoint", "created_at"]),
             models.Index(fields=["status", "created_at"]),
         ]
 
@@ -0,0 +1,124 @@
+"""
+Distributed token-bucket rate limiting for outbound requests, per integration and per host.
+"""
+
+import logging
+
+from django.conf import settings
+from redis.exceptions import RedisError
+
+logger = logging.getLogger(__name__)
+
+# Takes one token from every bucket or from none of them, so a request held back
+# by one limit never burns capacity in another. Uses the Redis clock so workers
+# with skewed clocks agree on refill.
+# KEYS: bucket keys. ARGV: rate (tokens/sec) and capacity for each key, in order.
+# Returns 0 when acquired, otherwise the milliseconds until every bucket has a token.
+ACQUIRE_SCRIPT = """
+local time = redis.call("TIME")
+local now = tonumber(time[1]) * 1000 + math.floor(tonumber(time[2]) / 1000)
+local levels = {}
+local wait_ms = 0
+
+for i, key in ipairs(KEYS) do
+    local rate = tonumber(ARGV[i * 2 - 1])
+    local capacity = tonumber(ARGV[i * 2])
+    local bucket = redis.call("HMGET", key, "tokens", "ts")
+    local tokens = tonumber(bucket[1])
+    local ts = tonumber(bucket[2])
+    if tokens == nil then
+        tokens = capacity
+        ts = now
+    end
+    tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate / 1000)
+    levels[i] = tokens
+    if tokens < 1 then
+        wait_ms = math.max(wait_ms, math.ceil((1 - tokens) * 1000 / rate))
+    end
+end
+
+for i, key in ipairs(KEYS) do
+    local rate = tonumber(ARGV[i * 2 - 1])
+    local capacity = tonumber(ARGV[i * 2])
+    local tokens = levels[i]
+    if wait_ms == 0 then
+        tokens = tokens - 1
+    end
+    redis.call("HSET", key, "tokens", tostring(tokens), "ts", now)
+    redis.call("PEXPIRE", key, math.ceil(capacity * 1000 / rate) + 1000)
+end
+
+return wait_ms
+"""
+
+_acquire_script = None
+
+
+class RateLimitExceeded(Exception):
+    """Raised when an outbound request must wait for a rate-limit bucket to refill."""
+
+    def __init__(self, retry_after, buckets=None):
+        self.retry_after = retry_after
+        self.buckets = buckets or []
+        super().__init__(f"Rate limit reached, retry in {retry_after:.2f}s")
+
+
+class Bucket:
+    """A token bucket refilled at ``requests`` per ``period`` seconds holding up to ``burst`` tokens."""
+
+    def __init__(self, key, requests, period=1, burst=None):
+        self.key = f"ratelimit:{key}"
+        self.rate = float(requests) / float(period)
+        self.capacity = float(burst or requests)
+
+    def __repr__(self):
+        return f"Bucket({self.key}, rate={self.rate}/s, capacity={self.capacity})"
+
+
+def integration_bucket(integration_id, configuration):
+    """Get the bucket for an integration from its ``rate_limit`` configuration, if any."""
+    limit = (configuration or {}).get("rate_limit")
+    if not limit:
+        return None
+    return Bucket(f"integration:{integration_id}", **limit)
+
+
+def host_bucket(host):
+    """Get the bucket for a target host from OUTBOUND_HOST_RATE_LIMITS, if any."""
+    if not host:
+        return None
+    host = host.lower()
+    limit = settings.OUTBOUND_HOST_RATE_LIMITS.get(host, settings.OUTBOUND_DEFAULT_HOST_RATE_LIMIT)
+    if not limit:
+        return None
+    return Bucket(f"host:{host}", **limit)
+
+
+def acquire(buckets):
+    """Take a token from every bucket, raising RateLimitExceeded if any of them is empty.
+
+    Fails open when Redis is unreachable so an outage degrades to unlimited
+    rather than stopping every outbound node.
+    """
+    global _acquire_script
+
+    buckets = [bucket for bucket in buckets if bucket is not None]
+    if not buckets or not settings.OUTBOUND_RATE_LIMIT_ENABLED:
+        return
+
+    try:
+        if _acquire_script is None:
+            from django_redis import get_redis_connection
+
+            _acquire_script = get_redis_connection("default").register_script(ACQUIRE_SCRIPT)
+
+        args = []
+        for bucket in buckets:
+            args.extend([bucket.rate, bucket.capacity])
+        wait_ms = _acquire_script(keys=[bucket.key for bucket in buckets], args=args)
+    except RedisError as e:
+        logger.warning(f"Rate limiter unavailable, allowing request: {str(e)}")
+        return
+
+    if wait_ms:
+        raise RateLimitExceeded(wait_ms / 1000, buckets)
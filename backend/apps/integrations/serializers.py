@@ -5,6 +5,8 @@ Serializers for integration models.
 from django.contrib.auth import get_user_model
 from rest_framework import serializers
 
+from orchestrix.fieldsets import SparseFieldsetMixin
+
 from .models import Integration, IntegrationCategory, IntegrationLog, IntegrationTemplate, WebhookEndpoint, WebhookEvent
 
 User = get_user_model()
@@ -43,7 +45,7 @@ class IntegrationTemplateSerializer(serializers.ModelSerializer):
         read_only_fields = ["id", "created_at", "updated_at"]
 
 
-class IntegrationSerializer(serializers.ModelSerializer):
+class IntegrationSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     """Serializer for Integration model."""
 
     category_name = serializers.CharField(source="category.name", read_only=True)
@@ -82,13 +84,28 @@ class IntegrationSerializer(serializers.ModelSerializer):
         ]
         extra_kwargs = {"credentials": {"write_only": True}}
 
+    def validate_configuration(self, value):
+        """Validate the optional outbound rate limit."""
+        rate_limit = value.get("rate_limit")
+        if rate_limit is None:
+            return value
+
+        if not isinstance(rate_limit, dict) or set(rate_limit) - {"requests", "period", "burst"}:
+            raise serializers.ValidationError("rate_limit must be an object with requests, period and burst.")
+        for field in ("requests", "period", "burst"):
+            if field in rate_limit and (not isinstance(rate_limit[field], (int, float)) or rate_limit[field] <= 0):
+                raise serializers.ValidationError(f"rate_limit.{field} must be a positive number.")
+        if "requests" not in rate_limit:
+            raise serializers.ValidationError("rate_limit.requests is required.")
+        return value
+
     def create(self, validated_data):
         """Create integration with user from context."""
         validated_data["user"] = self.context["request"].user
         return super().create(validated_data)
 
 
-class IntegrationListSerializer(serializers.ModelSerializer):
+class IntegrationListSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     """Lightweight serializer for integration lists."""
 
     category_name = serializers.CharField(source="category.name", read_only=True)
@@ -107,7 +124,7 @@ class IntegrationListSerializer(serializers.ModelSerializer):
         ]
 
 
-class IntegrationLogSerializer(serializers.ModelSerializer):
+class IntegrationLogSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     """Serializer for IntegrationLog model."""
 
     integration_name = serializers.CharField(source="integration.display_name", read_only=True)
@@ -130,7 +147,7 @@ class IntegrationLogSerializer(serializers.ModelSerializer):
         read_only_fields = ["id", "created_at"]
 
 
-class WebhookEndpointSerializer(serializers.ModelSerializer):
+class WebhookEndpointSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     """Serializer for WebhookEndpoint model."""
 
     integration_name = serializers.CharField(source="integration.display_name", read_only=True)
@@ -154,13 +171,16 @@ class WebhookEndpointSerializer(serializers.ModelSerializer):
             "updated_at",
         ]
         read_only_fields = ["id", "url", "created_at", "updated_at"]
+        field_sources = {
+            "url": ["url_path"],
+        }
 
     def get_url(self, obj):
         """Get full webhook URL."""
         return obj.full_url
 
 
-class WebhookEventSerializer(serializers.ModelSerializer):
+class WebhookEventSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     """Serializer for WebhookEvent model."""
 
     endpoint_name = serializers.CharField(source="endpoint.name", read_only=True)
@@ -9,6 +9,9 @@ from rest_framework.decorators import action
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 
+from orchestrix.fieldsets import SparseFieldsetViewMixin
+from orchestrix.pagination import KeysetPagination
+
 from .models import Integration, IntegrationCategory, IntegrationLog, IntegrationTemplate, WebhookEndpoint, WebhookEvent
 from .serializers import (
     IntegrationCategorySerializer,
@@ -94,7 +97,7 @@ class IntegrationTemplateViewSet(viewsets.ReadOnlyModelViewSet):
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
 
-class IntegrationViewSet(viewsets.ModelViewSet):
+class IntegrationViewSet(SparseFieldsetViewMixin, viewsets.ModelViewSet):
     """ViewSet for integrations."""
 
     permission_classes = [IsAuthenticated]
@@ -113,6 +116,7 @@ class IntegrationViewSet(viewsets.ModelViewSet):
     search_fields = ["display_name", "service_name", "description"]
     ordering_fields = ["display_name", "service_name", "created_at", "last_used"]
     ordering = ["-created_at"]
+    pagination_class = KeysetPagination
 
     def get_queryset(self):
         """Get integrations for the current user."""
@@ -212,7 +216,7 @@ class IntegrationViewSet(viewsets.ModelViewSet):
         return Response(serializer.data)
 
 
-class IntegrationLogViewSet(viewsets.ReadOnlyModelViewSet):
+class IntegrationLogViewSet(SparseFieldsetViewMixin, viewsets.ReadOnlyModelViewSet):
     """ViewSet for integration logs (read-only)."""
 
     serializer_class = IntegrationLogSerializer
@@ -221,13 +225,14 @@ class IntegrationLogViewSet(viewsets.ReadOnlyModelViewSet):
     filterset_fields = ["integration", "action", "level"]
     ordering_fields = ["created_at"]
     ordering = ["-created_at"]
+    pagination_class = KeysetPagination
 
     def get_queryset(self):
         """Get logs for integrations owned by the current user."""
         return IntegrationLog.objects.filter(integration__user=self.request.user).select_related("integration")
 
 
-class WebhookEndpointViewSet(viewsets.ModelViewSet):
+class WebhookEndpointViewSet(SparseFieldsetViewMixin, viewsets.ModelViewSet):
     """ViewSet for webhook endpoints."""
 
     serializer_class = WebhookEndpointSerializer
@@ -241,6 +246,7 @@ class WebhookEndpointViewSet(viewsets.ModelViewSet):
     search_fields = ["name"]
     ordering_fields = ["name", "created_at"]
     ordering = ["-created_at"]
+    pagination_class = KeysetPagination
 
     def get_queryset(self):
         """Get webhook endpoints for integrations owned by the current user."""
@@ -286,7 +292,7 @@ class WebhookEndpointViewSet(viewsets.ModelViewSet):
         return Response(serializer.data)
 
 
-class WebhookEventViewSet(viewsets.ReadOnlyModelViewSet):
+class WebhookEventViewSet(SparseFieldsetViewMixin, viewsets.ReadOnlyModelViewSet):
     """ViewSet for webhook events (read-only)."""
 
     serializer_class = WebhookEventSerializer
@@ -295,6 +301,7 @@ class WebhookEventViewSet(viewsets.ReadOnlyModelViewSet):
     filterset_fields = ["endpoint", "status"]
     ordering_fields = ["created_at", "processed_at"]
     ordering = ["-created_at"]
+    pagination_class = KeysetPagination
 
     def get_queryset(self):
         """Get webhook events for endpoints owned by the current user."""
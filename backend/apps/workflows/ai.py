@@ -0,0 +1,337 @@
+"""
+Provider-agnostic AI chat/completion execution with prompt caching and micro-batching.
+"""
+
+import hashlib
+import json
+import logging
+import re
+import threading
+import time
+from concurrent.futures import Future
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F
+from django.utils import timezone
+
+from apps.executions.tracing import span
+
+from .http import get_http_session
+
+logger = logging.getLogger(__name__)
+
+# Node configuration keys forwarded to the provider as generation parameters
+GENERATION_PARAMS = ("temperature", "max_tokens", "top_p", "stop", "presence_penalty", "frequency_penalty")
+
+DEFAULT_MODELS = {
+    "openai": "gpt-3.5-turbo",
+    "anthropic": "claude-3-haiku-20240307",
+}
+
+
+class AIProviderError(Exception):
+    """Raised when an AI provider rejects or fails a request."""
+
+
+class OpenAIProvider:
+    """OpenAI-compatible HTTP API (OpenAI, compatible gateways, self-hosted or mock servers)."""
+
+    name = "openai"
+    supports_batching = True
+
+    def __init__(self, api_key, base_url):
+        self.api_key = api_key
+        self.base_url = base_url.rstrip("/")
+
+    def chat(self, model, messages, params):
+        """Run a chat completion and return a normalized result."""
+        data = self._post("/chat/completions", {"model": model, "messages": messages, **params})
+        choice = data["choices"][0]
+        usage = data.get("usage") or {}
+        return {
+            "text": choice["message"]["content"],
+            "model": data.get("model", model),
+            "finish_reason": choice.get("finish_reason"),
+            "prompt_tokens": usage.get("prompt_tokens", 0),
+            "completion_tokens": usage.get("completion_tokens", 0),
+        }
+
+    def complete(self, model, prompts, params):
+        """Run a text completion for several prompts in one request."""
+        data = self._post("/completions", {"model": model, "prompt": prompts, **params})
+        choices = sorted(data["choices"], key=lambda choice: choice.get("index", 0))
+        if len(choices) != len(prompts):
+            raise AIProviderError(f"{self.name} returned {len(choices)} choices for {len(prompts)} prompts")
+
+        # Usage is reported for the whole request; share it across the batch so the shares add up to the total
+        usage = data.get("usage") or {}
+        prompt_tokens = _share(usage.get("prompt_tokens", 0), len(prompts))
+        completion_tokens = _share(usage.get("completion_tokens", 0), len(prompts))
+        return [
+            {
+                "text": choice["text"],
+                "model": data.get("model", model),
+                "finish_reason": choice.get("finish_reason"),
+                "prompt_tokens": prompt_tokens[index],
+                "completion_tokens": completion_tokens[index],
+            }
+            for index, choice in enumerate(choices)
+        ]
+
+    def _post(self, path, payload):
+        """POST to the provider and return the decoded JSON body."""
+        response = get_http_session().post(
+            f"{self.base_url}{path}",
+            json=payload,
+            headers={"Authorization": f"Bearer {self.api_key}"},
+            timeout=settings.AI_REQUEST_TIMEOUT,
+        )
+        if response.status_code >= 400:
+            raise AIProviderError(f"{self.name} returned {response.status_code}: {response.text[:500]}")
+        return response.json()
+
+
+def _share(total, parts):
+    """Split a token count into ``parts`` near-equal shares, the first ones taking the remainder."""
+    share, remainder = divmod(total, parts)
+    return [share + 1 if index < remainder else share for index in range(parts)]
+
+
+class AnthropicProvider:
+    """Anthropic Messages API."""
+
+    name = "anthropic"
+    supports_batching = False
+
+    def __init__(self, api_key, base_url):
+        self.api_key = api_key
+        self.base_url = base_url.rstrip("/")
+
+    def chat(self, model, messages, params):
+        """Run a chat completion and return a normalized result."""
+        system = "\n".join(message["content"] for message in messages if message["role"] == "system")
+        payload = {
+            "model": model,
+            "messages": [message for message in messages if message["role"] != "system"],
+            "max_tokens": params.get("max_tokens", 1024),
+            **{key: value for key, value in params.items() if key in ("temperature", "top_p")},
+        }
+        if system:
+            payload["system"] = system
+        if "stop" in params:
+            payload["stop_sequences"] = params["stop"] if isinstance(params["stop"], list) else [params["stop"]]
+
+        response = get_http_session().post(
+            f"{self.base_url}/messages",
+            json=payload,
+            headers={"x-api-key": self.api_key, "anthropic-version": "2023-06-01"},
+            timeout=settings.AI_REQUEST_TIMEOUT,
+        )
+        if response.status_code >= 400:
+            raise AIProviderError(f"{self.name} returned {response.status_code}: {response.text[:500]}")
+
+        data = response.json()
+        usage = data.get("usage") or {}
+        return {
+            "text": "".join(block.get("text", "") for block in data.get("content", []) if block.get("type") == "text"),
+            "model": data.get("model", model),
+            "finish_reason": data.get("stop_reason"),
+            "prompt_tokens": usage.get("input_tokens", 0),
+            "completion_tokens": usage.get("output_tokens", 0),
+        }
+
+    def complete(self, model, prompts, params):
+        """Run a text completion per prompt through the Messages API."""
+        return [self.chat(model, [{"role": "user", "content": prompt}], params) for prompt in prompts]
+
+
+PROVIDERS = {
+    "openai": OpenAIProvider,
+    "anthropic": AnthropicProvider,
+}
+
+
+def get_provider(config, user=None):
+    """Build the provider for a node, preferring credentials from a linked integration."""
+    provider_name = config.get("provider", settings.AI_DEFAULT_PROVIDER)
+    if provider_name not in PROVIDERS:
+        raise ValueError(f"Unsupported AI provider: {provider_name}")
+
+    defaults = settings.AI_PROVIDERS.get(provider_name, {})
+    api_key = defaults.get("api_key", "")
+    base_url = defaults.get("base_url", "")
+
+    integration_id = config.get("integration_id")
+    if integration_id:
+        from apps.integrations.models import Integration
+
+        integration = Integration.objects.get(id=integration_id, user=user, is_active=True)
+        with span("credentials.decrypt", integration_id=str(integration_id)):
+            api_key = integration.get_decrypted_credentials().get("api_key", api_key)
+        base_url = integration.configuration.get("base_url", base_url)
+        Integration.objects.filter(pk=integration.pk).update(
+            usage_count=F("usage_count") + 1,
+            last_used=timezone.now(),
+        )
+
+    return PROVIDERS[provider_name](api_key=api_key, base_url=base_url)
+
+
+def normalize_prompt(text):
+    """Normalize whitespace so trivially different prompts share a cache entry.
+
+    Structured content, such as a list of content blocks, is left as it is.
+    """
+    if not isinstance(text, str):
+        return text
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def prompt_cache_key(provider, model, kind, prompt, params):
+    """Build the exact-match cache key for a prompt, model and generation parameters."""
+    if isinstance(prompt, list):
+        prompt = [{"role": message["role"], "content": normalize_prompt(message["content"])} for message in prompt]
+    else:
+        prompt = normalize_prompt(prompt)
+
+    raw = json.dumps(
+        [provider.name, provider.base_url, model, kind, prompt, params],
+        sort_keys=True,
+        separators=(",", ":"),
+    )
+    return f"ai_prompt:{hashlib.sha256(raw.encode()).hexdigest()}"
+
+
+class _Batch:
+    """Prompts collected during one batching window."""
+
+    def __init__(self):
+        self.items = []
+        self.full = threading.Event()
+
+
+class CompletionBatcher:
+    """Collects concurrent completion prompts for one provider/model/params and sends them together."""
+
+    def __init__(self, provider, model, params):
+        self.provider = provider
+        self.model = model
+        self.params = params
+        self._lock = threading.Lock()
+        self._batch = None
+
+    def submit(self, prompt):
+        """Queue a prompt and return a future for its result."""
+        future = Future()
+
+        with self._lock:
+            is_leader = self._batch is None
+            if is_leader:
+                self._batch = _Batch()
+            batch = self._batch
+            batch.items.append((prompt, future))
+            if len(batch.items) >= settings.AI_BATCH_MAX_SIZE:
+                self._batch = None
+                batch.full.set()
+
+        if is_leader:
+            # The first caller waits out the window, then sends everything that joined it
+            batch.full.wait(settings.AI_BATCH_WINDOW)
+            with self._lock:
+                if self._batch is batch:
+                    self._batch = None
+            self._send(batch.items)
+
+        return future
+
+    def _send(self, items):
+        """Send a batch upstream and resolve each caller's future."""
+        try:
+            results = self.provider.complete(self.model, [prompt for prompt, _ in items], self.params)
+        except Exception as e:
+            for _, future in items:
+                future.set_exception(e)
+            return
+
+        if len(items) > 1:
+            logger.debug(f"Sent {len(items)} {self.provider.name} completions in one request")
+        for (_, future), result in zip(items, results):
+            future.set_result(result)
+
+
+_batchers = {}
+_batchers_lock = threading.Lock()
+
+
+def _get_batcher(provider, model, params):
+    """Get the shared batcher for requests that can go upstream together."""
+    key = (
+        provider.name,
+        provider.base_url,
+        hashlib.sha256(provider.api_key.encode()).hexdigest(),
+        model,
+        json.dumps(params, sort_keys=True),
+    )
+    with _batchers_lock:
+        if key not in _batchers:
+            _batchers[key] = CompletionBatcher(provider, model, params)
+        return _batchers[key]
+
+
+def run_ai_node(node, node_execution, kind):
+    """Run an ``ai_chat`` or ``ai_completion`` node.
+
+    Returns the normalized provider result together with whether it came from
+    the prompt cache and the end-to-end latency in milliseconds. Token and
+    latency accounting is recorded on the node execution.
+    """
+    config = node.configuration
+    provider = get_provider(config, user=node.workflow.user)
+    model = config.get("model", DEFAULT_MODELS.get(provider.name))
+    params = {key: config[key] for key in GENERATION_PARAMS if key in config}
+    prompt = config.get("prompt", "Hello, how can I help you?")
+
+    if kind == "chat":
+        messages = config.get("messages") or [{"role": "user", "content": prompt}]
+        if config.get("system_prompt") and not config.get("messages"):
+            messages.insert(0, {"role": "system", "content": config["system_prompt"]})
+        cache_input = messages
+    else:
+        cache_input = prompt
+
+    started = time.monotonic()
+    use_cache = config.get("cache", True) and settings.AI_PROMPT_CACHE_TTL > 0
+    key = prompt_cache_key(provider, model, kind, cache_input, params)
+
+    result = None
+    if use_cache:
+        with span("ai.cache_get"):
+            result = cache.get(key)
+    cached = result is not None
+
+    if not cached:
+        with span("ai.provider_call", provider=provider.name, model=model, kind=kind):
+            if kind == "chat":
+                result = provider.chat(model, messages, params)
+            elif provider.supports_batching and settings.AI_BATCH_WINDOW > 0 and config.get("batch", True):
+                result = (
+                    _get_batcher(provider, model, params).submit(prompt).result(timeout=settings.AI_REQUEST_TIMEOUT)
+                )
+            else:
+                (result,) = provider.complete(model, [prompt], params)
+
+        if use_cache:
+            with span("ai.cache_set"):
+                cache.set(key, result, timeout=config.get("cache_ttl", settings.AI_PROMPT_CACHE_TTL))
+
+    latency_ms = int((time.monotonic() - started) * 1000)
+
+    # A cache hit costs no provider tokens
+    node_execution.record_usage(
+        prompt_tokens=0 if cached else result["prompt_tokens"],
+        completion_tokens=0 if cached else result["completion_tokens"],
+        latency_ms=latency_ms,
+    )
+
+    return result, cached, latency_ms
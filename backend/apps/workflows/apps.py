@@ -5,3 +5,6 @@ class WorkflowsConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "apps.workflows"
     verbose_name = "Workflows"
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,135 @@
+"""
+Single-flight coalescing for identical outbound requests.
+"""
+
+import copy
+import hashlib
+import json
+import logging
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from redis.exceptions import RedisError
+
+logger = logging.getLogger(__name__)
+
+# Headers that never change the upstream response and must not split a flight
+IGNORED_HEADERS = {"user-agent", "x-request-id", "x-correlation-id", "traceparent", "tracestate"}
+
+# Compare-and-delete so a leader never releases a lock it no longer owns
+RELEASE_LOCK_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+
+
+class _Flight:
+    """An in-flight call shared by every caller with the same key."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+_flights = {}
+_flights_lock = threading.Lock()
+
+
+def request_key(method, url, headers=None):
+    """Build a stable key for a request from its method, URL and relevant headers."""
+    relevant = sorted(
+        (name.lower(), str(value)) for name, value in (headers or {}).items() if name.lower() not in IGNORED_HEADERS
+    )
+    raw = json.dumps([method.upper(), url, relevant], separators=(",", ":"))
+    # Hash so credentials in headers never end up in Redis key names
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def coalesce(key, fn, distributed=None):
+    """Run ``fn`` once for all concurrent callers sharing ``key`` and fan the result out.
+
+    Callers inside this process wait on the leader's flight, which only happens
+    with threaded or gevent worker pools. When ``distributed`` is enabled, the
+    default, the leader additionally takes a Redis lock so leaders in other
+    worker processes share a single upstream call too. ``fn`` must return
+    JSON-serializable data.
+    """
+    with _flights_lock:
+        flight = _flights.get(key)
+        is_leader = flight is None
+        if is_leader:
+            flight = _Flight()
+            _flights[key] = flight
+
+    if not is_leader:
+        flight.done.wait()
+        if flight.error is not None:
+            raise flight.error
+        logger.debug(f"Coalesced request {key[:12]} onto in-flight call")
+        return copy.deepcopy(flight.result)
+
+    if distributed is None:
+        distributed = settings.API_CALL_COALESCE_DISTRIBUTED
+
+    try:
+        flight.result = _call_distributed(key, fn) if distributed else fn()
+        return copy.deepcopy(flight.result)
+    except Exception as e:
+        flight.error = e
+        raise
+    finally:
+        with _flights_lock:
+            _flights.pop(key, None)
+        flight.done.set()
+
+
+def _call_distributed(key, fn):
+    """Share one upstream call across workers using a Redis lock and a short-lived result."""
+    from django_redis import get_redis_connection
+
+    lock_key = f"coalesce:lock:{key}"
+    result_key = f"coalesce:result:{key}"
+    lock_timeout = settings.API_CALL_COALESCE_LOCK_TIMEOUT
+    deadline = time.monotonic() + lock_timeout
+
+    try:
+        redis = get_redis_connection("default")
+        while True:
+            cached = redis.get(result_key)
+            if cached is not None:
+                logger.debug(f"Coalesced request {key[:12]} onto another worker's call")
+                return json.loads(cached)
+
+            token = uuid.uuid4().hex
+            if redis.set(lock_key, token, nx=True, px=int(lock_timeout * 1000)):
+                break
+
+            if time.monotonic() >= deadline:
+                # The leader is taking longer than its lock allows; stop waiting on it
+                return fn()
+            time.sleep(settings.API_CALL_COALESCE_POLL_INTERVAL)
+    except RedisError as e:
+        logger.warning(f"Distributed coalescing unavailable, calling upstream directly: {str(e)}")
+        return fn()
+
+    try:
+        result = fn()
+        try:
+            redis.set(
+                result_key,
+                json.dumps(result),
+                px=int(settings.API_CALL_COALESCE_RESULT_TTL * 1000),
+            )
+        except (RedisError, TypeError, ValueError) as e:
+            logger.warning(f"Could not publish coalesced result {key[:12]}: {str(e)}")
+        return result
+    finally:
+        try:
+            redis.eval(RELEASE_LOCK_SCRIPT, 1, lock_key, token)
+        except RedisError as e:
+            logger.warning(f"Could not release coalescing lock {key[:12]}: {str(e)}")
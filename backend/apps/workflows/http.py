@@ -0,0 +1,21 @@
+"""
+Shared HTTP session for outbound node requests.
+"""
+
+import threading
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_http_session():
+    """Get the process-wide HTTP session so outbound calls reuse pooled keep-alive connections."""
+    global _session
+
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                import requests
+
+                _session = requests.Session()
+    return _session
@@ -0,0 +1,309 @@
+"""
+Management command to benchmark workflow engine throughput on synthetic workflows.
+"""
+
+import gc
+import json
+import platform
+import sys
+import time
+import uuid
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+from apps.workflows.models import Workflow, WorkflowNode
+
+User = get_user_model()
+
+SCENARIOS = ("linear", "fanout", "deep", "payload")
+
+# Node types the engine runs in-process, so a benchmark never waits on outside services
+NODE_CYCLE = (
+    ("action", {}),
+    ("data_transform", {}),
+    ("condition", {"condition": "true"}),
+)
+
+# Metric name -> whether a higher value is better
+METRICS = {
+    "executions_per_second": True,
+    "latency_p50_ms": False,
+    "latency_p99_ms": False,
+    "queries_per_execution": False,
+    "bytes_written_per_execution": False,
+    "peak_rss_mb": False,
+}
+
+
+class QueryMeter:
+    """Counts the queries run on a connection and the parameter bytes sent with its INSERTs and UPDATEs."""
+
+    def __init__(self):
+        self.queries = 0
+        self.bytes_written = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.queries += 1
+        if sql.lstrip()[:6].upper() in ("INSERT", "UPDATE"):
+            for row in (params or ()) if many else [params or ()]:
+                values = row.values() if isinstance(row, dict) else row
+                self.bytes_written += sum(_size(value) for value in values)
+        return execute(sql, params, many, context)
+
+
+def _size(value):
+    if value is None:
+        return 0
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return len(value)
+    return len(str(value).encode())
+
+
+def _percentile(values, percent):
+    """Nearest-rank percentile of sorted values."""
+    if not values:
+        return None
+    index = max(0, min(len(values) - 1, int(round(percent / 100 * len(values))) - 1))
+    return values[index]
+
+
+def _peak_rss_mb():
+    """Peak resident set size of this process, or None where the platform does not report it."""
+    try:
+        import resource
+    except ImportError:
+        return None
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Reported in bytes on macOS and kilobytes elsewhere
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def _payload(size_kb):
+    """Build trigger data of roughly ``size_kb`` kilobytes of JSON."""
+    record = {"id": 0, "name": "x" * 40, "tags": ["alpha", "beta", "gamma"], "score": 0.5}
+    count = max(1, size_kb * 1024 // len(json.dumps(record)))
+    return {"records": [{**record, "id": i} for i in range(count)]}
+
+
+class Command(BaseCommand):
+    help = "Run synthetic workflows through the engine and report throughput, latency, queries, bytes written and RSS"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--scenarios",
+            default=",".join(SCENARIOS),
+            help=f"Comma-separated scenarios to run, of {', '.join(SCENARIOS)}",
+        )
+        parser.add_argument(
+            "--executions",
+            type=int,
+            default=50,
+            help="Measured executions per scenario",
+        )
+        parser.add_argument(
+            "--warmup",
+            type=int,
+            default=3,
+            help="Unmeasured executions per scenario run first, to warm plan and connection caches",
+        )
+        parser.add_argument(
+            "--mode",
+            choices=["eager", "worker"],
+            default="eager",
+            help=(
+                "eager runs the tasks in this process; worker sends them to running Celery workers, "
+                "where queries, bytes written and RSS cannot be measured"
+            ),
+        )
+        parser.add_argument("--length", type=int, default=10, help="Nodes in the linear and payload workflows")
+        parser.add_argument("--width", type=int, default=50, help="Sibling nodes in the fanout workflow")
+        parser.add_argument("--depth", type=int, default=200, help="Nodes in the deep workflow")
+        parser.add_argument("--payload-kb", type=int, default=256, help="Trigger data size in the payload workflow")
+        parser.add_argument("--save", metavar="PATH", help="Write the results to PATH as a JSON baseline")
+        parser.add_argument("--compare", metavar="PATH", help="Compare the results against a JSON baseline")
+        parser.add_argument(
+            "--threshold",
+            type=float,
+            default=10.0,
+            help="Percentage by which a metric may be worse than the baseline before it is a regression",
+        )
+        parser.add_argument(
+            "--keep",
+            action="store_true",
+            help="Keep the benchmark user, workflows and executions instead of deleting them",
+        )
+
+    def handle(self, *args, **options):
+        """Run the scenarios, then save and compare the results."""
+        scenarios = [name.strip() for name in options["scenarios"].split(",") if name.strip()]
+        unknown = set(scenarios) - set(SCENARIOS)
+        if unknown:
+            raise CommandError(f"Unknown scenarios: {', '.join(sorted(unknown))}")
+        if options["executions"] < 1:
+            raise CommandError("--executions must be at least 1")
+
+        baseline = None
+        if options["compare"]:
+            try:
+                with open(options["compare"]) as f:
+                    baseline = json.load(f)
+            except (OSError, ValueError) as e:
+                raise CommandError(f"Could not read baseline {options['compare']}: {str(e)}")
+
+        from orchestrix.celery import app
+
+        always_eager = app.conf.task_always_eager
+        app.conf.task_always_eager = options["mode"] == "eager"
+        user = User.objects.create_user(
+            f"bench-{uuid.uuid4().hex[:12]}@orchestrix.local", first_name="Engine", last_name="Benchmark"
+        )
+        results = {}
+        try:
+            for name in scenarios:
+                workflow, input_data = self._build(name, user, options)
+                results[name] = self._run(workflow, user, input_data, options)
+                self._report(name, results[name])
+        finally:
+            app.conf.task_always_eager = always_eager
+            if options["keep"]:
+                self.stdout.write(f"Kept benchmark data of user {user.email}")
+            else:
+                user.delete()
+
+        report = {
+            "created_at": timezone.now().isoformat(),
+            "mode": options["mode"],
+            "database": connection.vendor,
+            "python": platform.python_version(),
+            "scenarios": results,
+        }
+        if options["save"]:
+            with open(options["save"], "w") as f:
+                json.dump(report, f, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Saved baseline to {options['save']}"))
+
+        if baseline is not None:
+            regressions = self._compare(baseline, report, options["threshold"])
+            if regressions:
+                raise CommandError(f"{regressions} metrics regressed by more than {options['threshold']:g}%")
+            self.stdout.write(self.style.SUCCESS("No regressions against the baseline"))
+
+    def _build(self, name, user, options):
+        """Create a scenario's workflow, returning it with the trigger data its runs get."""
+        input_data = {}
+        if name == "fanout":
+            # Siblings at one column, as the editor lays out parallel branches
+            positions = [(1, y) for y in range(options["width"])]
+        elif name == "deep":
+            positions = [(x + 1, 0) for x in range(options["depth"])]
+        else:
+            positions = [(x + 1, 0) for x in range(options["length"])]
+            if name == "payload":
+                input_data = _payload(options["payload_kb"])
+
+        workflow = Workflow.objects.create(user=user, name=f"Benchmark: {name}", status="active")
+        nodes = [WorkflowNode(workflow=workflow, node_type="trigger", name="Trigger", position_x=0)]
+        for i, (x, y) in enumerate(positions):
+            node_type, configuration = NODE_CYCLE[i % len(NODE_CYCLE)]
+            nodes.append(
+                WorkflowNode(
+                    workflow=workflow,
+                    node_type=node_type,
+                    name=f"Step {i + 1}",
+                    configuration=configuration,
+                    position_x=x,
+                    position_y=y,
+                )
+            )
+        WorkflowNode.objects.bulk_create(nodes)
+        return workflow, input_data
+
+    def _run(self, workflow, user, input_data, options):
+        """Run a workflow the warm-up and measured number of times, returning the measured metrics."""
+        from apps.workflows.tasks import execute_workflow
+
+        eager = options["mode"] == "eager"
+        args = [str(workflow.id), str(user.id), input_data, "manual"]
+
+        def run():
+            if eager:
+                return execute_workflow.apply(args=args).get()
+            return execute_workflow.delay(*args).get()
+
+        for _ in range(options["warmup"]):
+            run()
+
+        gc.collect()
+        meter = QueryMeter()
+        latencies = []
+        failed = 0
+        with connection.execute_wrapper(meter):
+            started = time.perf_counter()
+            for _ in range(options["executions"]):
+                run_started = time.perf_counter()
+                result = run()
+                latencies.append((time.perf_counter() - run_started) * 1000)
+                if result.get("status") != "completed":
+                    failed += 1
+            elapsed = time.perf_counter() - started
+
+        latencies.sort()
+        executions = options["executions"]
+        return {
+            "nodes": workflow.nodes.count(),
+            "payload_bytes": len(json.dumps(input_data)),
+            "executions": executions,
+            "failed": failed,
+            "executions_per_second": round(executions / elapsed, 2),
+            "latency_p50_ms": round(_percentile(latencies, 50), 2),
+            "latency_p99_ms": round(_percentile(latencies, 99), 2),
+            "queries_per_execution": round(meter.queries / executions, 1) if eager else None,
+            "bytes_written_per_execution": round(meter.bytes_written / executions) if eager else None,
+            # The process peak so far, so it includes the scenarios run before this one
+            "peak_rss_mb": _peak_rss_mb() if eager else None,
+        }
+
+    def _report(self, name, result):
+        self.stdout.write(
+            f"{name}: {result['nodes']} nodes, {result['executions']} executions ({result['failed']} failed)"
+        )
+        for metric in METRICS:
+            value = result[metric]
+            self.stdout.write(f"  {metric:<28} {'-' if value is None else value}")
+
+    def _compare(self, baseline, report, threshold):
+        """Print each metric against the baseline, returning how many regressed by more than ``threshold`` percent."""
+        self.stdout.write(f"Comparing against the baseline of {baseline.get('created_at', 'unknown date')}")
+        if baseline.get("mode") != report["mode"]:
+            self.stdout.write(
+                self.style.WARNING(f"Baseline ran in {baseline.get('mode')} mode, this run in {report['mode']} mode")
+            )
+
+        regressions = 0
+        for name, result in report["scenarios"].items():
+            previous = baseline.get("scenarios", {}).get(name)
+            if previous is None:
+                self.stdout.write(self.style.WARNING(f"{name}: not in the baseline"))
+                continue
+            if (previous.get("nodes"), previous.get("payload_bytes")) != (result["nodes"], result["payload_bytes"]):
+                self.stdout.write(self.style.WARNING(f"{name}: workflow shape differs from the baseline, skipped"))
+                continue
+
+            self.stdout.write(f"{name}:")
+            for metric, higher_is_better in METRICS.items():
+                before, after = previous.get(metric), result[metric]
+                if before is None or after is None:
+                    continue
+                change = (after - before) / before * 100 if before else 0.0
+                worse = -change if higher_is_better else change
+                line = f"  {metric:<28} {before:>12} -> {after:<12} {change:+.1f}%"
+                if worse > threshold:
+                    regressions += 1
+                    self.stdout.write(self.style.ERROR(f"{line}  REGRESSION"))
+                else:
+                    self.stdout.write(line)
+        return regressions
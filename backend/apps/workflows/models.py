@@ -100,8 +100,8 @@ class Workflow(models.Model):
 
     @property
     def last_execution(self):
-        """Get the most recent execution of this workflow."""
-        return self.executions.first()
+        """Get the most recent execution of this workflow, without its data columns."""
+        return self.executions.only("id", "workflow_id", "status", "started_at", "completed_at").first()
 
 
 class WorkflowNode(models.Model):
@@ -0,0 +1,67 @@
+"""
+Per-process cache of workflow execution plans.
+"""
+
+import threading
+import uuid
+from collections import OrderedDict
+from functools import partial
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import WorkflowNode
+
+# Least recently used first, bounded by EXECUTION_PLAN_CACHE_SIZE
+_plans = OrderedDict()
+_plans_lock = threading.Lock()
+
+
+def _version_key(workflow_id):
+    return f"workflow_plan_version:{workflow_id}"
+
+
+def get_execution_plan(workflow_id):
+    """Get the workflow's top-level nodes in execution order.
+
+    Plans are kept in process memory and validated against a version token in
+    the shared cache, so a warm worker pays one cache GET instead of a node
+    query per run, and edits made anywhere are picked up on the next run.
+    """
+    version = cache.get(_version_key(workflow_id))
+    cached = _plans.get(workflow_id)
+    if version is not None and cached is not None and cached[0] == version:
+        with _plans_lock:
+            if workflow_id in _plans:
+                _plans.move_to_end(workflow_id)
+        return cached[1]
+
+    if version is None:
+        cache.add(_version_key(workflow_id), uuid.uuid4().hex, timeout=None)
+        version = cache.get(_version_key(workflow_id))
+
+    nodes = list(
+        WorkflowNode.objects.filter(workflow_id=workflow_id, parent_node__isnull=True).order_by(
+            "position_x", "position_y"
+        )
+    )
+    with _plans_lock:
+        _plans[workflow_id] = (version, nodes)
+        _plans.move_to_end(workflow_id)
+        while len(_plans) > settings.EXECUTION_PLAN_CACHE_SIZE:
+            _plans.popitem(last=False)
+    return nodes
+
+
+def _bump(workflow_id):
+    cache.set(_version_key(workflow_id), uuid.uuid4().hex, timeout=None)
+
+
+def invalidate_execution_plan(workflow_id):
+    """Force every worker to reload the workflow's plan on its next run, once the current transaction commits.
+
+    Deferring to commit keeps a run that starts meanwhile from caching the
+    pre-commit nodes under the new version.
+    """
+    transaction.on_commit(partial(_bump, workflow_id))
@@ -5,12 +5,14 @@ Serializers for workflow models.
 from django.contrib.auth import get_user_model
 from rest_framework import serializers
 
+from orchestrix.fieldsets import SparseFieldsetMixin
+
 from .models import Workflow, WorkflowNode, WorkflowSchedule, WorkflowTemplate
 
 User = get_user_model()
 
 
-class WorkflowTemplateSerializer(serializers.ModelSerializer):
+class WorkflowTemplateSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     """Serializer for WorkflowTemplate model."""
 
     created_by_email = serializers.EmailField(source="created_by.email", read_only=True)
@@ -40,6 +42,9 @@ class WorkflowTemplateSerializer(serializers.ModelSerializer):
             "created_at",
             "updated_at",
         ]
+        field_sources = {
+            "nodes": ["name"],
+        }
 
     def get_nodes(self, obj):
         """Get nodes from workflows created from this template."""
@@ -69,7 +74,7 @@ class WorkflowTemplateSerializer(serializers.ModelSerializer):
         ]
 
 
-class WorkflowNodeSerializer(serializers.ModelSerializer):
+class WorkflowNodeSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     """Serializer for WorkflowNode model."""
 
     children_count = serializers.IntegerField(read_only=True)
@@ -94,6 +99,10 @@ class WorkflowNodeSerializer(serializers.ModelSerializer):
             "updated_at",
         ]
         read_only_fields = ["id", "created_at", "updated_at"]
+        field_sources = {
+            "children_count": ["children"],
+            "is_trigger": ["node_type"],
+        }
 
     def validate_node_type(self, value):
         """Validate node type."""
@@ -103,7 +112,7 @@ class WorkflowNodeSerializer(serializers.ModelSerializer):
         return value
 
 
-class WorkflowScheduleSerializer(serializers.ModelSerializer):
+class WorkflowScheduleSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     """Serializer for WorkflowSchedule model."""
 
     class Meta:
@@ -129,7 +138,7 @@ class WorkflowScheduleSerializer(serializers.ModelSerializer):
         return value
 
 
-class WorkflowSerializer(serializers.ModelSerializer):
+class WorkflowSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     """Serializer for Workflow model."""
 
     user_email = serializers.EmailField(source="user.email", read_only=True)
@@ -163,6 +172,10 @@ class WorkflowSerializer(serializers.ModelSerializer):
             "updated_at",
         ]
         read_only_fields = ["id", "user", "version", "created_at", "updated_at"]
+        field_sources = {
+            "node_count": ["nodes"],
+            "last_execution": ["executions"],
+        }
 
     def get_last_execution(self, obj):
         """Get the last execution summary."""
@@ -244,12 +257,13 @@ class WorkflowCreateSerializer(serializers.ModelSerializer):
         return workflow
 
 
-class WorkflowListSerializer(serializers.ModelSerializer):
+class WorkflowListSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     """Lightweight serializer for workflow lists."""
 
     user_email = serializers.EmailField(source="user.email", read_only=True)
-    node_count = serializers.IntegerField(read_only=True)
-    last_execution_status = serializers.SerializerMethodField()
+    # Annotated by WorkflowViewSet.get_queryset for the list action
+    node_count = serializers.IntegerField(source="annotated_node_count", read_only=True)
+    last_execution_status = serializers.CharField(read_only=True, allow_null=True)
 
     class Meta:
         model = Workflow
@@ -269,8 +283,7 @@ class WorkflowListSerializer(serializers.ModelSerializer):
             "created_at",
             "updated_at",
         ]
-
-    def get_last_execution_status(self, obj):
-        """Get the status of the last execution."""
-        last_exec = obj.last_execution
-        return last_exec.status if last_exec else None
+        field_sources = {
+            "node_count": [],
+            "last_execution_status": [],
+        }
@@ -0,0 +1,16 @@
+"""
+Signal handlers for workflow models.
+"""
+
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import WorkflowNode
+from .plans import invalidate_execution_plan
+
+
+@receiver(post_save, sender=WorkflowNode)
+@receiver(post_delete, sender=WorkflowNode)
+def invalidate_plan_on_node_change(sender, instance, **kwargs):
+    """Drop cached execution plans when a workflow's nodes change."""
+    invalidate_execution_plan(instance.workflow_id)
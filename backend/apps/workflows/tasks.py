@@ -3,43 +3,106 @@ Celery tasks for workflow execution.
 """
 
 import logging
+import random
 
 from celery import shared_task
+from celery.exceptions import MaxRetriesExceededError, Retry
+from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.utils import timezone
 
+from apps.executions.events import execution_events
+from apps.executions.heartbeats import heartbeats
+from apps.executions.logstore import log_buffer
+from apps.executions.profiling import RunProfile, profile_mode, profile_options, start_profiler, stop_profiler
+from apps.executions.statestore import STORE_UNAVAILABLE, create_execution, get_node_execution, use_write_behind
+from apps.executions.tracing import merge_spans, propagation_context, save_trace, span, trace_task
+from apps.integrations.ratelimit import RateLimitExceeded, acquire, host_bucket, integration_bucket
+
 from .models import Workflow, WorkflowNode
+from .plans import get_execution_plan
 
 logger = logging.getLogger(__name__)
 User = get_user_model()
 
 
 @shared_task(bind=True)
-def execute_workflow(self, workflow_id, user_id, input_data=None, trigger_source="manual"):
-    """Execute a complete workflow."""
+def execute_workflow(self, workflow_id, user_id, input_data=None, trigger_source="manual", profile=None):
+    """Execute a complete workflow, storing the run's trace once it ends.
+
+    ``profile`` (true or a profiler name) runs it under a profiler, as does the
+    workflow's ``configuration["profile"]``.
+    """
+    with trace_task("execute_workflow", workflow_id=workflow_id, trigger_source=trigger_source) as trace:
+        result = _execute_workflow(self, workflow_id, user_id, input_data, trigger_source, profile)
+    if trace is not None and result.get("execution_id"):
+        save_trace(result["execution_id"], trace)
+    return result
+
+
+def _execute_workflow(task, workflow_id, user_id, input_data, trigger_source, profile):
+    execution = None
+    run_profile = None
     try:
         workflow = Workflow.objects.get(id=workflow_id)
         user = User.objects.get(id=user_id)
 
-        logger.info(f"Starting workflow execution: {workflow.name} for user {user.email}")
+        try:
+            mode = profile_mode(profile) or profile_mode(workflow.configuration.get("profile"))
+        except ValueError as e:
+            logger.warning(f"Not profiling workflow {workflow.name}: {str(e)}")
+            mode = None
+        if mode is not None:
+            run_profile = RunProfile(profile_options(mode))
 
-        # Create workflow execution record
-        from apps.executions.models import WorkflowExecution
-
-        execution = WorkflowExecution.objects.create(
-            workflow=workflow,
-            user=user,
-            status="running",
-            input_data=input_data or {},
-            trigger_source=trigger_source,
-            execution_context={
-                "task_id": self.request.id,
-                "started_by": "celery_worker",
-            },
-        )
+        logger.info(f"Starting workflow execution: {workflow.name} for user {user.email}")
 
         # Get workflow nodes in execution order
-        nodes = workflow.nodes.filter(parent_node__isnull=True).order_by("position_x", "position_y")
+        with span("plan.load"):
+            nodes = get_execution_plan(workflow.id)
+        execution_context = {
+            "task_id": task.request.id,
+            "started_by": "celery_worker",
+        }
+
+        write_behind = use_write_behind(workflow)
+        if write_behind:
+            # Keep in-flight state in Redis; the run is persisted in a batch once it finishes
+            try:
+                with span("execution.create", write_behind=True):
+                    execution = create_execution(workflow, user, nodes, input_data, trigger_source, execution_context)
+            except STORE_UNAVAILABLE as e:
+                logger.warning(f"Execution state store unavailable, tracking run in the database: {str(e)}")
+                write_behind = False
+
+        if execution is None:
+            # Create workflow execution record
+            from apps.executions.models import NodeExecution, WorkflowExecution
+
+            with span("execution.create", write_behind=False):
+                execution = WorkflowExecution.objects.create(
+                    workflow=workflow,
+                    user=user,
+                    status="running",
+                    input_data=input_data or {},
+                    trigger_source=trigger_source,
+                    execution_context=execution_context,
+                    total_nodes=len(nodes),
+                )
+
+                # Pre-create every node execution row in one insert; nodes then only issue narrow updates
+                NodeExecution.objects.bulk_create(
+                    [NodeExecution(workflow_execution=execution, node=node, status="pending") for node in nodes]
+                )
+
+        # Beat while this run is in flight, so the watchdog fails it within seconds if this worker dies
+        heartbeats.start(execution.id)
+        execution_events.publish(
+            execution.id,
+            "execution.started",
+            {"workflow_id": str(workflow.id), "status": "running", "total_nodes": len(nodes)},
+            user_id=user.id,
+        )
 
         results = {}
         current_data = input_data or {}
@@ -49,15 +112,32 @@ def execute_workflow(self, workflow_id, user_id, input_data=None, trigger_source
             try:
                 logger.info(f"Executing node: {node.name}")
 
-                # Execute the node
-                node_result = execute_node.delay(execution.id, node.id, current_data).get()  # Wait for node completion
+                # Execute the node; the span covers the queue wait and the node task, whose spans come back with it
+                with span("node.dispatch", node=node.name, node_type=node.node_type):
+                    node_result = execute_node.delay(
+                        str(execution.id),
+                        str(node.id),
+                        current_data,
+                        write_behind=write_behind,
+                        user_id=str(user.id),
+                        trace_context=propagation_context(),
+                        profile=run_profile.options if run_profile is not None else None,
+                    ).get()  # Wait for node completion
+                merge_spans(node_result.pop("trace", None))
+                if run_profile is not None:
+                    run_profile.add(node_result.pop("profile", None))
 
                 if node_result["status"] == "completed":
                     results[str(node.id)] = node_result["output"]
                     current_data.update(node_result["output"])
+                elif node_result["status"] == "skipped":
+                    # The execution was cancelled or timed out underneath this node
+                    logger.info(f"Stopping execution {execution.id}: node {node.name} was skipped")
+                    break
                 elif node_result["status"] == "failed":
                     # Node failed, mark execution as failed
                     execution.mark_as_failed(f"Node {node.name} failed: {node_result.get('error', 'Unknown error')}")
+                    execution.skip_pending_nodes()
                     return {
                         "status": "failed",
                         "error": f"Node {node.name} failed",
@@ -67,14 +147,23 @@ def execute_workflow(self, workflow_id, user_id, input_data=None, trigger_source
             except Exception as e:
                 logger.error(f"Error executing node {node.name}: {str(e)}")
                 execution.mark_as_failed(f"Error executing node {node.name}: {str(e)}")
+                execution.skip_pending_nodes()
                 return {
                     "status": "failed",
                     "error": str(e),
                     "execution_id": str(execution.id),
                 }
 
-        # Mark execution as completed
-        execution.mark_as_completed(results)
+        # Mark execution as completed; a cancellation that landed first wins
+        with span("execution.complete"):
+            completed = execution.mark_as_completed(results)
+        if not completed:
+            logger.info(f"Workflow execution {execution.id} ended as {execution.status}: {workflow.name}")
+            return {
+                "status": execution.refresh_status(),
+                "results": results,
+                "execution_id": str(execution.id),
+            }
 
         logger.info(f"Workflow execution completed: {workflow.name}")
 
@@ -96,25 +185,107 @@ def execute_workflow(self, workflow_id, user_id, input_data=None, trigger_source
     except Exception as e:
         logger.error(f"Unexpected error in workflow execution: {str(e)}")
         return {"status": "failed", "error": str(e)}
+    finally:
+        if execution is not None:
+            heartbeats.stop(execution.id)
+        if run_profile is not None:
+            run_profile.save(execution.id if execution is not None else None)
 
 
 @shared_task(bind=True)
-def execute_node(self, execution_id, node_id, input_data):
-    """Execute a single workflow node."""
+def execute_node(
+    self, execution_id, node_id, input_data, write_behind=False, user_id=None, trace_context=None, profile=None
+):
+    """Execute a single workflow node, handing the node's trace spans and any profile back with its result."""
+    with trace_task("execute_node", trace_context, node_id=node_id) as trace:
+        profiler = start_profiler(profile)
+        try:
+            result = _execute_node(self, execution_id, node_id, input_data, write_behind, user_id)
+        finally:
+            exported = stop_profiler(profiler) if profiler is not None else None
+    if trace is not None:
+        result["trace"] = trace.rows
+    if exported is not None:
+        result["profile"] = exported
+    return result
+
+
+def _execute_node(task, execution_id, node_id, input_data, write_behind, user_id):
+    node_execution = None
+    start_fields = {}
     try:
         from apps.executions.models import NodeExecution, WorkflowExecution
 
-        execution = WorkflowExecution.objects.get(id=execution_id)
         node = WorkflowNode.objects.get(id=node_id)
+        if user_id is not None:
+            # Node and log events are published to the owner's stream without looking the run up
+            execution_events.remember_owner(execution_id, user_id)
+
+        # Outbound nodes wait for rate limits through the broker instead of sleeping in the worker
+        try:
+            with span("ratelimit.acquire"):
+                acquire(_rate_limit_buckets(node))
+        except RateLimitExceeded as e:
+            try:
+                logger.info(f"Node {node.name} rate limited, retrying in {e.retry_after:.2f}s")
+                raise task.retry(
+                    countdown=e.retry_after + random.uniform(0, 0.25),
+                    max_retries=settings.OUTBOUND_RATE_LIMIT_MAX_RETRIES,
+                )
+            except MaxRetriesExceededError:
+                # The node is failed below, once its pre-created execution is loaded
+                keys = ", ".join(bucket.key for bucket in e.buckets)
+                rate_limit_error = f"Rate limited after {settings.OUTBOUND_RATE_LIMIT_MAX_RETRIES} retries ({keys})"
+                logger.warning(f"Node {node.name}: {rate_limit_error}")
+        else:
+            rate_limit_error = None
 
         logger.info(f"Executing node: {node.name} of type: {node.node_type}")
 
-        # Create node execution record
-        node_execution = NodeExecution.objects.create(
-            workflow_execution=execution,
-            node=node,
-            status="running",
-            input_data=input_data,
+        # Load the node execution pre-created by execute_workflow: from Redis for write-behind runs,
+        # otherwise the database row without its JSON columns. Start time and input are written
+        # together with the outcome in a single guarded update.
+        with span("node_execution.load"):
+            if write_behind:
+                node_execution = get_node_execution(execution_id, node_id)
+                if node_execution is None:
+                    logger.info(f"Skipping node {node.name}: execution {execution_id} has already finished")
+                    return {"status": "skipped"}
+            else:
+                node_execution = (
+                    NodeExecution.objects.filter(workflow_execution_id=execution_id, node_id=node_id)
+                    .only("id", "workflow_execution_id", "node_id", "status", "started_at")
+                    .order_by("-started_at")
+                    .first()
+                )
+
+        if node_execution is None:
+            # Run outside execute_workflow, e.g. a single-node retry
+            node_execution = NodeExecution.objects.create(
+                workflow_execution_id=execution_id,
+                node=node,
+                status="running",
+                input_data=input_data,
+            )
+            WorkflowExecution.update_node_counters(execution_id, total=1)
+        elif node_execution.status != "pending":
+            logger.info(f"Skipping node {node.name}: node execution is {node_execution.status}")
+            return {"status": "skipped", "node_execution_id": str(node_execution.id)}
+        start_fields = {"started_at": timezone.now(), "input_data": input_data or {}}
+        if rate_limit_error is not None:
+            node_execution.mark_as_failed(rate_limit_error, **start_fields)
+            node_execution.add_log("error", rate_limit_error)
+            return {"status": "failed", "error": rate_limit_error, "node_execution_id": str(node_execution.id)}
+        # The start is only written together with the outcome, so it is announced here
+        execution_events.publish(
+            execution_id,
+            "node.started",
+            {
+                "node_execution_id": str(node_execution.id),
+                "node_id": str(node.id),
+                "status": "running",
+                "started_at": start_fields["started_at"],
+            },
         )
 
         # Log start
@@ -123,26 +294,33 @@ def execute_node(self, execution_id, node_id, input_data):
         # Execute based on node type
         output_data = {}
 
-        if node.node_type == "trigger":
-            output_data = _execute_trigger_node(node, input_data, node_execution)
-        elif node.node_type == "ai_chat":
-            output_data = _execute_ai_chat_node(node, input_data, node_execution)
-        elif node.node_type == "api_call":
-            output_data = _execute_api_call_node(node, input_data, node_execution)
-        elif node.node_type == "email":
-            output_data = _execute_email_node(node, input_data, node_execution)
-        elif node.node_type == "condition":
-            output_data = _execute_condition_node(node, input_data, node_execution)
-        else:
-            # Default action for unknown node types
-            output_data = {
-                "message": f"Executed {node.node_type} node: {node.name}",
-                "node_type": node.node_type,
-                "timestamp": timezone.now().isoformat(),
-            }
+        with span("node.run", node_type=node.node_type):
+            if node.node_type == "trigger":
+                output_data = _execute_trigger_node(node, input_data, node_execution)
+            elif node.node_type == "ai_chat":
+                output_data = _execute_ai_chat_node(node, input_data, node_execution)
+            elif node.node_type == "ai_completion":
+                output_data = _execute_ai_completion_node(node, input_data, node_execution)
+            elif node.node_type == "api_call":
+                output_data = _execute_api_call_node(node, input_data, node_execution)
+            elif node.node_type == "email":
+                output_data = _execute_email_node(node, input_data, node_execution)
+            elif node.node_type == "condition":
+                output_data = _execute_condition_node(node, input_data, node_execution)
+            else:
+                # Default action for unknown node types
+                output_data = {
+                    "message": f"Executed {node.node_type} node: {node.name}",
+                    "node_type": node.node_type,
+                    "timestamp": timezone.now().isoformat(),
+                }
 
         # Mark node execution as completed
-        node_execution.mark_as_completed(output_data)
+        with span("node_execution.save"):
+            completed = node_execution.mark_as_completed(output_data, **start_fields)
+        if not completed:
+            # Cancelled or timed out while this node was running
+            return {"status": "skipped", "node_execution_id": str(node_execution.id)}
         node_execution.add_log("info", f"Completed executing node: {node.name}")
 
         return {
@@ -151,19 +329,55 @@ def execute_node(self, execution_id, node_id, input_data):
             "node_execution_id": str(node_execution.id),
         }
 
+    except Retry:
+        raise
     except Exception as e:
         logger.error(f"Error executing node: {str(e)}")
 
         # Mark node execution as failed if it exists
-        try:
-            node_execution.mark_as_failed(str(e))
-            node_execution.add_log("error", f"Failed executing node: {str(e)}")
-        except Exception as e:
-            logger.error(f"Error marking node execution as failed: {str(e)}")
-            pass
+        if node_execution is not None:
+            try:
+                node_execution.mark_as_failed(str(e), **start_fields)
+                node_execution.add_log("error", f"Failed executing node: {str(e)}")
+            except Exception as mark_error:
+                logger.error(f"Error marking node execution as failed: {str(mark_error)}")
 
         return {"status": "failed", "error": str(e)}
 
+    finally:
+        # Node boundary: write this node's buffered log entries in one insert
+        with span("logs.flush"):
+            log_buffer.flush()
+
+
+def _rate_limit_buckets(node):
+    """Get the outbound rate-limit buckets a node's request counts against."""
+    from urllib.parse import urlparse
+
+    from apps.integrations.models import Integration
+
+    config = node.configuration
+    if node.node_type == "api_call":
+        url = config.get("url")
+    elif node.node_type in ("ai_chat", "ai_completion"):
+        provider = config.get("provider", settings.AI_DEFAULT_PROVIDER)
+        url = settings.AI_PROVIDERS.get(provider, {}).get("base_url")
+    else:
+        return []
+
+    buckets = []
+    integration_id = config.get("integration_id")
+    if integration_id:
+        integration_config = (
+            Integration.objects.filter(id=integration_id).values_list("configuration", flat=True).first() or {}
+        )
+        buckets.append(integration_bucket(integration_id, integration_config))
+        if node.node_type != "api_call":
+            url = integration_config.get("base_url", url)
+
+    buckets.append(host_bucket(urlparse(url).hostname if url else None))
+    return buckets
+
 
 def _execute_trigger_node(node, input_data, node_execution):
     """Execute a trigger node."""
@@ -173,26 +387,55 @@ def _execute_trigger_node(node, input_data, node_execution):
 
 def _execute_ai_chat_node(node, input_data, node_execution):
     """Execute an AI chat node."""
-    # For MVP, we'll just simulate AI response
-    # In production, this would call actual AI APIs
-    config = node.configuration
-    prompt = config.get("prompt", "Hello, how can I help you?")
+    from .ai import run_ai_node
+
+    prompt = node.configuration.get("prompt", "Hello, how can I help you?")
 
     node_execution.add_log("info", f"AI Chat prompt: {prompt}")
 
-    # Simulate AI response
-    response = f"AI Response to: {prompt}"
+    result, cached, latency_ms = run_ai_node(node, node_execution, kind="chat")
+
+    node_execution.add_log("info", f"AI Chat response received in {latency_ms}ms" + (" (cached)" if cached else ""))
 
     return {
-        "ai_response": response,
+        "ai_response": result["text"],
         "prompt_used": prompt,
-        "model": config.get("model", "gpt-3.5-turbo"),
+        "model": result["model"],
+        "finish_reason": result["finish_reason"],
+        "cached": cached,
+    }
+
+
+def _execute_ai_completion_node(node, input_data, node_execution):
+    """Execute an AI completion node."""
+    from .ai import run_ai_node
+
+    prompt = node.configuration.get("prompt", "Hello, how can I help you?")
+
+    node_execution.add_log("info", f"AI Completion prompt: {prompt}")
+
+    result, cached, latency_ms = run_ai_node(node, node_execution, kind="completion")
+
+    node_execution.add_log(
+        "info", f"AI Completion response received in {latency_ms}ms" + (" (cached)" if cached else "")
+    )
+
+    return {
+        "completion": result["text"],
+        "prompt_used": prompt,
+        "model": result["model"],
+        "finish_reason": result["finish_reason"],
+        "cached": cached,
     }
 
 
 def _execute_api_call_node(node, input_data, node_execution):
     """Execute an API call node."""
-    import requests
+    from functools import partial
+
+    from django.conf import settings
+
+    from .coalescing import coalesce, request_key
 
     config = node.configuration
     url = config.get("url")
@@ -203,61 +446,81 @@ def _execute_api_call_node(node, input_data, node_execution):
 
     try:
         if method == "GET":
-            response = requests.get(url, headers=headers, timeout=30)
+            send = partial(_send_api_request, method, url, headers)
+            # Identical concurrent GETs share one upstream call
+            if settings.API_CALL_COALESCE_ENABLED and config.get("coalesce", True):
+                return coalesce(request_key(method, url, headers), send)
+            return send()
         elif method == "POST":
-            data = config.get("body", {})
-            response = requests.post(url, json=data, headers=headers, timeout=30)
+            return _send_api_request(method, url, headers, body=config.get("body", {}))
         else:
             raise ValueError(f"Unsupported HTTP method: {method}")
 
-        response.raise_for_status()
-
-        return {
-            "status_code": response.status_code,
-            "response_data": (
-                response.json()
-                if response.headers.get("content-type", "").startswith("application/json")
-                else response.text
-            ),
-            "url": url,
-            "method": method,
-        }
-
     except Exception as e:
         node_execution.add_log("error", f"API call failed: {str(e)}")
         raise
 
 
+def _send_api_request(method, url, headers, body=None):
+    """Send an outbound HTTP request and return the node output for it."""
+    from urllib.parse import urlparse
+
+    from .http import get_http_session
+
+    session = get_http_session()
+    with span("http.request", method=method, host=urlparse(url).hostname) as current:
+        if method == "POST":
+            response = session.post(url, json=body, headers=headers, timeout=30)
+        else:
+            response = session.get(url, headers=headers, timeout=30)
+        if current is not None:
+            current.set(status_code=response.status_code)
+
+    response.raise_for_status()
+
+    return {
+        "status_code": response.status_code,
+        "response_data": (
+            response.json()
+            if response.headers.get("content-type", "").startswith("application/json")
+            else response.text
+        ),
+        "url": url,
+        "method": method,
+    }
+
+
 def _execute_email_node(node, input_data, node_execution):
     """Execute an email node."""
-    from django.conf import settings
-    from django.core.mail import send_mail
+    from apps.executions.outbox import enqueue_email
 
     config = node.configuration
     to_email = config.get("to_email")
     subject = config.get("subject", "Workflow Notification")
     message = config.get("message", "This is a notification from your workflow.")
 
-    node_execution.add_log("info", f"Sending email to {to_email}")
+    node_execution.add_log("info", f"Queueing email to {to_email}")
 
     try:
-        send_mail(
-            subject,
-            message,
-            settings.EMAIL_HOST_USER,
-            [to_email],
-            fail_silently=False,
-        )
+        # Delivery happens in batches from the outbox over a pooled SMTP connection
+        with span("outbox.enqueue"):
+            (email,) = enqueue_email(subject, message, [to_email])
 
+        queued_at = timezone.now().isoformat()
         return {
-            "email_sent": True,
+            "email_queued": True,
+            "outbox_id": str(email.id),
             "to_email": to_email,
             "subject": subject,
-            "sent_at": timezone.now().isoformat(),
+            "queued_at": queued_at,
+            # Kept for workflows written against the synchronous sender; the email
+            # is accepted for delivery at this point, not yet handed to SMTP
+            "email_sent": True,
+            "sent_at": queued_at,
         }
 
     except Exception as e:
-        node_execution.add_log("error", f"Email sending failed: {str(e)}")
+        node_execution.add_log("error", f"Email queueing failed: {str(e)}")
         raise
 
 
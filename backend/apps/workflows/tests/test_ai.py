@@ -0,0 +1,199 @@
+"""
+Tests for the AI node executor, run against a local mock provider server.
+"""
+
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from apps.executions.models import NodeExecution, WorkflowExecution
+from apps.workflows.ai import OpenAIProvider, _get_batcher, prompt_cache_key, run_ai_node
+from apps.workflows.models import Workflow, WorkflowNode
+
+User = get_user_model()
+
+LOCMEM_CACHES = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+
+
+class MockProviderHandler(BaseHTTPRequestHandler):
+    """Answers OpenAI- and Anthropic-style requests with canned responses, recording each request."""
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        self.server.requests.append({"path": self.path, "headers": dict(self.headers), "body": body})
+
+        if self.path == "/openai/chat/completions":
+            data = {
+                "model": body["model"],
+                "choices": [{"index": 0, "message": {"content": "chat reply"}, "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": 12, "completion_tokens": 5},
+            }
+        elif self.path == "/openai/completions":
+            # Choices out of order, as providers may return them
+            data = {
+                "model": body["model"],
+                "choices": [
+                    {"index": index, "text": f"completion of {prompt}", "finish_reason": "stop"}
+                    for index, prompt in reversed(list(enumerate(body["prompt"])))
+                ],
+                "usage": {"prompt_tokens": 7, "completion_tokens": 5},
+            }
+        elif self.path == "/anthropic/messages":
+            data = {
+                "model": body["model"],
+                "content": [{"type": "text", "text": "anthropic reply"}],
+                "stop_reason": "end_turn",
+                "usage": {"input_tokens": 9, "output_tokens": 4},
+            }
+        else:
+            self.send_error(404)
+            return
+
+        payload = json.dumps(data).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class AIExecutorTests(TestCase):
+    """Runs AI nodes through both providers against the mock server."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), MockProviderHandler)
+        cls.server.requests = []
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        base_url = f"http://127.0.0.1:{cls.server.server_address[1]}"
+        cls.providers = {
+            "openai": {"api_key": "test-openai-key", "base_url": f"{base_url}/openai"},
+            "anthropic": {"api_key": "test-anthropic-key", "base_url": f"{base_url}/anthropic"},
+        }
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    def setUp(self):
+        overrides = override_settings(
+            CACHES=LOCMEM_CACHES,
+            AI_PROVIDERS=self.providers,
+            AI_PROMPT_CACHE_TTL=3600,
+            AI_BATCH_WINDOW=0,
+        )
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        cache.clear()
+        self.server.requests.clear()
+
+        self.user = User.objects.create_user("ai@example.com", "password", first_name="AI", last_name="Tester")
+        self.workflow = Workflow.objects.create(user=self.user, name="AI workflow")
+        self.execution = WorkflowExecution.objects.create(workflow=self.workflow, user=self.user, status="running")
+
+    def _node(self, node_type, **configuration):
+        return WorkflowNode.objects.create(
+            workflow=self.workflow, node_type=node_type, name=node_type, configuration=configuration
+        )
+
+    def _node_execution(self, node):
+        return NodeExecution.objects.create(workflow_execution=self.execution, node=node)
+
+    def test_openai_chat_records_usage(self):
+        node = self._node("ai_chat", provider="openai", prompt="Hello", system_prompt="Be brief", temperature=0.2)
+        node_execution = self._node_execution(node)
+
+        result, cached, latency_ms = run_ai_node(node, node_execution, kind="chat")
+
+        self.assertEqual(result["text"], "chat reply")
+        self.assertFalse(cached)
+        (request,) = self.server.requests
+        self.assertEqual(request["path"], "/openai/chat/completions")
+        self.assertEqual(request["headers"]["Authorization"], "Bearer test-openai-key")
+        self.assertEqual(
+            request["body"]["messages"],
+            [{"role": "system", "content": "Be brief"}, {"role": "user", "content": "Hello"}],
+        )
+        self.assertEqual(request["body"]["temperature"], 0.2)
+
+        node_execution.refresh_from_db()
+        self.assertEqual(node_execution.prompt_tokens, 12)
+        self.assertEqual(node_execution.completion_tokens, 5)
+        self.assertEqual(node_execution.provider_latency_ms, latency_ms)
+
+    def test_anthropic_chat_records_usage(self):
+        node = self._node("ai_chat", provider="anthropic", prompt="Hello", system_prompt="Be brief", max_tokens=64)
+        node_execution = self._node_execution(node)
+
+        result, cached, _ = run_ai_node(node, node_execution, kind="chat")
+
+        self.assertEqual(result["text"], "anthropic reply")
+        self.assertEqual(result["finish_reason"], "end_turn")
+        (request,) = self.server.requests
+        self.assertEqual(request["path"], "/anthropic/messages")
+        self.assertEqual(request["headers"]["x-api-key"], "test-anthropic-key")
+        self.assertEqual(request["body"]["system"], "Be brief")
+        self.assertEqual(request["body"]["messages"], [{"role": "user", "content": "Hello"}])
+        self.assertEqual(request["body"]["max_tokens"], 64)
+
+        node_execution.refresh_from_db()
+        self.assertEqual(node_execution.prompt_tokens, 9)
+        self.assertEqual(node_execution.completion_tokens, 4)
+
+    def test_prompt_cache_hit_skips_provider(self):
+        node = self._node("ai_completion", provider="openai", prompt="Summarize   this")
+        first = self._node_execution(node)
+        second = self._node_execution(node)
+
+        result, cached, _ = run_ai_node(node, first, kind="completion")
+        self.assertFalse(cached)
+
+        # Whitespace differences share the cache entry
+        node.configuration["prompt"] = "Summarize this"
+        cached_result, cached, _ = run_ai_node(node, second, kind="completion")
+
+        self.assertTrue(cached)
+        self.assertEqual(cached_result["text"], result["text"])
+        self.assertEqual(len(self.server.requests), 1)
+
+        # A cache hit costs no provider tokens
+        second.refresh_from_db()
+        self.assertEqual((second.prompt_tokens, second.completion_tokens), (0, 0))
+
+    def test_cache_key_accepts_structured_content(self):
+        provider = OpenAIProvider(**self.providers["openai"])
+        messages = [{"role": "user", "content": [{"type": "text", "text": "Describe  this"}]}]
+
+        key = prompt_cache_key(provider, "gpt-test", "chat", messages, {})
+
+        self.assertTrue(key.startswith("ai_prompt:"))
+
+    @override_settings(AI_BATCH_WINDOW=5, AI_BATCH_MAX_SIZE=2)
+    def test_batched_completions_share_one_request(self):
+        provider = OpenAIProvider(**self.providers["openai"])
+        batcher = _get_batcher(provider, "gpt-test", {"max_tokens": 16})
+
+        # The batch is sent as soon as the second prompt fills it, well before the window ends
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            futures = [executor.submit(batcher.submit, prompt) for prompt in ("first", "second")]
+            results = [future.result(timeout=5).result(timeout=5) for future in futures]
+
+        (request,) = self.server.requests
+        self.assertEqual(request["path"], "/openai/completions")
+        self.assertCountEqual(request["body"]["prompt"], ["first", "second"])
+        self.assertEqual([result["text"] for result in results], ["completion of first", "completion of second"])
+
+        # The request's usage is split across the batch without losing the remainder
+        self.assertEqual(sum(result["prompt_tokens"] for result in results), 7)
+        self.assertEqual(sum(result["completion_tokens"] for result in results), 5)
@@ -0,0 +1,69 @@
+"""
+Tests for the workflow engine tasks.
+"""
+
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+
+from apps.executions.models import NodeExecution, WorkflowExecution
+from apps.integrations.ratelimit import Bucket, RateLimitExceeded
+from apps.workflows.models import Workflow, WorkflowNode
+from apps.workflows.tasks import execute_node
+
+User = get_user_model()
+
+LOCMEM_CACHES = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class RateLimitedNodeTests(TestCase):
+    """A node that stays rate limited past its retries is failed rather than lost."""
+
+    def setUp(self):
+        self.user = User.objects.create_user("tasks@example.com", "password", first_name="Task", last_name="Tester")
+        workflow = Workflow.objects.create(user=self.user, name="Rate limited workflow")
+        self.node = WorkflowNode.objects.create(
+            workflow=workflow, node_type="api_call", name="Call", configuration={"url": "https://api.example.com/"}
+        )
+        self.execution = WorkflowExecution.objects.create(workflow=workflow, user=self.user, status="running")
+        self.node_execution = NodeExecution.objects.create(workflow_execution=self.execution, node=self.node)
+
+    def _run(self):
+        limited = RateLimitExceeded(1.5, [Bucket("host:api.example.com", 10)])
+        with mock.patch("apps.workflows.tasks.acquire", side_effect=limited) as acquire:
+            result = execute_node.apply(args=[str(self.execution.id), str(self.node.id), {"key": "value"}]).get()
+        return result, acquire
+
+    @override_settings(OUTBOUND_RATE_LIMIT_MAX_RETRIES=2)
+    def test_node_fails_once_retries_are_exhausted(self):
+        result, acquire = self._run()
+
+        # The first attempt and each retry wait on the bucket
+        self.assertEqual(acquire.call_count, 3)
+        self.node_execution.refresh_from_db()
+        self.assertEqual(self.node_execution.status, "failed")
+        self.assertEqual(
+            self.node_execution.error_message, "Rate limited after 2 retries (ratelimit:host:api.example.com)"
+        )
+        self.assertEqual(self.node_execution.input_data, {"key": "value"})
+        self.assertIsNotNone(self.node_execution.started_at)
+        self.assertEqual(
+            self.node_execution.logs.filter(level="error").values_list("message", flat=True).get(),
+            self.node_execution.error_message,
+        )
+
+    @override_settings(OUTBOUND_RATE_LIMIT_MAX_RETRIES=0)
+    def test_failed_result_is_returned(self):
+        result, _ = self._run()
+        result.pop("trace", None)
+
+        self.assertEqual(
+            result,
+            {
+                "status": "failed",
+                "error": "Rate limited after 0 retries (ratelimit:host:api.example.com)",
+                "node_execution_id": str(self.node_execution.id),
+            },
+        )
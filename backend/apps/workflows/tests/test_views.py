@@ -0,0 +1,111 @@
+"""
+Tests for the workflow API views.
+"""
+
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from apps.executions.models import ExecutionRollup, NodeExecution, WorkflowExecution
+from apps.workflows.models import Workflow, WorkflowNode
+
+User = get_user_model()
+
+LOCMEM_CACHES = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+
+# The page, and its count for pagination
+LIST_QUERIES = 2
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class WorkflowListQueryTests(TestCase):
+    """The workflow list takes a fixed number of queries, however many workflows and executions there are."""
+
+    def setUp(self):
+        self.user = User.objects.create_user("list@example.com", "password", first_name="List", last_name="Tester")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def _create_workflows(self, count, executions=3):
+        existing = Workflow.objects.filter(user=self.user).count()
+        for i in range(existing, existing + count):
+            workflow = Workflow.objects.create(user=self.user, name=f"Workflow {i}")
+            nodes = WorkflowNode.objects.bulk_create(
+                [
+                    WorkflowNode(workflow=workflow, node_type=node_type, name=node_type, position_x=x)
+                    for x, node_type in enumerate(("trigger", "action", "email"))
+                ]
+            )
+            for _ in range(executions):
+                execution = WorkflowExecution.objects.create(workflow=workflow, user=self.user, status="completed")
+                NodeExecution.objects.bulk_create(
+                    [NodeExecution(workflow_execution=execution, node=node, status="completed") for node in nodes]
+                )
+
+    def _list(self):
+        response = self.client.get("/api/v1/workflows/")
+        self.assertEqual(response.status_code, 200)
+        return response.data["results"]
+
+    def test_query_count_does_not_grow_with_workflows(self):
+        self._create_workflows(2)
+        with self.assertNumQueries(LIST_QUERIES):
+            results = self._list()
+        self.assertEqual(len(results), 2)
+
+        self._create_workflows(8)
+        with self.assertNumQueries(LIST_QUERIES):
+            results = self._list()
+        self.assertEqual(len(results), 10)
+
+    def test_annotations_match_history(self):
+        self._create_workflows(1)
+        workflow = Workflow.objects.get(user=self.user)
+        WorkflowExecution.objects.create(workflow=workflow, user=self.user, status="failed")
+
+        (result,) = self._list()
+
+        self.assertEqual(result["node_count"], 3)
+        self.assertEqual(result["last_execution_status"], "failed")
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class WorkflowMetricsTests(TestCase):
+    """Workflow metrics count finished executions from the daily rollups and open ones from the executions."""
+
+    def setUp(self):
+        self.user = User.objects.create_user("metrics@example.com", "password", first_name="Metric", last_name="Tester")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.workflow = Workflow.objects.create(user=self.user, name="Metrics workflow")
+
+    def test_metrics_combine_rollups_and_open_executions(self):
+        day = timezone.now().replace(hour=0, minute=0, second=0, microsecond=0)
+        ExecutionRollup.objects.create(
+            workflow=self.workflow,
+            user=self.user,
+            granularity="day",
+            period_start=day,
+            total_executions=4,
+            successful_executions=3,
+            failed_executions=1,
+            total_duration=timedelta(seconds=10),
+        )
+        # Hourly rows cover the same executions and must not be counted again
+        ExecutionRollup.objects.create(
+            workflow=self.workflow, user=self.user, granularity="hour", period_start=day, total_executions=4
+        )
+        for status in ("pending", "running", "running"):
+            WorkflowExecution.objects.create(workflow=self.workflow, user=self.user, status=status)
+
+        response = self.client.get(f"/api/v1/workflows/{self.workflow.id}/metrics/")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["total_executions"], 7)
+        self.assertEqual(response.data["successful_executions"], 3)
+        self.assertEqual(response.data["failed_executions"], 1)
+        self.assertEqual(response.data["running_executions"], 2)
+        self.assertEqual(response.data["average_duration"], 2.5)
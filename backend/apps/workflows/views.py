@@ -10,6 +10,9 @@ from rest_framework.decorators import action
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 
+from apps.executions.profiling import profile_mode
+from orchestrix.fieldsets import SparseFieldsetViewMixin
+
 from .models import Workflow, WorkflowNode, WorkflowSchedule, WorkflowTemplate
 from .serializers import (
     WorkflowCreateSerializer,
@@ -21,7 +24,7 @@ from .serializers import (
 )
 
 
-class WorkflowTemplateViewSet(viewsets.ModelViewSet):
+class WorkflowTemplateViewSet(SparseFieldsetViewMixin, viewsets.ModelViewSet):
     """ViewSet for workflow templates."""
 
     serializer_class = WorkflowTemplateSerializer
@@ -159,7 +162,7 @@ class WorkflowTemplateViewSet(viewsets.ModelViewSet):
                 )
 
 
-class WorkflowViewSet(viewsets.ModelViewSet):
+class WorkflowViewSet(SparseFieldsetViewMixin, viewsets.ModelViewSet):
     """ViewSet for workflows."""
 
     permission_classes = [IsAuthenticated]
@@ -175,7 +178,21 @@ class WorkflowViewSet(viewsets.ModelViewSet):
 
     def get_queryset(self):
         """Get workflows for the current user."""
-        return Workflow.objects.filter(user=self.request.user).prefetch_related("nodes", "schedule", "executions")
+        workflows = Workflow.objects.filter(user=self.request.user)
+        if self.action == "metrics":
+            # Served from the aggregate cache; only ownership needs checking
+            return workflows
+        workflows = workflows.select_related("user")
+        if self.action == "list":
+            from apps.executions.models import WorkflowExecution
+
+            # Node count and last execution status come from the same query as the page, never from the history
+            last_execution = WorkflowExecution.objects.filter(workflow=models.OuterRef("pk")).order_by("-started_at")
+            return workflows.annotate(
+                annotated_node_count=models.Count("nodes"),
+                last_execution_status=models.Subquery(last_execution.values("status")[:1]),
+            )
+        return workflows.prefetch_related("nodes", "schedule")
 
     def get_serializer_class(self):
         """Return appropriate serializer based on action."""
@@ -193,6 +210,11 @@ class WorkflowViewSet(viewsets.ModelViewSet):
         if not workflow.is_active:
             return Response({"error": "Workflow is not active"}, status=status.HTTP_400_BAD_REQUEST)
 
+        try:
+            profile = profile_mode(request.data.get("profile"))
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
         # Import here to avoid circular imports
         from apps.workflows.tasks import execute_workflow
 
@@ -202,6 +224,7 @@ class WorkflowViewSet(viewsets.ModelViewSet):
             user_id=str(request.user.id),
             input_data=request.data.get("trigger_data", {}),
             trigger_source="manual",
+            profile=profile,
         )
 
         return Response(
@@ -274,32 +297,37 @@ class WorkflowViewSet(viewsets.ModelViewSet):
         workflow = self.get_object()
 
         # Import here to avoid circular imports
+        from apps.executions.aggcache import get_or_compute
+        from apps.executions.aggregates import aggregate_workflow_metrics
         from apps.executions.models import WorkflowExecution
+        from apps.executions.rollups import duration_percentiles, node_duration_percentiles
 
-        executions = WorkflowExecution.objects.filter(workflow=workflow)
-
-        metrics = {
-            "total_executions": executions.count(),
-            "successful_executions": executions.filter(status="completed").count(),
-            "failed_executions": executions.filter(status="failed").count(),
-            "running_executions": executions.filter(status="running").count(),
-            "average_duration": None,  # TODO: Calculate average duration
-            "last_execution": None,
-        }
+        def compute():
+            executions = WorkflowExecution.objects.filter(workflow=workflow)
+            rollups = workflow.rollups.filter(granularity="day")
 
-        last_execution = executions.first()
-        if last_execution:
-            metrics["last_execution"] = {
-                "id": last_execution.id,
-                "status": last_execution.status,
-                "started_at": last_execution.started_at,
-                "finished_at": last_execution.completed_at,
-            }
+            # Finished executions come from the daily rollups; only open ones are counted from the executions
+            metrics = aggregate_workflow_metrics(rollups, executions)
+            metrics["duration_percentiles"] = duration_percentiles(rollups)
+            metrics["node_duration_percentiles"] = node_duration_percentiles(
+                workflow.node_rollups.filter(granularity="day")
+            )
+            metrics["last_execution"] = None
+
+            last_execution = executions.only("id", "status", "started_at", "completed_at").first()
+            if last_execution:
+                metrics["last_execution"] = {
+                    "id": last_execution.id,
+                    "status": last_execution.status,
+                    "started_at": last_execution.started_at,
+                    "finished_at": last_execution.completed_at,
+                }
+            return metrics
 
-        return Response(metrics)
+        return Response(get_or_compute(request.user.id, "workflow_metrics", {"workflow": workflow.pk}, compute))
 
 
-class WorkflowNodeViewSet(viewsets.ModelViewSet):
+class WorkflowNodeViewSet(SparseFieldsetViewMixin, viewsets.ModelViewSet):
     """ViewSet for workflow nodes."""
 
     serializer_class = WorkflowNodeSerializer
@@ -317,7 +345,7 @@ class WorkflowNodeViewSet(viewsets.ModelViewSet):
         serializer.save()
 
 
-class WorkflowScheduleViewSet(viewsets.ModelViewSet):
+class WorkflowScheduleViewSet(SparseFieldsetViewMixin, viewsets.ModelViewSet):
     """ViewSet for workflow schedules."""
 
     serializer_class = WorkflowScheduleSerializer
@@ -0,0 +1,87 @@
+"""
+Worker process warm-up so the first tasks after a recycle skip cold-start costs.
+"""
+
+import importlib
+import logging
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Count
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+
+def preload_modules():
+    """Import node executors and their heavy dependencies."""
+    for module in settings.WORKER_WARMUP_MODULES:
+        importlib.import_module(module)
+
+
+def open_connection_pools():
+    """Open the database, Redis and outbound HTTP connections tasks will reuse."""
+    from django_redis import get_redis_connection
+
+    from .http import get_http_session
+
+    connection.ensure_connection()
+    get_redis_connection("default").ping()
+    get_http_session()
+
+
+def prime_credential_cipher():
+    """Build the credential cipher and run it once so its crypto backend is loaded."""
+    from apps.integrations.models import get_credential_cipher
+
+    cipher = get_credential_cipher()
+    cipher.decrypt(cipher.encrypt(b"warm-up"))
+
+
+def preload_hot_plans():
+    """Load execution plans for the workflows that ran most in the last day."""
+    from apps.executions.models import WorkflowExecution
+
+    from .plans import get_execution_plan
+
+    hot_workflows = (
+        WorkflowExecution.objects.filter(started_at__gte=timezone.now() - timedelta(days=1))
+        .values("workflow_id")
+        .annotate(runs=Count("id"))
+        .order_by("-runs")
+        .values_list("workflow_id", flat=True)[: settings.WORKER_WARMUP_HOT_PLANS]
+    )
+    for workflow_id in hot_workflows:
+        get_execution_plan(workflow_id)
+
+
+STAGES = [
+    ("modules", preload_modules),
+    ("connections", open_connection_pools),
+    ("cipher", prime_credential_cipher),
+    ("plans", preload_hot_plans),
+]
+
+
+def warm_up():
+    """Run every warm-up stage and log how long each took.
+
+    A failing stage is logged and skipped; warm-up must never stop a worker from starting.
+    """
+    timings = {}
+    started = time.monotonic()
+
+    for name, stage in STAGES:
+        stage_started = time.monotonic()
+        try:
+            stage()
+        except Exception as e:
+            logger.warning(f"Worker warm-up stage '{name}' failed: {str(e)}")
+        timings[name] = int((time.monotonic() - stage_started) * 1000)
+
+    total_ms = int((time.monotonic() - started) * 1000)
+    breakdown = ", ".join(f"{name}={ms}ms" for name, ms in timings.items())
+    logger.info(f"Worker warm-up finished in {total_ms}ms ({breakdown})")
+    return timings
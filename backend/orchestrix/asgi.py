@@ -0,0 +1,30 @@
+"""
+ASGI config for orchestrix project.
+
+It exposes the ASGI callable as a module-level variable named ``application``:
+HTTP is served by Django, WebSockets by Channels.
+
+For more information on this file, see
+https://docs.djangoproject.com/en/4.2/howto/deployment/asgi/
+"""
+
+import os
+
+from django.core.asgi import get_asgi_application
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "orchestrix.settings")
+
+# Set up Django before anything that imports models
+django_asgi_application = get_asgi_application()
+
+from channels.routing import ProtocolTypeRouter, URLRouter  # noqa: E402
+
+from apps.authentication.middleware import JWTAuthMiddleware  # noqa: E402
+from apps.executions.routing import websocket_urlpatterns  # noqa: E402
+
+application = ProtocolTypeRouter(
+    {
+        "http": django_asgi_application,
+        "websocket": JWTAuthMiddleware(URLRouter(websocket_urlpatterns)),
+    }
+)
@@ -5,6 +5,7 @@ Celery configuration for orchestrix project.
 import os
 
 from celery import Celery
+from celery.signals import worker_process_init
 
 # Set the default Django settings module for the 'celery' program.
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "orchestrix.settings")
@@ -24,6 +25,38 @@ app.conf.beat_schedule = {
         "task": "apps.executions.tasks.cleanup_old_executions",
         "schedule": 60.0 * 60.0 * 24.0,  # Daily
     },
+    "maintain-execution-partitions": {
+        "task": "apps.executions.tasks.maintain_execution_partitions",
+        "schedule": 60.0 * 60.0 * 24.0,  # Daily
+    },
+    "generate-execution-metrics": {
+        "task": "apps.executions.tasks.generate_execution_metrics",
+        "schedule": 60.0 * 15.0,  # Every 15 minutes, cheap now that it reads the daily rollups
+    },
+    "reconcile-execution-rollups": {
+        "task": "apps.executions.tasks.reconcile_execution_rollups",
+        "schedule": 60.0 * 60.0,  # Hourly
+    },
+    "flush-email-outbox": {
+        "task": "apps.executions.tasks.flush_email_outbox",
+        "schedule": 60.0,  # Every minute, picks up retries and anything a crashed flush left behind
+    },
+    "flush-execution-state": {
+        "task": "apps.executions.tasks.flush_execution_state",
+        "schedule": 60.0,  # Every minute, backstop for flushes scheduled when write-behind runs finish
+    },
+    "watch-execution-heartbeats": {
+        "task": "apps.executions.tasks.watch_execution_heartbeats",
+        "schedule": 10.0,  # Every 10 seconds, pops only the runs whose heartbeat or deadline has passed
+    },
+    "monitor-long-running-executions": {
+        "task": "apps.executions.tasks.monitor_long_running_executions",
+        "schedule": 60.0 * 15.0,  # Every 15 minutes, backstop for runs started while Redis was unavailable
+    },
+    "recover-execution-state": {
+        "task": "apps.executions.tasks.recover_execution_state",
+        "schedule": 60.0 * 5.0,  # Every 5 minutes
+    },
 }
 
 # Task routes
@@ -55,6 +88,17 @@ app.conf.update(
 )
 
 
+@worker_process_init.connect
+def warm_up_worker_process(**kwargs):
+    """Preload executors, hot plans and connection pools in each new worker process."""
+    from django.conf import settings
+
+    if settings.WORKER_WARMUP_ENABLED:
+        from apps.workflows.warmup import warm_up
+
+        warm_up()
+
+
 @app.task(bind=True)
 def debug_task(self):
     """Debug task for testing Celery."""
@@ -0,0 +1,161 @@
+"""
+Sparse fieldsets: ``?fields=`` / ``?exclude=`` projections of serializers, pushed down to the queryset.
+"""
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Prefetch
+from django.db.models.constants import LOOKUP_SEP
+from rest_framework import serializers
+from rest_framework.permissions import SAFE_METHODS
+
+FIELDS_PARAM = "fields"
+EXCLUDE_PARAM = "exclude"
+
+
+def _paths(value):
+    return [tuple(part.strip().split(".")) for part in (value or "").split(",") if part.strip()]
+
+
+class Fieldset:
+    """Fields requested at one serializer level: included names (None for all), excluded names and nested fieldsets."""
+
+    def __init__(self):
+        self.include = None
+        self.exclude = set()
+        self.nested = {}
+
+    def child(self, name):
+        return self.nested.setdefault(name, Fieldset())
+
+    def keeps(self, name):
+        return name not in self.exclude and (self.include is None or name in self.include)
+
+    @classmethod
+    def from_query_params(cls, query_params):
+        """Parse ``fields`` and ``exclude``, comma-separated names with dots for nested fields.
+
+        ``?fields=id,status,node_executions.id`` keeps three fields and only the
+        ``id`` of each node execution; ``?exclude=node_executions.output_data``
+        drops one nested field. Returns None when neither parameter is given.
+        """
+        included = _paths(query_params.get(FIELDS_PARAM))
+        excluded = _paths(query_params.get(EXCLUDE_PARAM))
+        if not included and not excluded:
+            return None
+
+        fieldset = cls()
+        for path in included:
+            level = fieldset
+            for name in path:
+                if level.include is None:
+                    level.include = set()
+                level.include.add(name)
+                level = level.child(name)
+        for path in excluded:
+            level = fieldset
+            for name in path[:-1]:
+                level = level.child(name)
+            level.exclude.add(path[-1])
+        return fieldset
+
+
+def _serializer_of(field):
+    return field.child if isinstance(field, serializers.ListSerializer) else field
+
+
+class SparseFieldsetMixin:
+    """Serializer mixin that serializes only the fields requested with ``?fields=`` / ``?exclude=``.
+
+    The top-level serializer reads the fieldset from a GET request; nested
+    serializers get theirs from dotted names. ``Meta.field_sources`` maps fields
+    without a model field source, such as SerializerMethodFields, to the model
+    attributes they read, so ``project_queryset`` knows what a projection still
+    needs from the database.
+    """
+
+    fieldset = None
+
+    def get_fields(self):
+        fields = super().get_fields()
+        fieldset = self.fieldset if self.fieldset is not None else self._requested_fieldset()
+        self.excluded_fields = {}
+        if fieldset is None:
+            return fields
+
+        for name in list(fields):
+            if not fieldset.keeps(name):
+                self.excluded_fields[name] = fields.pop(name)
+            elif name in fieldset.nested:
+                nested = _serializer_of(fields[name])
+                if isinstance(nested, SparseFieldsetMixin):
+                    nested.fieldset = fieldset.nested[name]
+        return fields
+
+    def _requested_fieldset(self):
+        parent = self.parent.parent if isinstance(self.parent, serializers.ListSerializer) else self.parent
+        request = self.context.get("request")
+        if parent is not None or request is None or request.method not in SAFE_METHODS:
+            return None
+        return Fieldset.from_query_params(request.query_params)
+
+    def project_queryset(self, queryset):
+        """Defer the columns of excluded fields and drop the prefetches no requested field reads.
+
+        Nested serializers fetched through a prefetch are projected the same
+        way. The queryset is returned unchanged when a requested field reads
+        attributes that neither its source nor ``Meta.field_sources`` names.
+        """
+        fields = self.fields
+        field_sources = getattr(self.Meta, "field_sources", {})
+        opts = queryset.model._meta
+
+        needed = {name.lstrip("-") for name in queryset.query.order_by or opts.ordering if isinstance(name, str)}
+        nested = {}
+        for name, field in fields.items():
+            if name in field_sources:
+                needed.update(field_sources[name])
+                continue
+            if field.source == "*":
+                return queryset
+            attr = field.source_attrs[0]
+            try:
+                model_field = opts.get_field(attr)
+            except FieldDoesNotExist:
+                return queryset
+            needed.add(attr)
+            serializer = _serializer_of(field)
+            if model_field.is_relation and isinstance(serializer, SparseFieldsetMixin):
+                nested[attr] = serializer
+
+        # Excluded fields were never bound, so a field without an explicit source is sourced by its name
+        excluded = {(field.source or name).split(".")[0] for name, field in self.excluded_fields.items()}
+        deferred = [
+            field.name
+            for field in opts.concrete_fields
+            if field.name in excluded and field.name not in needed and not field.primary_key and not field.is_relation
+        ]
+        if deferred:
+            queryset = queryset.defer(*deferred)
+
+        lookups = []
+        for lookup in queryset._prefetch_related_lookups:
+            path = lookup.prefetch_to if isinstance(lookup, Prefetch) else lookup
+            if path.split(LOOKUP_SEP)[0] not in needed:
+                continue
+            if isinstance(lookup, str) and lookup in nested:
+                related = opts.get_field(lookup).related_model
+                lookup = Prefetch(lookup, queryset=nested[lookup].project_queryset(related._default_manager.all()))
+            lookups.append(lookup)
+        return queryset.prefetch_related(None).prefetch_related(*lookups)
+
+
+class SparseFieldsetViewMixin:
+    """ViewSet mixin that narrows the list and retrieve querysets to the requested fieldset."""
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        if self.action in ("list", "retrieve"):
+            serializer = self.get_serializer()
+            if isinstance(serializer, SparseFieldsetMixin):
+                queryset = serializer.project_queryset(queryset)
+        return queryset
@@ -0,0 +1,148 @@
+"""
+Pagination classes for orchestrix project.
+"""
+
+import base64
+import binascii
+import json
+
+from django.core.exceptions import FieldDoesNotExist
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(PageNumberPagination):
+    """Page-number pagination with an opt-in keyset mode for large, append-mostly tables.
+
+    Passing ``cursor`` (empty for the first page) switches to keyset pagination
+    on the queryset's first ordering field plus the primary key, e.g.
+    ``(started_at, id)``. Pages are read with ``WHERE (started_at, id) < (...)``
+    instead of an OFFSET scan, no total count is run, and ``next``/``previous``
+    carry opaque cursors.
+    """
+
+    cursor_query_param = "cursor"
+    invalid_cursor_message = "Invalid cursor."
+
+    keyset = False
+
+    @classmethod
+    def uses_cursor(cls, request):
+        """Check whether a request asks for keyset pagination."""
+        return cls.cursor_query_param in request.query_params
+
+    def paginate_queryset(self, queryset, request, view=None):
+        """Paginate by page number, or by keyset when the request carries a cursor."""
+        if not self.uses_cursor(request):
+            self.keyset = False
+            return super().paginate_queryset(queryset, request, view)
+
+        self.keyset = True
+        self.request = request
+        page_size = self.get_page_size(request)
+        self.fields = self._keyset_fields(queryset)
+        cursor = self._decode_cursor(request.query_params[self.cursor_query_param])
+        reverse = bool(cursor and cursor["reverse"])
+
+        queryset = queryset.order_by(
+            *[("-" if descending != reverse else "") + name for name, descending in self.fields]
+        )
+        if cursor:
+            queryset = queryset.filter(self._after(cursor["position"], reverse))
+
+        rows = list(queryset[: page_size + 1])
+        has_more = len(rows) > page_size
+        rows = rows[:page_size]
+        if reverse:
+            rows.reverse()
+
+        has_next = has_more if not reverse else True
+        has_previous = has_more if reverse else cursor is not None
+        self.next_position = self._position(rows[-1]) if rows and has_next else None
+        self.previous_position = self._position(rows[0]) if rows and has_previous else None
+        return rows
+
+    def get_paginated_response(self, data):
+        """Wrap a page in ``next``/``previous`` links, and a total count in page-number mode."""
+        if not self.keyset:
+            return super().get_paginated_response(data)
+        return Response(
+            {
+                "next": self.get_next_link(),
+                "previous": self.get_previous_link(),
+                "results": data,
+            }
+        )
+
+    def get_next_link(self):
+        if not self.keyset:
+            return super().get_next_link()
+        return self._cursor_link(self.next_position, reverse=False)
+
+    def get_previous_link(self):
+        if not self.keyset:
+            return super().get_previous_link()
+        return self._cursor_link(self.previous_position, reverse=True)
+
+    def _keyset_fields(self, queryset):
+        """Get the keyset as ``(field name, descending)`` pairs: the first ordering field, then the primary key."""
+        ordering = queryset.query.order_by or queryset.model._meta.ordering
+        pk = queryset.model._meta.pk
+        name = ordering[0] if ordering and isinstance(ordering[0], str) else pk.name
+        descending = name.startswith("-")
+        name = name.lstrip("-")
+        if name == "pk":
+            name = pk.name
+
+        try:
+            field = queryset.model._meta.get_field(name)
+        except FieldDoesNotExist:
+            field = None
+        if field is None or not field.concrete or field.is_relation or field.null:
+            raise ValidationError({"ordering": f"Cursor pagination cannot order by {name}."})
+
+        self.model_fields = {name: field, pk.name: pk}
+        if name == pk.name:
+            return [(name, descending)]
+        return [(name, descending), (pk.name, descending)]
+
+    def _after(self, position, reverse):
+        """Build the filter for rows past ``position`` in (possibly reversed) keyset order."""
+        condition = Q()
+        for index, (name, descending) in enumerate(self.fields):
+            lookup = "lt" if descending != reverse else "gt"
+            equal = {self.fields[earlier][0]: position[earlier] for earlier in range(index)}
+            condition |= Q(**equal, **{f"{name}__{lookup}": position[index]})
+        return condition
+
+    def _position(self, obj):
+        return [getattr(obj, self.model_fields[name].attname) for name, _ in self.fields]
+
+    def _encode_cursor(self, position, reverse):
+        # str() rather than DjangoJSONEncoder, which truncates datetimes to milliseconds
+        payload = json.dumps({"p": position, "r": reverse}, default=str, separators=(",", ":"))
+        return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+    def _decode_cursor(self, encoded):
+        """Decode an opaque cursor; an empty one means the first page."""
+        if not encoded:
+            return None
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(encoded + "=" * (-len(encoded) % 4)))
+            position = [
+                self.model_fields[name].to_python(value)
+                for (name, _), value in zip(self.fields, payload["p"], strict=True)
+            ]
+            return {"position": position, "reverse": bool(payload.get("r"))}
+        except (binascii.Error, UnicodeDecodeError, ValueError, KeyError, TypeError, DjangoValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def _cursor_link(self, position, reverse):
+        if position is None:
+            return None
+        url = remove_query_param(self.request.build_absolute_uri(), self.page_query_param)
+        return replace_query_param(url, self.cursor_query_param, self._encode_cursor(position, reverse))